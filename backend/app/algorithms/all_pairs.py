@@ -0,0 +1,192 @@
+import math
+import struct
+import sys
+from array import array
+
+from app.algorithms.cancel import check, never
+from app.algorithms.csr import INF, CSRGraph, dijkstra
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele só o Dijkstra repetido fica disponível
+    np = None
+
+
+FLOYD_WARSHALL = "floyd_warshall"
+DIJKSTRA = "dijkstra"
+CONTRACTION_HIERARCHY = "ch"
+METHODS = (FLOYD_WARSHALL, DIJKSTRA, CONTRACTION_HIERARCHY)
+
+# Custos aproximados por operação elementar, usados só para escolher o método:
+# o Floyd–Warshall roda n³ operações vetorizadas no NumPy e o Dijkstra
+# repetido roda n · (m + n) · log n operações no interpretador.
+_FW_SECONDS_PER_OP = 1e-9
+_DIJKSTRA_SECONDS_PER_OP = 5e-7
+
+# Linhas processadas por vez em cada iteração do Floyd–Warshall: limita o
+# temporário a block_size × n floats e mantém o bloco no cache.
+DEFAULT_BLOCK_SIZE = 256
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+def choose_method(graph: CSRGraph) -> str:
+    """
+    Escolhe o método mais barato para o grafo:
+    Floyd–Warshall para grafos densos (ou pequenos), Dijkstra repetido
+    para grafos esparsos. Sem NumPy, sempre Dijkstra.
+    """
+    if np is None:
+        return DIJKSTRA
+
+    n, m = graph.num_nodes, graph.num_edges
+    fw_cost = n ** 3 * _FW_SECONDS_PER_OP
+    dijkstra_cost = n * (m + n) * max(1.0, math.log2(n or 1)) * _DIJKSTRA_SECONDS_PER_OP
+    return FLOYD_WARSHALL if fw_cost <= dijkstra_cost else DIJKSTRA
+
+
+def _initial_matrix(graph: CSRGraph):
+    n = graph.num_nodes
+    dist = np.full((n, n), np.inf, dtype=np.float64)
+
+    offsets = np.frombuffer(graph.offsets, dtype=np.int64)
+    src = np.repeat(np.arange(n, dtype=np.int64), np.diff(offsets))
+    dst = np.frombuffer(graph.targets, dtype=np.int64)
+    w = np.frombuffer(graph.weights, dtype=np.float64)
+
+    # arestas paralelas: fica a de menor peso
+    np.minimum.at(dist, (src, dst), w)
+    np.fill_diagonal(dist, 0.0)
+    return dist
+
+
+def floyd_warshall(graph: CSRGraph, block_size: int = DEFAULT_BLOCK_SIZE, should_stop=never):
+    """
+    Floyd–Warshall vetorizado sobre uma matriz NumPy n × n.
+    Para cada k, as linhas são atualizadas em blocos de block_size:
+    D[i, :] = min(D[i, :], D[i, k] + D[k, :]).
+    """
+    dist = _initial_matrix(graph)
+    n = graph.num_nodes
+
+    for k in range(n):
+        if not k & 63:
+            check(should_stop)
+        # como D[k, k] == 0, a própria linha k não muda durante a iteração k
+        row_k = dist[k]
+        for r0 in range(0, n, block_size):
+            block = dist[r0:r0 + block_size]
+            np.minimum(block, block[:, k, None] + row_k, out=block)
+
+    return dist
+
+
+def dijkstra_rows(graph: CSRGraph, should_stop=never):
+    """
+    Gera as linhas da matriz (array('d')) uma a uma, rodando Dijkstra a
+    partir de cada nó só quando a linha é pedida.
+    """
+    for i in range(graph.num_nodes):
+        check(should_stop)
+        yield dijkstra(graph, i)[0]
+
+
+def repeated_dijkstra(graph: CSRGraph, should_stop=never):
+    """
+    Roda Dijkstra a partir de cada nó.
+    Retorna uma matriz NumPy quando disponível, senão uma lista de arrays.
+    """
+    n = graph.num_nodes
+    if np is None:
+        return list(dijkstra_rows(graph, should_stop))
+
+    dist = np.empty((n, n), dtype=np.float64)
+    for i, row in enumerate(dijkstra_rows(graph, should_stop)):
+        dist[i] = np.frombuffer(row, dtype=np.float64)
+    return dist
+
+
+def all_pairs(graph: CSRGraph, method: str = "auto", hierarchy=None, should_stop=never):
+    """
+    Calcula as distâncias mínimas entre todos os pares de nós.
+    Retorna (matriz, método usado); a linha/coluna i corresponde a
+    graph.node_ids[i].
+
+    O método ch (many-to-many na contraction hierarchy) só é usado quando
+    pedido explicitamente: compensa para subconjuntos de nós, mas com todos
+    os pares os buckets crescem com n² e o Dijkstra repetido sai mais
+    barato. Sem hierarquia pronta, ch cai para o Dijkstra.
+    should_stop() verdadeiro interrompe o cálculo com cancel.Cancelled.
+    """
+    if method == "auto":
+        method = choose_method(graph)
+    if method == CONTRACTION_HIERARCHY:
+        if hierarchy is None:
+            method = DIJKSTRA
+        else:
+            nodes = list(range(graph.num_nodes))
+            return hierarchy.many_to_many(nodes, nodes, should_stop), method
+
+    if method == FLOYD_WARSHALL:
+        if np is None:
+            raise RuntimeError("Floyd–Warshall requer NumPy.")
+        return floyd_warshall(graph, should_stop=should_stop), method
+    if method == DIJKSTRA:
+        return repeated_dijkstra(graph, should_stop), method
+
+    raise ValueError(f"Método desconhecido: {method}")
+
+
+def all_pairs_rows(graph: CSRGraph, method: str = "auto", hierarchy=None, should_stop=never):
+    """
+    Como all_pairs, mas retorna (linhas, método usado) com as linhas num
+    iterável: com Dijkstra elas são calculadas à medida que são lidas, sem
+    montar a matriz; Floyd–Warshall e ch precisam da matriz inteira.
+    """
+    if method == "auto":
+        method = choose_method(graph)
+    if method == DIJKSTRA or (method == CONTRACTION_HIERARCHY and hierarchy is None):
+        return dijkstra_rows(graph, should_stop), DIJKSTRA
+    return all_pairs(graph, method, hierarchy, should_stop)
+
+
+def write_rows(f, rows, typecode: str = "d"):
+    """
+    Grava as linhas em f como float64 ("d") ou float32 ("f") little-endian,
+    uma por vez (sem caminho = +inf).
+    """
+    dtype = "<f8" if typecode == "d" else "<f4"
+    for row in rows:
+        if np is not None and isinstance(row, np.ndarray):
+            f.write(row.astype(dtype).tobytes())
+            continue
+        data = array(typecode, row)
+        if sys.byteorder != "little":
+            data.byteswap()
+        f.write(data.tobytes())
+
+
+def json_rows(f, n: int):
+    """
+    Lê de f, uma por vez, as linhas de uma matriz n × n gravada por
+    write_rows em float64, como listas Python com None no lugar de infinito.
+    """
+    for _ in range(n):
+        row = array("d", f.read(n * 8))
+        if sys.byteorder != "little":
+            row.byteswap()
+        yield [None if d == INF else d for d in row.tolist()]
+
+
+def npy_header(n: int) -> bytes:
+    """
+    Cabeçalho .npy de uma matriz n × n float64 little-endian, seguido pelas
+    linhas de write_rows. Montado à mão para não depender do NumPy.
+    """
+    header = "{'descr': '<f8', 'fortran_order': False, 'shape': (%d, %d), }" % (n, n)
+    # magic (6) + versão (2) + tamanho do cabeçalho (2) + cabeçalho, múltiplo de 64
+    pad = 64 - (10 + len(header) + 1) % 64
+    header = header + " " * pad + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
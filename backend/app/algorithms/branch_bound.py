@@ -0,0 +1,246 @@
+import heapq
+import os
+
+from app import metrics
+from app.algorithms.cancel import check, never, no_progress
+from app.algorithms.greedy import greedy_order
+from app.algorithms.held_karp import route_cost
+
+INF = float("inf")
+
+# limite de expansões antes de desistir de provar a otimalidade
+MAX_EXPANSIONS = int(os.environ.get("BNB_MAX_EXPANSIONS", 2_000_000))
+
+
+class _Bound:
+    """
+    Limite inferior admissível para completar uma rota a partir de (mask, last),
+    o maior entre dois limites:
+    - entrada: cada job pendente é alcançado uma vez, vindo de last ou de outro
+      job pendente que não dependa dele (direta ou indiretamente);
+    - saída: last e cada job pendente, menos o último da rota, saem uma vez
+      para algum job pendente.
+    """
+
+    def __init__(self, job_to_job: list[list[float]], prereq_masks: list[int]):
+        n = len(job_to_job)
+        self.n = n
+        # para cada job k: origens (i, custo) ordenadas pelo custo de i -> k
+        self.incoming = [
+            sorted(
+                ((job_to_job[i][k], i) for i in range(n) if i != k and job_to_job[i][k] < INF),
+            )
+            for k in range(n)
+        ]
+        self.outgoing = [
+            sorted(
+                ((job_to_job[i][k], k) for k in range(n) if k != i and job_to_job[i][k] < INF),
+            )
+            for i in range(n)
+        ]
+        # jobs que dependem de k (fecho transitivo das precedências)
+        self.successors = [_dependents(prereq_masks, k) for k in range(n)]
+
+    def __call__(self, mask: int, last: int) -> float:
+        pending = ~mask & ((1 << self.n) - 1)
+        if not pending:
+            return 0.0
+
+        sources = pending | (1 << last)
+        incoming = 0.0
+        for k in range(self.n):
+            if not (pending >> k) & 1:
+                continue
+            allowed = sources & ~self.successors[k]
+            for cost, i in self.incoming[k]:
+                if (allowed >> i) & 1:
+                    incoming += cost
+                    break
+            else:
+                return INF
+
+        outgoing = 0.0
+        largest = 0.0
+        dead_ends = 0
+        for i in range(self.n):
+            if not (sources >> i) & 1:
+                continue
+            best = INF
+            for cost, k in self.outgoing[i]:
+                if (pending >> k) & 1:
+                    best = cost
+                    break
+            if best == INF:
+                # sem saída para um pendente: só pode ser o fim da rota
+                if i == last:
+                    return INF
+                dead_ends += 1
+                continue
+            outgoing += best
+            largest = max(largest, best)
+
+        if dead_ends > 1:
+            return INF
+        if dead_ends == 0:
+            # quem terminar a rota não precisa sair
+            outgoing -= largest
+        return max(incoming, outgoing)
+
+
+def _dependents(prereq_masks: list[int], k: int) -> int:
+    """
+    Bitmask dos jobs que precisam de k antes deles, direta ou indiretamente.
+    """
+    result = 0
+    frontier = 1 << k
+    while frontier:
+        found = 0
+        for i, mask in enumerate(prereq_masks):
+            if mask & frontier and not (result >> i) & 1:
+                found |= 1 << i
+        result |= found
+        frontier = found
+    return result
+
+
+def solve(start_to_job: list[float], job_to_job: list[list[float]], prereq_masks: list[int],
+          max_expansions: int = MAX_EXPANSIONS, should_stop=never, progress=no_progress,
+          constraints=None):
+    """
+    Busca best-first (A*) exata sobre estados (jobs concluídos, último job).
+
+    f = g + h, com h dado por _Bound. A rota gulosa é o limite superior
+    inicial e todo estado com f >= incumbente é podado. Para cada estado
+    guarda só o menor g já visto.
+
+    Com constraints (ver constraints.Constraints), transições que estouram
+    a capacidade ou perdem a janela nem entram na fila. Com janelas, g é o
+    horário de saída do último job (sair mais cedo nunca é pior) e h soma
+    aos limites de viagem o atendimento dos jobs pendentes; o custo
+    devolvido é então o horário de término.
+
+    Retorna (custo, ordem dos índices dos jobs, estatísticas); a ordem é []
+    se não houver rota. Se max_expansions estourar, devolve a melhor rota
+    encontrada com stats["proven_optimal"] = False. should_stop() verdadeiro
+    interrompe a busca com cancel.Cancelled; progress recebe os estados
+    expandidos e o custo da melhor rota conhecida.
+    """
+    n = len(start_to_job)
+    full_mask = (1 << n) - 1
+    bound = _Bound(job_to_job, prereq_masks)
+    timed = constraints is not None and constraints.timed
+    loaded = constraints is not None and constraints.loaded
+    service = constraints.service if timed else None
+
+    greedy_cost, greedy, failure = greedy_order(start_to_job, job_to_job, prereq_masks, constraints)
+    if failure is None and constraints is not None:
+        greedy_cost = constraints.value(start_to_job, job_to_job, greedy)
+    best_cost = greedy_cost if failure is None else INF
+    best_order = greedy if failure is None else []
+
+    stats = {
+        "initial_upper_bound": None if best_cost == INF else best_cost,
+        "expanded": 0,
+        "generated": 0,
+        "pruned": 0,
+        "max_queue": 0,
+        "proven_optimal": True,
+    }
+
+    best_g: dict[tuple[int, int], float] = {}
+    parent: dict[tuple[int, int], int] = {}
+    heap: list[tuple[float, float, int, int]] = []
+
+    def push(g: float, mask: int, last: int, prev: int):
+        stats["generated"] += 1
+        key = (mask, last)
+        if g >= best_g.get(key, INF):
+            stats["pruned"] += 1
+            return
+        h = bound(mask, last)
+        if timed:
+            h += sum(service[k] for k in range(n) if not (mask >> k) & 1)
+        f = g + h
+        if f >= best_cost:
+            stats["pruned"] += 1
+            return
+        best_g[key] = g
+        parent[key] = prev
+        heapq.heappush(heap, (f, g, mask, last))
+
+    def step(g: float, mask: int, travel: float, k: int) -> float:
+        # g depois de executar k a partir do estado (INF se inviável)
+        if loaded and not constraints.fits(constraints.mask_load(mask | (1 << k))):
+            return INF
+        if timed:
+            return constraints.depart(g, travel, k)
+        return g + travel
+
+    for k in range(n):
+        if not prereq_masks[k] and start_to_job[k] < INF:
+            g = step(0.0, 0, start_to_job[k], k)
+            if g < INF:
+                push(g, 1 << k, k, -1)
+
+    best_state = None
+    while heap:
+        stats["max_queue"] = max(stats["max_queue"], len(heap))
+        f, g, mask, last = heapq.heappop(heap)
+        if f >= best_cost:
+            # todos os estados restantes têm f pelo menos esse
+            break
+        if g > best_g.get((mask, last), INF):
+            continue  # entrada desatualizada
+
+        if mask == full_mask:
+            best_cost = g
+            best_state = (mask, last)
+            continue
+
+        stats["expanded"] += 1
+        if not stats["expanded"] & 1023:
+            check(should_stop)
+            if best_cost < INF:
+                progress(expanded=stats["expanded"], incumbent_cost=best_cost)
+            else:
+                progress(expanded=stats["expanded"])
+        if stats["expanded"] > max_expansions:
+            stats["proven_optimal"] = False
+            break
+
+        row = job_to_job[last]
+        for k in range(n):
+            if (mask >> k) & 1 or prereq_masks[k] & ~mask:
+                continue
+            move_cost = row[k]
+            if move_cost == INF:
+                continue
+            if constraints is None:
+                push(g + move_cost, mask | (1 << k), k, last)
+                continue
+            new_g = step(g, mask, move_cost, k)
+            if new_g < INF:
+                push(new_g, mask | (1 << k), k, last)
+
+    if best_state is not None:
+        best_order = _reconstruct(parent, *best_state)
+        # um pai pode ter sido melhorado depois de gerar o estado final;
+        # o custo da ordem reconstruída é recalculado
+        if constraints is not None:
+            best_cost = constraints.value(start_to_job, job_to_job, best_order)
+        else:
+            best_cost = route_cost(start_to_job, job_to_job, best_order)
+
+    metrics.count("solver_states_total", stats["expanded"], solver="bnb")
+    return best_cost, best_order, stats
+
+
+def _reconstruct(parent: dict[tuple[int, int], int], mask: int, last: int) -> list[int]:
+    order: list[int] = []
+    while last != -1:
+        order.append(last)
+        prev = parent[(mask, last)]
+        mask ^= 1 << last
+        last = prev
+    order.reverse()
+    return order
@@ -0,0 +1,31 @@
+class Cancelled(Exception):
+    """
+    Cálculo interrompido porque quem pediu desistiu (tempo esgotado ou
+    cliente desconectado).
+    """
+
+
+def never() -> bool:
+    return False
+
+
+def check(should_stop):
+    """
+    Os solvers chamam check(should_stop) em pontos regulares dos laços
+    principais; should_stop() verdadeiro interrompe o cálculo.
+    """
+    if should_stop():
+        raise Cancelled()
+
+
+# Campos que os solvers podem informar em progress(**campos) durante o
+# cálculo; quem acompanha (ver workers.Task.progress) vê só os informados.
+#   layer / layers: camada atual do DP (jobs já feitos) e total de camadas
+#   masks_done / masks: estados do DP já processados e total
+#   expanded: estados expandidos pelo branch and bound
+#   incumbent_cost: custo da melhor rota encontrada até agora
+PROGRESS_FIELDS = ("layer", "layers", "masks_done", "masks", "expanded", "incumbent_cost")
+
+
+def no_progress(**fields) -> None:
+    pass
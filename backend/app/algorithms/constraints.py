@@ -0,0 +1,131 @@
+INF = float("inf")
+
+
+class Constraints:
+    """
+    Restrições opcionais de cada job, por índice de job:
+    - service[k]: tempo de atendimento no job k;
+    - ready[k] / due[k]: janela de tempo para o *início* do atendimento;
+      chegar antes de ready[k] é permitido (o veículo espera), começar
+      depois de due[k] não;
+    - load[k]: variação da carga do veículo ao executar k (+demanda em
+      pickup, −demanda em dropoff);
+    - capacity: carga máxima do veículo (INF = sem limite de carga).
+
+    O relógio começa em 0 no nó inicial e os custos das arestas contam
+    como tempo de viagem. O veículo sai vazio: com capacidade, a carga
+    precisa ficar entre 0 e capacity depois de cada job, então um dropoff
+    só entrega o que foi coletado antes na rota.
+
+    Com janelas (timed), os solvers minimizam o horário de término da
+    rota (saída do último job), que pode diferir da rota de menor custo
+    de viagem; sem janelas, o objetivo continua sendo o custo de viagem.
+    """
+
+    def __init__(self, service: list[float], ready: list[float], due: list[float],
+                 load: list[float], capacity: float = INF):
+        self.n = len(service)
+        self.service = service
+        self.ready = ready
+        self.due = due
+        self.load = load
+        self.capacity = capacity
+        self.timed = any(r > 0 for r in ready) or any(d < INF for d in due)
+        self.loaded = capacity < INF
+
+    def subset(self, indices: list[int]) -> "Constraints":
+        """
+        Restrições só dos jobs de indices, reindexados na ordem dada.
+        """
+        return Constraints(
+            [self.service[k] for k in indices], [self.ready[k] for k in indices],
+            [self.due[k] for k in indices], [self.load[k] for k in indices], self.capacity,
+        )
+
+    def fits(self, load: float) -> bool:
+        # folga para os erros de arredondamento das somas de demandas
+        return not self.loaded or -1e-9 <= load <= self.capacity + 1e-9
+
+    def mask_load(self, mask: int) -> float:
+        total = 0.0
+        k = 0
+        while mask:
+            if mask & 1:
+                total += self.load[k]
+            mask >>= 1
+            k += 1
+        return total
+
+    def depart(self, clock: float, travel: float, k: int) -> float:
+        """
+        Horário de saída do job k chegando depois de travel a partir de
+        clock; INF se o atendimento não puder começar até due[k].
+        """
+        start = clock + travel
+        if start < self.ready[k]:
+            start = self.ready[k]
+        if start > self.due[k]:
+            return INF
+        return start + self.service[k]
+
+    def schedule(self, start_to_job: list[float], job_to_job: list[list[float]],
+                 order: list[int]) -> list[tuple[float, float]] | None:
+        """
+        (início do atendimento, saída) de cada job da ordem, ou None se a
+        ordem violar alguma janela ou a capacidade.
+        """
+        times = []
+        clock = 0.0
+        load = 0.0
+        prev = -1
+        for k in order:
+            travel = start_to_job[k] if prev == -1 else job_to_job[prev][k]
+            load += self.load[k]
+            if travel == INF or not self.fits(load):
+                return None
+            start = max(clock + travel, self.ready[k])
+            if start > self.due[k]:
+                return None
+            clock = start + self.service[k]
+            times.append((start, clock))
+            prev = k
+        return times
+
+    def value(self, start_to_job: list[float], job_to_job: list[list[float]],
+              order: list[int]) -> float:
+        """
+        Valor da ordem no objetivo dos solvers: horário de término com
+        janelas, custo de viagem sem elas; INF se a ordem for inviável.
+        """
+        times = self.schedule(start_to_job, job_to_job, order)
+        if times is None:
+            return INF
+        if self.timed:
+            return times[-1][1] if times else 0.0
+        total = start_to_job[order[0]] if order else 0.0
+        for a, b in zip(order, order[1:]):
+            total += job_to_job[a][b]
+        return total
+
+
+def build_constraints(job_rows, capacity: float | None) -> Constraints | None:
+    """
+    Monta as restrições a partir das linhas (type, service_time,
+    window_start, window_end, demand) dos jobs, na ordem dos índices.
+    Retorna None quando nada restringe a rota (sem janelas, sem tempos de
+    atendimento e sem capacidade), para os solvers seguirem o caminho
+    sem restrições.
+    """
+    service, ready, due, load = [], [], [], []
+    for job_type, service_time, window_start, window_end, demand in job_rows:
+        service.append(float(service_time or 0.0))
+        ready.append(float(window_start) if window_start is not None else 0.0)
+        due.append(float(window_end) if window_end is not None else INF)
+        demand = float(demand or 0.0)
+        load.append(-demand if job_type == "dropoff" else demand)
+
+    constraints = Constraints(service, ready, due, load,
+                              INF if capacity is None else float(capacity))
+    if not (constraints.timed or constraints.loaded or any(service)):
+        return None
+    return constraints
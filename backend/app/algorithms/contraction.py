@@ -0,0 +1,365 @@
+import heapq
+import struct
+from array import array
+
+from app.algorithms.cancel import check, never
+from app.algorithms.csr import INF, CSRGraph
+
+# aresta original (sem nó intermediário)
+NO_MIDDLE = -1
+
+# limite de nós fixados em cada busca de testemunha
+WITNESS_SETTLE_LIMIT = 60
+
+_MAGIC = b"GRAFCH01"
+_HEADER = struct.Struct("<8sqqqq")  # magic, versão do dataset, n, m_up, m_down
+HEADER_SIZE = _HEADER.size
+
+
+def read_version(header: bytes) -> int:
+    """
+    Versão do dataset gravada no cabeçalho de um arquivo de hierarquia.
+    """
+    if len(header) < HEADER_SIZE:
+        raise ValueError("Arquivo de hierarquia inválido.")
+    magic, version = _HEADER.unpack_from(header, 0)[:2]
+    if magic != _MAGIC:
+        raise ValueError("Arquivo de hierarquia inválido.")
+    return version
+
+
+class Hierarchy:
+    """
+    Contraction hierarchy sobre os índices densos do CSR.
+
+    - rank[v]: ordem de contração de v (maior = mais importante)
+    - up: para cada v, arestas v -> w com rank[w] > rank[v]
+    - down: para cada v, arestas u -> v com rank[u] > rank[v], guardadas em v
+      (a busca reversa a partir do destino sobe por elas)
+    Cada aresta guarda o nó contraído que ela substitui (NO_MIDDLE se for
+    uma aresta original), usado para desempacotar os atalhos.
+    """
+
+    def __init__(self, version: int, rank, up, down):
+        self.version = version
+        self.rank = rank
+        # up/down: (offsets, nós, pesos, nós intermediários)
+        self.up = up
+        self.down = down
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.rank)
+
+    @property
+    def num_shortcuts(self) -> int:
+        return sum(1 for m in self.up[3] if m != NO_MIDDLE) + sum(1 for m in self.down[3] if m != NO_MIDDLE)
+
+    def _upward_search(self, graph, source: int):
+        offsets, heads, weights, _ = graph
+        dist = {source: 0.0}
+        pred = {source: -1}
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for e in range(offsets[u], offsets[u + 1]):
+                v = heads[e]
+                nd = d + weights[e]
+                if nd < dist.get(v, INF):
+                    dist[v] = nd
+                    pred[v] = u
+                    heapq.heappush(heap, (nd, v))
+        return dist, pred
+
+    def query(self, source: int, target: int):
+        """
+        Busca bidirecional subindo na hierarquia a partir das duas pontas.
+        Retorna (distância, caminho em índices densos com os atalhos
+        desempacotados, nós visitados).
+        """
+        if source == target:
+            return 0.0, [source], 1
+
+        dist_f, pred_f = self._upward_search(self.up, source)
+        dist_b, pred_b = self._upward_search(self.down, target)
+
+        best = INF
+        meeting = -1
+        small, large = (dist_f, dist_b) if len(dist_f) <= len(dist_b) else (dist_b, dist_f)
+        for v, d in small.items():
+            other = large.get(v)
+            if other is not None and d + other < best:
+                best = d + other
+                meeting = v
+
+        visited = len(dist_f) + len(dist_b)
+        if meeting == -1:
+            return INF, [], visited
+
+        # sobe de meeting até source e até target pelas árvores das buscas
+        forward = [meeting]
+        while pred_f[forward[-1]] != -1:
+            forward.append(pred_f[forward[-1]])
+        forward.reverse()
+        backward = [meeting]
+        while pred_b[backward[-1]] != -1:
+            backward.append(pred_b[backward[-1]])
+
+        hops = forward + backward[1:]
+        path = [hops[0]]
+        for a, b in zip(hops, hops[1:]):
+            path.extend(self._unpack(a, b)[1:])
+        return best, path, visited
+
+    def _edge_middle(self, a: int, b: int) -> int:
+        """
+        Nó intermediário da aresta a -> b da hierarquia (a de menor peso, se
+        houver mais de uma).
+        """
+        if self.rank[a] < self.rank[b]:
+            offsets, heads, weights, middles = self.up
+            owner, other = a, b
+        else:
+            offsets, heads, weights, middles = self.down
+            owner, other = b, a
+
+        best_w = INF
+        middle = NO_MIDDLE
+        for e in range(offsets[owner], offsets[owner + 1]):
+            if heads[e] == other and weights[e] < best_w:
+                best_w = weights[e]
+                middle = middles[e]
+        return middle
+
+    def _unpack(self, a: int, b: int) -> list[int]:
+        """
+        Substitui recursivamente o atalho a -> b pelas arestas originais.
+        """
+        path = [a]
+        stack = [(a, b)]
+        while stack:
+            u, v = stack.pop()
+            middle = self._edge_middle(u, v)
+            if middle == NO_MIDDLE:
+                path.append(v)
+            else:
+                # (middle, v) é processado depois de (u, middle)
+                stack.append((middle, v))
+                stack.append((u, middle))
+        return path
+
+    def many_to_many(self, sources: list[int], targets: list[int], should_stop=never) -> list[array]:
+        """
+        Distâncias de cada source para cada target com buckets: uma busca
+        reversa por target preenche os buckets dos nós alcançados e uma busca
+        direta por source combina as duas metades.
+        Retorna uma linha array('d') por source, na ordem de targets.
+        """
+        buckets: dict[int, list[tuple[int, float]]] = {}
+        for col, t in enumerate(targets):
+            check(should_stop)
+            dist_b, _ = self._upward_search(self.down, t)
+            for v, d in dist_b.items():
+                buckets.setdefault(v, []).append((col, d))
+
+        rows: list[array] = []
+        for s in sources:
+            check(should_stop)
+            row = array("d", [INF]) * len(targets)
+            dist_f, _ = self._upward_search(self.up, s)
+            for v, d in dist_f.items():
+                for col, db in buckets.get(v, ()):
+                    if d + db < row[col]:
+                        row[col] = d + db
+            rows.append(row)
+        return rows
+
+    def to_bytes(self) -> bytes:
+        parts = [
+            _HEADER.pack(_MAGIC, self.version, self.num_nodes, len(self.up[1]), len(self.down[1])),
+            self.rank.tobytes(),
+        ]
+        for offsets, heads, weights, middles in (self.up, self.down):
+            parts += [offsets.tobytes(), heads.tobytes(), weights.tobytes(), middles.tobytes()]
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Hierarchy":
+        magic, version, n, m_up, m_down = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC:
+            raise ValueError("Arquivo de hierarquia inválido.")
+
+        pos = _HEADER.size
+
+        def take(typecode: str, count: int) -> array:
+            nonlocal pos
+            arr = array(typecode)
+            size = arr.itemsize * count
+            arr.frombytes(data[pos:pos + size])
+            pos += size
+            return arr
+
+        rank = take("q", n)
+        up = (take("q", n + 1), take("q", m_up), take("d", m_up), take("q", m_up))
+        down = (take("q", n + 1), take("q", m_down), take("d", m_down), take("q", m_down))
+        if pos != len(data):
+            raise ValueError("Arquivo de hierarquia inválido.")
+        return cls(version, rank, up, down)
+
+
+def _witness_distances(out_adj, source: int, skip: int, limit: float, targets: set[int]):
+    """
+    Dijkstra local a partir de source sem passar por skip, até limit ou até
+    fixar WITNESS_SETTLE_LIMIT nós. Retorna as distâncias encontradas.
+    """
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    settled = 0
+    remaining = set(targets)
+    while heap and remaining:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        if d > limit or settled >= WITNESS_SETTLE_LIMIT:
+            break
+        settled += 1
+        remaining.discard(u)
+        for v, (w, _) in out_adj[u].items():
+            if v == skip:
+                continue
+            nd = d + w
+            if nd < dist.get(v, INF):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return dist
+
+
+def _shortcuts(out_adj, in_adj, v: int):
+    """
+    Atalhos u -> w necessários ao contrair v: aqueles em que u -> v -> w é
+    o único caminho mínimo conhecido (nenhuma testemunha mais curta).
+    """
+    result = []
+    outs = out_adj[v]
+    if not outs:
+        return result
+    max_out = max(w for w, _ in outs.values())
+    for u, (w_in, _) in in_adj[v].items():
+        if u == v:
+            continue
+        targets = {w for w in outs if w != u}
+        if not targets:
+            continue
+        dist = _witness_distances(out_adj, u, v, w_in + max_out, targets)
+        for w in targets:
+            via = w_in + outs[w][0]
+            if dist.get(w, INF) > via:
+                result.append((u, w, via))
+    return result
+
+
+def build(graph: CSRGraph, version: int = 0, order=None) -> Hierarchy:
+    """
+    Pré-processamento da contraction hierarchy.
+
+    A ordem de contração usa como prioridade a diferença de arestas
+    (atalhos criados - arestas removidas) mais a quantidade de vizinhos já
+    contraídos, com atualização preguiçosa da fila.
+
+    order (o rank de uma hierarquia anterior com os mesmos nós) fixa a
+    ordem: cada nó é contraído uma única vez, sem calcular prioridades, e
+    só os atalhos e seus pesos são refeitos. Qualquer ordem gera uma
+    hierarquia correta; a anterior continua boa depois de mudanças
+    pontuais de peso.
+    """
+    n = graph.num_nodes
+
+    # grafo restante: out_adj[u][v] = (peso, nó intermediário), menor peso
+    out_adj: list[dict[int, tuple[float, int]]] = [{} for _ in range(n)]
+    in_adj: list[dict[int, tuple[float, int]]] = [{} for _ in range(n)]
+    for u in range(n):
+        for e in range(graph.offsets[u], graph.offsets[u + 1]):
+            v = graph.targets[e]
+            w = graph.weights[e]
+            if v == u:
+                continue
+            if w < out_adj[u].get(v, (INF, NO_MIDDLE))[0]:
+                out_adj[u][v] = (w, NO_MIDDLE)
+                in_adj[v][u] = (w, NO_MIDDLE)
+
+    deleted_neighbors = [0] * n
+    rank = array("q", [0]) * n
+    up_lists: list[list[tuple[int, float, int]]] = [[] for _ in range(n)]
+    down_lists: list[list[tuple[int, float, int]]] = [[] for _ in range(n)]
+    contracted = bytearray(n)
+    order_count = 0
+
+    def priority(v: int) -> int:
+        added = len(_shortcuts(out_adj, in_adj, v))
+        removed = len(out_adj[v]) + len(in_adj[v])
+        return added - removed + deleted_neighbors[v]
+
+    def contract(v: int):
+        nonlocal order_count
+        shortcuts = _shortcuts(out_adj, in_adj, v)
+
+        # as arestas que sobraram ligam v a nós ainda não contraídos
+        up_lists[v] = [(w, wt, mid) for w, (wt, mid) in out_adj[v].items()]
+        down_lists[v] = [(u, wt, mid) for u, (wt, mid) in in_adj[v].items()]
+
+        for w in out_adj[v]:
+            del in_adj[w][v]
+            deleted_neighbors[w] += 1
+        for u in in_adj[v]:
+            del out_adj[u][v]
+            deleted_neighbors[u] += 1
+        out_adj[v] = {}
+        in_adj[v] = {}
+
+        for u, w, via in shortcuts:
+            if via < out_adj[u].get(w, (INF, NO_MIDDLE))[0]:
+                out_adj[u][w] = (via, v)
+                in_adj[w][u] = (via, v)
+
+        contracted[v] = 1
+        rank[v] = order_count
+        order_count += 1
+
+    if order is not None:
+        if len(order) != n:
+            raise ValueError("Ordem de contração com número de nós diferente do grafo.")
+        for v in sorted(range(n), key=order.__getitem__):
+            contract(v)
+        return Hierarchy(version, rank, _pack(up_lists), _pack(down_lists))
+
+    heap = [(priority(v), v) for v in range(n)]
+    heapq.heapify(heap)
+
+    while heap:
+        _, v = heapq.heappop(heap)
+        if contracted[v]:
+            continue
+        # atualização preguiçosa: se a prioridade piorou, devolve para a fila
+        current = priority(v)
+        if heap and current > heap[0][0]:
+            heapq.heappush(heap, (current, v))
+            continue
+        contract(v)
+
+    return Hierarchy(version, rank, _pack(up_lists), _pack(down_lists))
+
+
+def _pack(lists):
+    offsets = array("q", [0])
+    heads = array("q")
+    weights = array("d")
+    middles = array("q")
+    for items in lists:
+        for head, w, mid in items:
+            heads.append(head)
+            weights.append(w)
+            middles.append(mid)
+        offsets.append(len(heads))
+    return offsets, heads, weights, middles
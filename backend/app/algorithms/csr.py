@@ -0,0 +1,152 @@
+import heapq
+from array import array
+
+from app import metrics
+
+INF = float("inf")
+
+
+class CSRGraph:
+    """
+    Grafo dirigido em formato CSR (compressed sparse row).
+
+    Os ids dos nós são remapeados para índices densos 0..n-1 (na ordem de
+    node_ids). As arestas que saem do nó i ficam em
+    targets[offsets[i]:offsets[i + 1]] e weights[offsets[i]:offsets[i + 1]].
+    """
+
+    __slots__ = ("node_ids", "index", "offsets", "targets", "weights")
+
+    def __init__(self, node_ids, offsets, targets, weights):
+        self.node_ids = node_ids
+        self.index: dict[int, int] = {nid: i for i, nid in enumerate(node_ids)}
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+
+    @classmethod
+    def from_edges(cls, node_ids: list[int], edges) -> "CSRGraph":
+        """
+        Monta o CSR a partir de (from_node, to_node, weight).
+        Mantém a ordem original das arestas de cada nó e ignora arestas
+        cujos extremos não estão em node_ids.
+        """
+        index = {nid: i for i, nid in enumerate(node_ids)}
+        n = len(node_ids)
+
+        src = array("q")
+        dst = array("q")
+        wts = array("d")
+        for from_node, to_node, weight in edges:
+            u = index.get(from_node)
+            v = index.get(to_node)
+            if u is None or v is None:
+                continue
+            src.append(u)
+            dst.append(v)
+            wts.append(weight)
+
+        # counting sort estável pela origem
+        offsets = array("q", bytes(8 * (n + 1)))
+        for u in src:
+            offsets[u + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+
+        m = len(src)
+        targets = array("q", bytes(8 * m))
+        weights = array("d", bytes(8 * m))
+        fill = array("q", offsets[:n])
+        for e in range(m):
+            u = src[e]
+            pos = fill[u]
+            targets[pos] = dst[e]
+            weights[pos] = wts[e]
+            fill[u] = pos + 1
+
+        return cls(node_ids, offsets, targets, weights)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.targets)
+
+    def reversed(self) -> "CSRGraph":
+        """
+        Grafo transposto (arestas invertidas), com os mesmos índices densos.
+        """
+        offsets = self.offsets
+        edges = (
+            (self.node_ids[self.targets[e]], self.node_ids[u], self.weights[e])
+            for u in range(self.num_nodes)
+            for e in range(offsets[u], offsets[u + 1])
+        )
+        return CSRGraph.from_edges(self.node_ids, edges)
+
+    def neighbors(self, i: int):
+        """
+        Retorna [(índice do vizinho, peso), ...] do nó de índice i.
+        """
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return list(zip(self.targets[start:end], self.weights[start:end]))
+
+
+def dijkstra(graph: CSRGraph, source: int):
+    """
+    Dijkstra a partir do índice denso source.
+    Retorna (dist, pred) como arrays planos indexados pelo índice denso;
+    pred[v] == -1 quando v não tem predecessor.
+    """
+    n = graph.num_nodes
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+
+    dist = array("d", [INF]) * n
+    pred = array("q", [-1]) * n
+
+    dist[source] = 0.0
+    heap: list[tuple[float, int]] = [(0.0, source)]
+    heappop, heappush = heapq.heappop, heapq.heappush
+    pushes, settled = 1, 0
+
+    while heap:
+        d, u = heappop(heap)
+        if d > dist[u]:
+            continue
+        settled += 1
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            nd = d + weights[e]
+            if nd < dist[v]:
+                dist[v] = nd
+                pred[v] = u
+                heappush(heap, (nd, v))
+                pushes += 1
+
+    metrics.search("dijkstra", pushes, settled)
+    return dist, pred
+
+
+def reconstruct_path(pred, source: int, target: int) -> list[int]:
+    """
+    Reconstrói o caminho (em índices densos) de source até target.
+    Se não houver caminho, retorna lista vazia.
+    """
+    if source == target:
+        return [source]
+
+    path: list[int] = []
+    cur = target
+    while cur != -1:
+        path.append(cur)
+        if cur == source:
+            break
+        cur = pred[cur]
+
+    if path[-1] != source:
+        return []
+
+    path.reverse()
+    return path
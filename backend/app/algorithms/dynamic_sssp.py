@@ -0,0 +1,100 @@
+import heapq
+
+from app.algorithms.csr import INF, CSRGraph
+
+
+def _min_weight(graph: CSRGraph, u: int, v: int) -> float:
+    best = INF
+    for e in range(graph.offsets[u], graph.offsets[u + 1]):
+        if graph.targets[e] == v and graph.weights[e] < best:
+            best = graph.weights[e]
+    return best
+
+
+def _subtrees(pred, roots: list[int]) -> set[int]:
+    """
+    Nós cuja árvore de caminhos mínimos passa por algum dos roots.
+    """
+    children: dict[int, list[int]] = {}
+    for x, p in enumerate(pred):
+        if p != -1:
+            children.setdefault(p, []).append(x)
+
+    affected: set[int] = set()
+    stack = list(roots)
+    while stack:
+        x = stack.pop()
+        if x in affected:
+            continue
+        affected.add(x)
+        stack.extend(children.get(x, ()))
+    return affected
+
+
+def repair(graph: CSRGraph, reverse: CSRGraph, dist, pred,
+           increased: list[tuple[int, int]], decreased: list[tuple[int, int]]) -> int:
+    """
+    Atualiza no lugar uma árvore de caminhos mínimos (dist, pred, como em
+    csr.dijkstra) depois de mudanças em arestas. graph e reverse já são o
+    grafo novo; increased lista os pares (u, v) com aresta removida ou mais
+    cara, decreased os pares com aresta nova ou mais barata.
+
+    - aumentos: só importam arestas da árvore (pred[v] == u). A subárvore de
+      v perde as distâncias e cada nó dela recebe o melhor valor vindo de
+      vizinhos de fora da subárvore;
+    - reduções: v melhora se dist[u] + w < dist[v];
+    - por fim, um Dijkstra propaga as melhoras a partir dos nós alterados.
+    Retorna quantos nós terminaram com a distância diferente da anterior
+    (0 = distâncias intactas; pred pode ter mudado em empates).
+    """
+    heap: list[tuple[float, int]] = []
+    # distância anterior de cada nó mexido: um nó da subárvore pode voltar
+    # à mesma distância por outro caminho
+    before: dict[int, float] = {}
+
+    roots = [v for u, v in increased if pred[v] == u]
+    if roots:
+        affected = _subtrees(pred, roots)
+        for x in affected:
+            before[x] = dist[x]
+            dist[x] = INF
+            pred[x] = -1
+        for x in affected:
+            best, parent = INF, -1
+            for e in range(reverse.offsets[x], reverse.offsets[x + 1]):
+                y = reverse.targets[e]
+                if y in affected:
+                    continue
+                nd = dist[y] + reverse.weights[e]
+                if nd < best:
+                    best, parent = nd, y
+            if parent != -1:
+                dist[x] = best
+                pred[x] = parent
+                heapq.heappush(heap, (best, x))
+
+    for u, v in decreased:
+        if dist[u] == INF:
+            continue
+        nd = dist[u] + _min_weight(graph, u, v)
+        if nd < dist[v]:
+            before.setdefault(v, dist[v])
+            dist[v] = nd
+            pred[v] = u
+            heapq.heappush(heap, (nd, v))
+
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            nd = d + weights[e]
+            if nd < dist[v]:
+                before.setdefault(v, dist[v])
+                dist[v] = nd
+                pred[v] = u
+                heapq.heappush(heap, (nd, v))
+
+    return sum(1 for x, d in before.items() if dist[x] != d)
@@ -0,0 +1,92 @@
+INF = float("inf")
+
+
+def precedence_components(prereq_masks: list[int]) -> list[list[int]]:
+    """
+    Grupos de jobs ligados por precedências (em qualquer sentido, direta ou
+    indiretamente), em ordem do menor índice; cada grupo precisa ficar num
+    mesmo veículo (ex.: um pickup e o seu dropoff).
+    """
+    n = len(prereq_masks)
+    parent = list(range(n))
+
+    def find(k: int) -> int:
+        while parent[k] != k:
+            parent[k] = parent[parent[k]]
+            k = parent[k]
+        return k
+
+    for k, mask in enumerate(prereq_masks):
+        i = 0
+        while mask:
+            if mask & 1:
+                a, b = find(i), find(k)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+            mask >>= 1
+            i += 1
+
+    groups: dict[int, list[int]] = {}
+    for k in range(n):
+        groups.setdefault(find(k), []).append(k)
+    return list(groups.values())
+
+
+def partition(start_rows: list[list[float]], job_to_job: list[list[float]],
+              components: list[list[int]], max_jobs: int):
+    """
+    Divide os grupos de jobs entre os veículos (um por linha de start_rows,
+    com os custos do nó inicial do veículo até cada job).
+
+    Os clusters crescem a partir dos nós iniciais, ao mesmo tempo: a cada
+    passo o grupo ainda livre mais próximo de algum cluster (do nó inicial
+    ou de um job já atribuído ao veículo) entra nele. Um veículo só recebe
+    um grupo se continuar com no máximo max_jobs jobs, a não ser que ainda
+    esteja vazio. Quando nenhum tem espaço, entre os grupos restantes e os
+    veículos que os alcançam fica o par que deixa o veículo com menos jobs,
+    desempatado pelo custo de inserção (distância até o cluster).
+
+    Retorna (índices dos jobs por veículo, jobs que nenhum veículo alcança).
+    """
+    vehicles = len(start_rows)
+    # reach[c][v]: menor custo do cluster do veículo v até algum job do grupo c
+    reach = [
+        [min(row[k] for k in group) for row in start_rows]
+        for group in components
+    ]
+    assigned: list[list[int]] = [[] for _ in range(vehicles)]
+    pending = set(range(len(components)))
+    unreachable: list[int] = []
+
+    while pending:
+        best_cost, best_group, best_vehicle = INF, -1, -1
+        for c in sorted(pending):
+            size = len(components[c])
+            for v in range(vehicles):
+                if assigned[v] and len(assigned[v]) + size > max_jobs:
+                    continue
+                if reach[c][v] < best_cost:
+                    best_cost, best_group, best_vehicle = reach[c][v], c, v
+
+        if best_group == -1:
+            # sem espaço (ou sem custo finito) em nenhum veículo
+            options = [
+                (len(assigned[v]) + len(components[c]), reach[c][v], c, v)
+                for c in pending for v in range(vehicles) if reach[c][v] < INF
+            ]
+            if not options:
+                for c in sorted(pending):
+                    unreachable.extend(components[c])
+                break
+            _, _, best_group, best_vehicle = min(options)
+        pending.discard(best_group)
+
+        group = components[best_group]
+        assigned[best_vehicle].extend(group)
+        for c in pending:
+            row = reach[c]
+            nearest = min(job_to_job[i][k] for i in group for k in components[c])
+            if nearest < row[best_vehicle]:
+                row[best_vehicle] = nearest
+
+    return [sorted(jobs) for jobs in assigned], sorted(unreachable)
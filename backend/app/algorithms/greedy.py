@@ -0,0 +1,152 @@
+from app.algorithms.cancel import check, never
+
+INF = float("inf")
+
+# motivos de falha do guloso
+NO_AVAILABLE_JOB = "no_available_job"
+UNREACHABLE = "unreachable"
+# há jobs disponíveis e alcançáveis, mas todos estourariam a capacidade ou
+# chegariam depois do fim da janela
+CONSTRAINED = "constrained"
+
+# estados visitados no máximo por feasible_order antes de desistir
+SEARCH_LIMIT = 200_000
+
+
+def greedy_order(start_to_job: list[float], job_to_job: list[list[float]], prereq_masks: list[int],
+                 constraints=None):
+    """
+    Vizinho mais próximo respeitando precedências: a partir do nó inicial,
+    sempre executa o job disponível mais barato (menor índice nos empates).
+    Com constraints (ver constraints.Constraints), pula os jobs que
+    estourariam a capacidade ou perderiam a janela; com janelas, o mais
+    barato é o que termina o atendimento mais cedo.
+
+    Retorna (custo, ordem dos índices dos jobs, falha), onde falha é None,
+    NO_AVAILABLE_JOB, UNREACHABLE ou CONSTRAINED; em caso de falha a ordem
+    é parcial.
+    """
+    n = len(start_to_job)
+    done = 0
+    order: list[int] = []
+    total_cost = 0.0
+    costs = start_to_job
+    clock = 0.0
+    load = 0.0
+
+    while len(order) < n:
+        best_job = -1
+        best_cost = INF
+        best_key = INF
+        found_available = False
+        found_reachable = False
+        for k in range(n):
+            if (done >> k) & 1 or prereq_masks[k] & ~done:
+                continue
+            found_available = True
+            if costs[k] == INF:
+                continue
+            found_reachable = True
+            key = costs[k]
+            if constraints is not None:
+                if not constraints.fits(load + constraints.load[k]):
+                    continue
+                departure = constraints.depart(clock, costs[k], k)
+                if departure == INF:
+                    continue
+                if constraints.timed:
+                    key = departure
+            if key < best_key:
+                best_key = key
+                best_cost = costs[k]
+                best_job = k
+
+        if not found_available:
+            return INF, order, NO_AVAILABLE_JOB
+        if not found_reachable:
+            return INF, order, UNREACHABLE
+        if best_job == -1:
+            return INF, order, CONSTRAINED
+
+        total_cost += best_cost
+        done |= 1 << best_job
+        order.append(best_job)
+        costs = job_to_job[best_job]
+        if constraints is not None:
+            load += constraints.load[best_job]
+            clock = constraints.depart(clock, best_cost, best_job)
+
+    return total_cost, order, None
+
+
+def feasible_order(start_to_job: list[float], job_to_job: list[list[float]], prereq_masks: list[int],
+                   constraints, should_stop=never, limit: int = SEARCH_LIMIT):
+    """
+    Uma ordem que respeita precedências, capacidade e janelas, para quando
+    greedy_order empaca (CONSTRAINED) mas pode haver rota: busca em
+    profundidade que tenta primeiro o job cuja janela fecha mais cedo
+    (depois o que sai mais cedo) e volta atrás quando nenhum cabe.
+
+    Um estado sem saída (jobs feitos, último job, horário de saída) poda os
+    iguais com saída no mesmo horário ou depois: esperar é permitido, então
+    sair mais tarde nunca ajuda. Sem janelas o horário nem importa.
+
+    Retorna (custo de viagem, ordem) ou (INF, []) se não houver ordem
+    viável ou se a busca passar de limit estados.
+    """
+    n = len(start_to_job)
+    full = (1 << n) - 1
+    timed = constraints.timed
+    # (jobs feitos, último job) -> menor horário de saída já sem saída
+    dead: dict[tuple[int, int], float] = {}
+
+    def options(done: int, last: int, clock: float, load: float) -> list:
+        costs = start_to_job if last == -1 else job_to_job[last]
+        found = []
+        for k in range(n):
+            if (done >> k) & 1 or prereq_masks[k] & ~done or costs[k] == INF:
+                continue
+            new_load = load + constraints.load[k]
+            if not constraints.fits(new_load):
+                continue
+            departure = constraints.depart(clock, costs[k], k)
+            if departure == INF:
+                continue
+            found.append((constraints.due[k], departure, k, new_load))
+        # pop() tira o de janela mais apertada
+        found.sort(reverse=True)
+        return found
+
+    # uma entrada por job da ordem parcial (mais a raiz): (feitos, último,
+    # saída, carga, opções ainda não tentadas)
+    stack = [(0, -1, 0.0, 0.0, options(0, -1, 0.0, 0.0))]
+    order: list[int] = []
+    visited = 0
+    while stack:
+        done, last, clock, load, remaining = stack[-1]
+        if done == full:
+            total = start_to_job[order[0]] if order else 0.0
+            for a, b in zip(order, order[1:]):
+                total += job_to_job[a][b]
+            return total, order
+        if not remaining:
+            stack.pop()
+            if last != -1:
+                when = clock if timed else 0.0
+                dead[(done, last)] = min(dead.get((done, last), INF), when)
+                order.pop()
+            continue
+
+        _, departure, k, new_load = remaining.pop()
+        done_k = done | (1 << k)
+        if dead.get((done_k, k), INF) <= (departure if timed else 0.0):
+            continue
+        visited += 1
+        if visited > limit:
+            return INF, []
+        if not visited & 1023:
+            check(should_stop)
+        order.append(k)
+        stack.append((done_k, k, departure, new_load, options(done_k, k, departure, new_load)))
+
+    return INF, []
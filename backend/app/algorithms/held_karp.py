@@ -0,0 +1,611 @@
+import os
+import sys
+from array import array
+from bisect import bisect_left
+
+from app import metrics
+from app.algorithms.cancel import check, never, no_progress
+
+try:
+    import numpy as np
+except ImportError:  # sem NumPy só o backend em Python puro fica disponível
+    np = None
+
+INF = float("inf")
+
+PYTHON = "python"
+NUMPY = "numpy"
+
+# marcador de "veio direto do nó inicial" na tabela de pais
+NO_PARENT = -1
+
+# memória máxima (em MB) que as tabelas do DP podem ocupar
+MEMORY_BUDGET_BYTES = int(os.environ.get("OPTIMAL_ROUTE_MEMORY_MB", 512)) * 1024 * 1024
+
+# até este número de jobs as máscaras cabem em int64 (bit 63 é o sinal);
+# acima dele a tabela de ranks é uma lista de ints do Python
+INT64_JOBS = 63
+
+
+class MemoryBudgetExceeded(Exception):
+    """
+    O DP para este conjunto de jobs não cabe no orçamento de memória.
+    """
+
+    def __init__(self, required_bytes: int, budget_bytes: int):
+        self.required_bytes = required_bytes
+        self.budget_bytes = budget_bytes
+        super().__init__(
+            f"DP precisaria de pelo menos {required_bytes / 2**20:.0f} MB "
+            f"(limite: {budget_bytes / 2**20:.0f} MB)."
+        )
+
+    def __reduce__(self):
+        # volta de um processo worker com os mesmos argumentos
+        return type(self), (self.required_bytes, self.budget_bytes)
+
+
+class Layout:
+    """
+    Tabelas compactas do DP:
+    - masks: máscaras fechadas por precedência, em ordem crescente; o rank de
+      uma máscara (posição em masks) é a linha dela em dp/parent. É um
+      array de int64 até INT64_JOBS jobs e uma lista de ints acima disso
+    - cost_type / parent_type: typecodes de array para custos e pais
+    """
+
+    def __init__(self, n: int, masks: array, cost_type: str, parent_type: str):
+        self.n = n
+        self.masks = masks
+        self.cost_type = cost_type
+        self.parent_type = parent_type
+
+    @property
+    def size(self) -> int:
+        return len(self.masks)
+
+    def footprint(self) -> int:
+        return _footprint(self.n, self.size, self.cost_type, self.parent_type)
+
+
+def prerequisite_masks(jobs: list[int], prereqs: dict[int, set[int]]) -> list[int]:
+    """
+    Converte os pré-requisitos de cada job em bitmasks sobre os índices de jobs:
+    o bit i de masks[k] indica que jobs[i] precisa ser feito antes de jobs[k].
+    """
+    job_index = {job_id: i for i, job_id in enumerate(jobs)}
+    masks = [0] * len(jobs)
+    for k, job_id in enumerate(jobs):
+        for before in prereqs[job_id]:
+            masks[k] |= 1 << job_index[before]
+    return masks
+
+
+def resolve_backend(backend: str) -> str:
+    """
+    Traduz "auto" para o backend disponível e cai para Python puro
+    quando o NumPy não está instalado.
+    """
+    if backend in ("auto", NUMPY):
+        return NUMPY if np is not None else PYTHON
+    return PYTHON
+
+
+def _rank_bytes(n: int) -> int:
+    # bytes por máscara na tabela de ranks: int64 ou ponteiro + int do Python
+    if n <= INT64_JOBS:
+        return 8
+    return 8 + sys.getsizeof(1 << (n - 1))
+
+
+def _footprint(n: int, count: int, cost_type: str, parent_type: str) -> int:
+    per_mask = _rank_bytes(n) + n * (array(cost_type).itemsize + array(parent_type).itemsize)
+    return count * per_mask
+
+
+def feasible_masks(prereq_masks: list[int], limit: int | None = None,
+                   should_stop=never, constraints=None) -> list[int] | None:
+    """
+    Enumera, camada por camada, as máscaras não vazias fechadas por
+    precedência (todo job da máscara tem seus pré-requisitos nela), em
+    ordem crescente. Retorna None assim que a contagem passar de limit.
+
+    Com capacidade (constraints.loaded), só entram as máscaras cuja carga
+    cabe no veículo e que são alcançadas a partir de outra que também
+    cabe: a carga depois de um prefixo da rota só depende dos jobs feitos,
+    então as demais nunca fazem parte de uma rota viável e nem chegam a
+    ocupar linha nas tabelas.
+    """
+    n = len(prereq_masks)
+    loads = constraints.load if constraints is not None and constraints.loaded else None
+    found: list[int] = []
+    # máscara -> carga depois de executá-la
+    layer = {0: 0.0}
+    for _ in range(n):
+        check(should_stop)
+        next_layer: dict[int, float] = {}
+        for mask, load in layer.items():
+            for k in range(n):
+                if not (mask >> k) & 1 and not prereq_masks[k] & ~mask:
+                    if loads is None:
+                        next_layer[mask | (1 << k)] = 0.0
+                    elif constraints.fits(load + loads[k]):
+                        next_layer[mask | (1 << k)] = load + loads[k]
+        found.extend(next_layer)
+        if limit is not None and len(found) > limit:
+            return None
+        layer = next_layer
+
+    found.sort()
+    return found
+
+
+def plan(prereq_masks: list[int], budget_bytes: int = MEMORY_BUDGET_BYTES,
+         should_stop=never, constraints=None) -> Layout:
+    """
+    Dimensiona as tabelas do DP antes de alocá-las.
+
+    Usa float64 para custos quando couber no orçamento e float32 caso
+    contrário; pais em int8 (ou int16 acima de 127 jobs); máscaras em
+    int64 até INT64_JOBS jobs. Levanta MemoryBudgetExceeded se nem com
+    float32 as tabelas couberem.
+    """
+    n = len(prereq_masks)
+    parent_type = "b" if n < 128 else "h"
+
+    limit = budget_bytes // _footprint(n, 1, "f", parent_type)
+    masks = feasible_masks(prereq_masks, limit, should_stop, constraints)
+    if masks is None:
+        raise MemoryBudgetExceeded(_footprint(n, limit + 1, "f", parent_type), budget_bytes)
+
+    cost_type = "d"
+    if _footprint(n, len(masks), cost_type, parent_type) > budget_bytes:
+        cost_type = "f"
+    if n <= INT64_JOBS:
+        masks = array("q", masks)
+    return Layout(n, masks, cost_type, parent_type)
+
+
+def solve(start_to_job: list[float], job_to_job: list[list[float]], prereq_masks: list[int],
+          backend: str = PYTHON, budget_bytes: int = MEMORY_BUDGET_BYTES, should_stop=never,
+          progress=no_progress, constraints=None):
+    """
+    Resolve o Held–Karp no backend pedido (ver resolve_backend).
+    Retorna (custo, ordem dos índices dos jobs) ou (INF, []) se não houver rota.
+    should_stop() verdadeiro interrompe o cálculo com cancel.Cancelled;
+    progress recebe a camada (numpy) ou os estados processados (python).
+
+    Com constraints (ver constraints.Constraints), a capacidade poda as
+    máscaras em plan e as janelas descartam transições que chegariam tarde
+    demais; com janelas o custo devolvido é o horário de término.
+    """
+    layout = plan(prereq_masks, budget_bytes, should_stop, constraints)
+    timed = constraints if constraints is not None and constraints.timed else None
+    if resolve_backend(backend) == NUMPY:
+        order = solve_numpy(start_to_job, job_to_job, prereq_masks, layout, should_stop, progress,
+                            timed)
+    else:
+        order = solve_python(start_to_job, job_to_job, prereq_masks, layout, should_stop, progress,
+                             timed)
+
+    if not order:
+        return INF, []
+    if timed is not None:
+        return timed.value(start_to_job, job_to_job, order), order
+    # com custos em float32 o total é recalculado em float64 a partir da ordem
+    return route_cost(start_to_job, job_to_job, order), order
+
+
+def route_cost(start_to_job: list[float], job_to_job: list[list[float]], order: list[int]) -> float:
+    total = start_to_job[order[0]]
+    for a, b in zip(order, order[1:]):
+        total += job_to_job[a][b]
+    return total
+
+
+def _rank(masks, mask: int) -> int:
+    """
+    Rank de mask em masks, ou -1 se a máscara foi podada (capacidade).
+    """
+    rank = bisect_left(masks, mask)
+    if rank < len(masks) and masks[rank] == mask:
+        return rank
+    return -1
+
+
+def solve_python(start_to_job: list[float], job_to_job: list[list[float]], prereq_masks: list[int],
+                 layout: Layout, should_stop=never, progress=no_progress,
+                 timed=None) -> list[int]:
+    """
+    Held–Karp com precedências sobre bitmasks, em Python puro.
+
+    dp[rank(mask) * n + last] é o menor custo para, saindo do nó inicial,
+    executar exatamente os jobs de mask terminando em last. Só as máscaras
+    fechadas por precedência (layout.masks) têm linha nas tabelas; um job k só
+    é adicionado a mask se prereq_masks[k] & ~mask == 0 e mask | k estiver
+    em layout.masks.
+
+    Com timed (restrições com janelas), dp guarda o horário de saída de
+    last: esperar é permitido, então sair mais cedo nunca é pior e o
+    mínimo por estado continua exato.
+
+    Retorna a ordem dos índices dos jobs ou [] se não houver rota.
+    """
+    n = layout.n
+    masks = layout.masks
+    count = layout.size
+
+    dp = array(layout.cost_type, [INF]) * (count * n)
+    parent = array(layout.parent_type, [NO_PARENT]) * (count * n)
+
+    for k in range(n):
+        if prereq_masks[k]:
+            continue
+        cost = start_to_job[k]
+        if timed is not None:
+            cost = timed.depart(0.0, cost, k)
+        rank = _rank(masks, 1 << k)
+        if cost == INF or rank == -1:
+            continue
+        dp[rank * n + k] = cost
+
+    if timed is not None:
+        ready, due, service = timed.ready, timed.due, timed.service
+
+    # estados (mask, last) alcançados cujas transições foram testadas
+    expanded = 0
+    for rank in range(count):
+        if not rank & 1023:
+            check(should_stop)
+            progress(masks_done=rank, masks=count)
+        mask = masks[rank]
+
+        # jobs ainda não feitos cujos pré-requisitos já estão em mask
+        available = [
+            k for k in range(n)
+            if not (mask >> k) & 1 and not prereq_masks[k] & ~mask
+        ]
+        targets = []
+        for k in available:
+            target = _rank(masks, mask | (1 << k))
+            if target != -1:
+                targets.append((k, target * n + k))
+        if not targets:
+            continue
+
+        base = rank * n
+        for last in range(n):
+            cur_cost = dp[base + last]
+            if cur_cost == INF:
+                continue
+            expanded += 1
+
+            row = job_to_job[last]
+            for k, idx in targets:
+                move_cost = row[k]
+                if move_cost == INF:
+                    continue
+                new_cost = cur_cost + move_cost
+                if timed is not None:
+                    if new_cost < ready[k]:
+                        new_cost = ready[k]
+                    if new_cost > due[k]:
+                        continue
+                    new_cost += service[k]
+                if new_cost < dp[idx]:
+                    dp[idx] = new_cost
+                    parent[idx] = last
+
+    metrics.count("solver_states_total", expanded, solver="held_karp")
+    return _best_order(dp, parent, layout)
+
+
+def solve_numpy(start_to_job: list[float], job_to_job: list[list[float]], prereq_masks: list[int],
+                layout: Layout, should_stop=never, progress=no_progress,
+                timed=None) -> list[int]:
+    """
+    Mesmo DP de solve_python, vetorizado por camada de popcount.
+
+    As máscaras com p jobs formam uma camada. Para cada job k, todas as
+    máscaras da camada que podem receber k são estendidas de uma vez:
+    dp[mask | k, k] = mínimo, sobre last, de dp[mask, last] + job_to_job[last, k].
+    Como mask | k determina mask, não há colisões dentro de uma camada.
+    Com timed, a janela e o atendimento de k valem sobre a chegada mais
+    cedo, que é a melhor (ver solve_python).
+    """
+    n = layout.n
+    count = layout.size
+    masks, prereq = _mask_arrays(layout, prereq_masks)
+    cost_to = np.asarray(job_to_job, dtype=np.float64).reshape(n, n)
+
+    cost_dtype = np.float64 if layout.cost_type == "d" else np.float32
+    parent_dtype = np.int8 if layout.parent_type == "b" else np.int16
+    dp = np.full((count, n), np.inf, dtype=cost_dtype)
+    parent = np.full((count, n), NO_PARENT, dtype=parent_dtype)
+
+    for k in range(n):
+        if prereq_masks[k]:
+            continue
+        cost = start_to_job[k]
+        if timed is not None:
+            cost = timed.depart(0.0, cost, k)
+        rank = _rank(layout.masks, 1 << k)
+        if cost == INF or rank == -1:
+            continue
+        dp[rank, k] = cost
+
+    popcount = np.zeros(count, dtype=np.int64)
+    for k in range(n):
+        popcount += ((masks >> k) & 1).astype(np.int64)
+
+    # estados alcançados expandidos, contados como em solve_python: linhas da
+    # camada com algum sucessor, colunas com custo finito
+    expanded = 0
+    for p in range(1, n):
+        check(should_stop)
+        progress(layer=p, layers=n)
+        layer_ranks = np.flatnonzero(popcount == p)
+        layer_masks = masks[layer_ranks]
+        has_next = np.zeros(layer_ranks.size, dtype=bool)
+
+        for k in range(n):
+            bit = 1 << k
+            fits = ((layer_masks & bit) == 0) & ((prereq[k] & ~layer_masks) == 0)
+            if not fits.any():
+                continue
+            dst, found = _ranks(masks, layer_masks[fits] | bit)
+            has_next[fits] |= found
+
+            candidates = dp[layer_ranks[fits]] + cost_to[:, k]
+            best_last = candidates.argmin(axis=1)
+            best = candidates[np.arange(best_last.size), best_last]
+
+            ok = best < np.inf
+            if timed is not None:
+                best = np.maximum(best, timed.ready[k])
+                ok &= best <= timed.due[k]
+                best = best + timed.service[k]
+            ok &= found
+            if not ok.any():
+                continue
+            dst = dst[ok]
+            dp[dst, k] = best[ok]
+            parent[dst, k] = best_last[ok]
+
+        expanded += int(np.isfinite(dp[layer_ranks[has_next]]).sum())
+
+    metrics.count("solver_states_total", expanded, solver="held_karp")
+    return _best_order(dp.ravel(), parent.ravel(), layout)
+
+
+def _mask_arrays(layout: Layout, prereq_masks: list[int]):
+    """
+    Máscaras e pré-requisitos como arrays do NumPy: int64 até INT64_JOBS
+    jobs; acima disso, arrays de objetos (ints do Python), mais lentos mas
+    com as mesmas operações.
+    """
+    if layout.n <= INT64_JOBS:
+        return (np.frombuffer(layout.masks, dtype=np.int64),
+                np.asarray(prereq_masks, dtype=np.int64))
+    return np.array(layout.masks, dtype=object), np.array(prereq_masks, dtype=object)
+
+
+def _ranks(masks, targets):
+    """
+    Versão vetorizada de _rank: (ranks, encontradas); os ranks das
+    máscaras podadas não valem nada.
+    """
+    ranks = np.searchsorted(masks, targets)
+    found = masks[np.minimum(ranks, masks.size - 1)] == targets
+    return ranks, found
+
+
+class CostToGo:
+    """
+    DP de sufixos (ver solve_cost_to_go), que não depende do nó inicial:
+    go[rank(mask) * n + last] é o menor custo para executar os jobs fora de
+    mask partindo de last (último job feito), e nxt o próximo job dessa
+    rota. Com as tabelas prontas, a rota ótima de qualquer nó inicial sai
+    em O(n²) a partir de start_to_job (ver route).
+    """
+
+    def __init__(self, layout: Layout, prereq_masks: list[int], go, nxt):
+        self.layout = layout
+        self.prereq_masks = prereq_masks
+        self.go = go
+        self.nxt = nxt
+
+    def route(self, start_to_job: list[float], job_to_job: list[list[float]]):
+        """
+        Retorna (custo, ordem dos índices dos jobs) ou (INF, []) se não houver rota.
+        """
+        n = self.layout.n
+        masks = self.layout.masks
+        best_cost = INF
+        first = -1
+        for k in range(n):
+            if self.prereq_masks[k] or start_to_job[k] == INF:
+                continue
+            rank = _rank(masks, 1 << k)
+            if rank == -1:
+                continue
+            cost = start_to_job[k] + self.go[rank * n + k]
+            if cost < best_cost:
+                best_cost, first = cost, k
+        if first == -1:
+            return INF, []
+
+        order = [first]
+        mask = 1 << first
+        while len(order) < n:
+            last = int(self.nxt[bisect_left(masks, mask) * n + order[-1]])
+            order.append(last)
+            mask |= 1 << last
+        return route_cost(start_to_job, job_to_job, order), order
+
+
+def solve_cost_to_go(job_to_job: list[list[float]], prereq_masks: list[int],
+                     backend: str = PYTHON, budget_bytes: int = MEMORY_BUDGET_BYTES,
+                     should_stop=never, progress=no_progress, constraints=None) -> CostToGo:
+    """
+    Held–Karp de trás para frente: as mesmas máscaras e o mesmo orçamento de
+    memória de solve, mas as tabelas guardam o custo para terminar a rota,
+    que só depende de job_to_job. Usado para resolver vários nós iniciais
+    com uma única passada do DP.
+
+    A capacidade de constraints poda as máscaras como em solve; janelas de
+    tempo dependem do horário de saída do nó inicial e não cabem aqui
+    (ValueError).
+    """
+    if constraints is not None and constraints.timed:
+        raise ValueError("DP de sufixos não suporta janelas de tempo.")
+    layout = plan(prereq_masks, budget_bytes, should_stop, constraints)
+    if resolve_backend(backend) == NUMPY:
+        go, nxt = _cost_to_go_numpy(job_to_job, prereq_masks, layout, should_stop, progress)
+    else:
+        go, nxt = _cost_to_go_python(job_to_job, prereq_masks, layout, should_stop, progress)
+    return CostToGo(layout, prereq_masks, go, nxt)
+
+
+def _cost_to_go_python(job_to_job, prereq_masks, layout: Layout, should_stop, progress):
+    n = layout.n
+    masks = layout.masks
+    count = layout.size
+
+    go = array(layout.cost_type, [INF]) * (count * n)
+    nxt = array(layout.parent_type, [NO_PARENT]) * (count * n)
+    if not _has_full(layout):
+        return go, nxt
+
+    # máscara completa: nada mais a fazer, de qualquer último job
+    full_base = (count - 1) * n
+    for last in range(n):
+        go[full_base + last] = 0.0
+
+    # mask | k é maior que mask: percorrendo os ranks do maior para o menor,
+    # as linhas de destino já estão prontas
+    expanded = 0
+    for rank in range(count - 2, -1, -1):
+        if not rank & 1023:
+            check(should_stop)
+            progress(masks_done=count - rank, masks=count)
+        mask = masks[rank]
+
+        available = [
+            k for k in range(n)
+            if not (mask >> k) & 1 and not prereq_masks[k] & ~mask
+        ]
+        sources = []
+        for k in available:
+            source = _rank(masks, mask | (1 << k))
+            if source != -1:
+                sources.append((k, source * n + k))
+        if not sources:
+            continue
+
+        base = rank * n
+        for last in range(n):
+            if not (mask >> last) & 1:
+                continue
+            expanded += 1
+            row = job_to_job[last]
+            best_cost, best_next = INF, NO_PARENT
+            for k, idx in sources:
+                cost = row[k] + go[idx]
+                if cost < best_cost:
+                    best_cost, best_next = cost, k
+            if best_next != NO_PARENT:
+                go[base + last] = best_cost
+                nxt[base + last] = best_next
+
+    metrics.count("solver_states_total", expanded, solver="cost_to_go")
+    return go, nxt
+
+
+def _cost_to_go_numpy(job_to_job, prereq_masks, layout: Layout, should_stop, progress):
+    n = layout.n
+    count = layout.size
+    masks, prereq = _mask_arrays(layout, prereq_masks)
+    cost_to = np.asarray(job_to_job, dtype=np.float64).reshape(n, n)
+
+    cost_dtype = np.float64 if layout.cost_type == "d" else np.float32
+    parent_dtype = np.int8 if layout.parent_type == "b" else np.int16
+    go = np.full((count, n), np.inf, dtype=cost_dtype)
+    nxt = np.full((count, n), NO_PARENT, dtype=parent_dtype)
+    if not _has_full(layout):
+        return go.ravel(), nxt.ravel()
+    go[count - 1] = 0.0
+
+    popcount = np.zeros(count, dtype=np.int64)
+    for k in range(n):
+        popcount += ((masks >> k) & 1).astype(np.int64)
+
+    # camada p depende só da camada p + 1; linhas com last fora de mask
+    # também são preenchidas, mas nunca são lidas (nem contadas: são p
+    # estados por máscara com algum sucessor, como em _cost_to_go_python)
+    expanded = 0
+    for p in range(n - 1, 0, -1):
+        check(should_stop)
+        progress(layer=n - p, layers=n)
+        layer_ranks = np.flatnonzero(popcount == p)
+        layer_masks = masks[layer_ranks]
+        has_next = np.zeros(layer_ranks.size, dtype=bool)
+
+        for k in range(n):
+            bit = 1 << k
+            fits = ((layer_masks & bit) == 0) & ((prereq[k] & ~layer_masks) == 0)
+            if not fits.any():
+                continue
+            src, found = _ranks(masks, layer_masks[fits] | bit)
+            has_next[fits] |= found
+            if not found.any():
+                continue
+            rows = layer_ranks[fits][found]
+            src = src[found]
+            candidates = go[src, k][:, None] + cost_to[:, k]
+            better = candidates < go[rows]
+            go[rows] = np.where(better, candidates, go[rows])
+            nxt[rows] = np.where(better, k, nxt[rows])
+
+        expanded += p * int(has_next.sum())
+
+    metrics.count("solver_states_total", expanded, solver="cost_to_go")
+    return go.ravel(), nxt.ravel()
+
+
+def _has_full(layout: Layout) -> bool:
+    # a máscara completa é sempre fechada e, se não foi podada, é a maior
+    return layout.size > 0 and layout.masks[-1] == (1 << layout.n) - 1
+
+
+def _best_order(dp, parent, layout: Layout) -> list[int]:
+    n = layout.n
+    if not _has_full(layout):
+        return []
+    full_rank = layout.size - 1
+    base = full_rank * n
+    best_cost = INF
+    best_last = -1
+    for last in range(n):
+        if dp[base + last] < best_cost:
+            best_cost = dp[base + last]
+            best_last = last
+
+    if best_last == -1:
+        return []
+    return _reconstruct(parent, layout, full_rank, best_last)
+
+
+def _reconstruct(parent, layout: Layout, rank: int, last: int) -> list[int]:
+    n = layout.n
+    mask = layout.masks[rank]
+    order: list[int] = []
+    while last != NO_PARENT:
+        order.append(last)
+        prev = int(parent[rank * n + last])
+        mask ^= 1 << last
+        if mask:
+            rank = bisect_left(layout.masks, mask)
+        last = prev
+    order.reverse()
+    return order
@@ -0,0 +1,254 @@
+import random
+import time
+
+from app.algorithms.cancel import check, never, no_progress
+from app.algorithms.held_karp import route_cost
+
+INF = float("inf")
+
+# posição "antes do primeiro job": o nó inicial
+START = -1
+
+
+class _Costs:
+    def __init__(self, start_to_job: list[float], job_to_job: list[list[float]]):
+        self.start_to_job = start_to_job
+        self.job_to_job = job_to_job
+
+    def __call__(self, u: int, v: int | None) -> float:
+        """
+        Custo de ir de u (job ou START) até v; v None = fim da rota, sem custo.
+        """
+        if v is None:
+            return 0.0
+        if u == START:
+            return self.start_to_job[v]
+        return self.job_to_job[u][v]
+
+
+def improve(start_to_job: list[float], job_to_job: list[list[float]], prereq_masks: list[int],
+            order: list[int], time_budget: float = 0.2, max_segment: int = 3,
+            max_restarts: int = 200, seed: int = 0, should_stop=never, progress=no_progress,
+            constraints=None):
+    """
+    Busca local que preserva as precedências, partindo de uma ordem viável.
+
+    Vizinhanças, em ordem, com a primeira melhora aplicada:
+    - Or-opt: realoca segmentos de 1..max_segment jobs consecutivos;
+    - swap: troca dois jobs de posição;
+    - 2-opt: inverte um trecho sem precedências internas.
+    Num ótimo local, se ainda houver tempo, a melhor ordem é perturbada
+    (alguns jobs realocados ao acaso em posições viáveis) e a busca recomeça
+    (iterated local search). Termina quando time_budget (segundos) acaba ou
+    quando max_restarts perturbações seguidas não melhoram a rota.
+
+    Retorna (custo, ordem, trajetória, iterações), onde a trajetória lista
+    (iteração, segundos decorridos, custo) a cada nova melhor rota e
+    iterações conta os movimentos de melhora aplicados. should_stop()
+    verdadeiro interrompe a busca com cancel.Cancelled; progress recebe o
+    custo de cada nova melhor rota.
+
+    Com constraints (ver constraints.Constraints), só ordens que respeitam
+    capacidade e janelas são aceitas e o custo é o de Constraints.value
+    (horário de término, com janelas). Com janelas o ganho de um movimento
+    não sai da diferença dos custos de viagem, então toda a vizinhança é
+    avaliada; sem elas, só os movimentos que encurtam a viagem.
+    """
+    cost = _Costs(start_to_job, job_to_job)
+    if constraints is None:
+        def evaluate(o):
+            return route_cost(start_to_job, job_to_job, o)
+    else:
+        def evaluate(o):
+            return constraints.value(start_to_job, job_to_job, o)
+    screen = constraints is None or not constraints.timed
+    best_order = list(order)
+    n = len(best_order)
+    best_cost = evaluate(best_order) if best_order else 0.0
+
+    began = time.perf_counter()
+    deadline = began + time_budget
+    iterations = 0
+    trajectory: list[tuple[int, float, float]] = [(0, 0.0, best_cost)]
+    if n < 2:
+        return best_cost, best_order, trajectory, iterations
+
+    progress(incumbent_cost=best_cost)
+    rng = random.Random(seed)
+    order, current_cost = best_order, best_cost
+    failed_restarts = 0
+    while time.perf_counter() < deadline:
+        order, current_cost, moves = _descend(order, current_cost, cost, prereq_masks,
+                                              max_segment, deadline, should_stop,
+                                              evaluate, screen)
+        iterations += moves
+        if current_cost < best_cost - 1e-9:
+            best_order, best_cost = order, current_cost
+            trajectory.append((iterations, time.perf_counter() - began, best_cost))
+            progress(incumbent_cost=best_cost)
+            failed_restarts = 0
+        else:
+            failed_restarts += 1
+            if failed_restarts > max_restarts:
+                break
+
+        order = _perturb(best_order, prereq_masks, rng)
+        current_cost = evaluate(order)
+
+    return best_cost, best_order, trajectory, iterations
+
+
+def _descend(order, current_cost, cost, prereq_masks, max_segment, deadline, should_stop=never,
+             evaluate=None, screen=True):
+    """
+    Aplica movimentos de melhora até um ótimo local (ou até o prazo).
+    Cada vizinhança gera ordens candidatas (com screen, só as que encurtam
+    a viagem); a primeira com evaluate menor que o custo atual é aplicada.
+    """
+    if evaluate is None:
+        def evaluate(o):
+            return route_cost(cost.start_to_job, cost.job_to_job, o)
+    moves = 0
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        check(should_stop)
+        improved = False
+        for neighbors in (_or_opt_moves, _swap_moves, _two_opt_moves):
+            for new_order in neighbors(order, cost, prereq_masks, max_segment, deadline, screen):
+                new_cost = evaluate(new_order)
+                if new_cost < current_cost:
+                    order, current_cost = new_order, new_cost
+                    moves += 1
+                    improved = True
+                    break
+            if improved:
+                break
+    return order, current_cost, moves
+
+
+def _perturb(order, prereq_masks, rng: random.Random, moves: int = 3):
+    """
+    Realoca alguns jobs ao acaso, cada um entre o último de seus
+    pré-requisitos e o primeiro job que depende dele.
+    """
+    order = list(order)
+    n = len(order)
+    for _ in range(min(moves, n)):
+        job = order.pop(rng.randrange(n))
+        lo, hi = 0, n - 1
+        for pos, other in enumerate(order):
+            if prereq_masks[job] >> other & 1:
+                lo = max(lo, pos + 1)
+            if prereq_masks[other] >> job & 1:
+                hi = min(hi, pos)
+        order.insert(rng.randint(lo, hi), job)
+    return order
+
+
+def _job_mask(jobs) -> int:
+    mask = 0
+    for k in jobs:
+        mask |= 1 << k
+    return mask
+
+
+def _or_opt_moves(order, cost, prereq_masks, max_segment, deadline, screen=True):
+    n = len(order)
+    for length in range(1, min(max_segment, n - 1) + 1):
+        for i in range(n - length + 1):
+            if time.perf_counter() >= deadline:
+                return
+            seg = order[i:i + length]
+            seg_mask = _job_mask(seg)
+            first, last = seg[0], seg[-1]
+            before = order[i - 1] if i > 0 else START
+            after = order[i + length] if i + length < n else None
+            removal_gain = cost(before, first) + cost(last, after) - cost(before, after)
+            if removal_gain == INF:
+                continue
+
+            # para trás: o segmento passa a vir antes de order[j:i]
+            passed = 0
+            for j in range(i - 1, -1, -1):
+                passed |= 1 << order[j]
+                if _needs(prereq_masks, seg, passed):
+                    break
+                a = order[j - 1] if j > 0 else START
+                b = order[j]
+                added = cost(a, first) + cost(last, b) - cost(a, b)
+                if not screen or added < removal_gain - 1e-9:
+                    yield order[:j] + seg + order[j:i] + order[i + length:]
+
+            # para frente: o segmento passa a vir depois de order[i + length:j + 1]
+            for j in range(i + length, n):
+                if prereq_masks[order[j]] & seg_mask:
+                    break
+                a = order[j]
+                b = order[j + 1] if j + 1 < n else None
+                added = cost(a, first) + cost(last, b) - cost(a, b)
+                if not screen or added < removal_gain - 1e-9:
+                    yield order[:i] + order[i + length:j + 1] + seg + order[j + 1:]
+
+
+def _needs(prereq_masks, jobs, mask: int) -> bool:
+    """
+    Algum job de jobs tem pré-requisito em mask?
+    """
+    return any(prereq_masks[k] & mask for k in jobs)
+
+
+def _swap_moves(order, cost, prereq_masks, max_segment, deadline, screen=True):
+    n = len(order)
+    for i in range(n - 1):
+        if time.perf_counter() >= deadline:
+            return
+        a = order[i]
+        a_bit = 1 << a
+        before_a = order[i - 1] if i > 0 else START
+        after_a = order[i + 1]
+        between = 0
+        for j in range(i + 1, n):
+            b = order[j]
+            after_b = order[j + 1] if j + 1 < n else None
+
+            # b passa para antes de a e de order[i + 1:j]
+            if not prereq_masks[b] & (a_bit | between):
+                if j == i + 1:
+                    old = cost(before_a, a) + cost(a, b) + cost(b, after_b)
+                    new = cost(before_a, b) + cost(b, a) + cost(a, after_b)
+                else:
+                    before_b = order[j - 1]
+                    old = (cost(before_a, a) + cost(a, after_a)
+                           + cost(before_b, b) + cost(b, after_b))
+                    new = (cost(before_a, b) + cost(b, after_a)
+                           + cost(before_b, a) + cost(a, after_b))
+                if not screen or new < old - 1e-9:
+                    yield order[:i] + [b] + order[i + 1:j] + [a] + order[j + 1:]
+
+            if prereq_masks[b] & a_bit:
+                # a não pode passar para depois de b
+                break
+            between |= 1 << b
+
+
+def _two_opt_moves(order, cost, prereq_masks, max_segment, deadline, screen=True):
+    n = len(order)
+    for i in range(n - 1):
+        if time.perf_counter() >= deadline:
+            return
+        before = order[i - 1] if i > 0 else START
+        seg_mask = 1 << order[i]
+        forward = 0.0   # custo interno do trecho na ordem atual
+        backward = 0.0  # custo interno do trecho invertido
+        for j in range(i + 1, n):
+            if prereq_masks[order[j]] & seg_mask:
+                # order[j] depende de alguém do trecho: inverter quebraria a precedência
+                break
+            seg_mask |= 1 << order[j]
+            forward += cost(order[j - 1], order[j])
+            backward += cost(order[j], order[j - 1])
+            after = order[j + 1] if j + 1 < n else None
+            old = cost(before, order[i]) + forward + cost(order[j], after)
+            new = cost(before, order[j]) + backward + cost(order[i], after)
+            if not screen or new < old - 1e-9:
+                yield order[:i] + order[i:j + 1][::-1] + order[j + 1:]
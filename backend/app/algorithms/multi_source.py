@@ -0,0 +1,205 @@
+import atexit
+import math
+import os
+import struct
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+from app import metrics, workers
+from app.algorithms.csr import CSRGraph, dijkstra
+
+try:
+    import numpy as np
+except ImportError:  # sem NumPy as origens são processadas em série
+    np = None
+
+# Dijkstra de várias origens dividido entre processos, que enxergam o grafo
+# por um bloco de memória compartilhada (sem copiar o CSR para cada um):
+#
+#   cabeçalho: n, m (int64) | offsets q[n+1] | targets q[m] | weights d[m]
+#
+# Cada worker escreve as linhas que calculou direto numa matriz de saída,
+# também compartilhada: dist d[k × n] seguida de pred q[k × n].
+
+# As partes rodam no pool de app.workers, só nos processos sem cálculo
+# agendado (workers.idle_pool): não há um segundo pool disputando os núcleos.
+
+# processos usados no máximo por divisão; 0 ou 1 desliga
+WORKERS = int(os.environ.get("DIJKSTRA_WORKERS", workers.WORKERS))
+# trabalho mínimo, em origens × (nós + arestas), para compensar dividir
+MIN_PARALLEL_WORK = int(os.environ.get("DIJKSTRA_PARALLEL_MIN_WORK", 2_000_000))
+
+_HEADER = struct.Struct("<qq")
+
+
+class ParallelUnavailable(RuntimeError):
+    """
+    O pool não conseguiu calcular (worker encerrado, bloco compartilhado
+    substituído no meio do caminho); quem chamou deve calcular em série.
+    """
+
+
+_lock = threading.Lock()
+# (chave do grafo, bloco) do último grafo publicado por este processo
+_published: tuple[object, shared_memory.SharedMemory] | None = None
+
+# no worker: nome do bloco -> (bloco, CSR sobre ele)
+_attached: dict[str, tuple[shared_memory.SharedMemory, CSRGraph]] = {}
+
+
+def _sections(buf, n: int, m: int):
+    pos = _HEADER.size
+    offsets = buf[pos:pos + 8 * (n + 1)].cast("q")
+    pos += 8 * (n + 1)
+    targets = buf[pos:pos + 8 * m].cast("q")
+    pos += 8 * m
+    weights = buf[pos:pos + 8 * m].cast("d")
+    return offsets, targets, weights
+
+
+def _publish(csr: CSRGraph) -> shared_memory.SharedMemory:
+    n, m = csr.num_nodes, csr.num_edges
+    block = shared_memory.SharedMemory(create=True, size=_HEADER.size + 8 * (n + 1) + 16 * m)
+    _HEADER.pack_into(block.buf, 0, n, m)
+    views = _sections(block.buf, n, m)
+    for view, source in zip(views, (csr.offsets, csr.targets, csr.weights)):
+        view[:] = memoryview(source).cast("B").cast(view.format)
+        view.release()
+    return block
+
+
+def _shared_graph(csr: CSRGraph, key) -> str:
+    """
+    Nome do bloco com o CSR do grafo identificado por key (a versão do
+    grafo); publica de novo quando o grafo muda.
+    """
+    global _published
+    with _lock:
+        if _published is not None and _published[0] == key:
+            return _published[1].name
+        if _published is not None:
+            _unlink(_published[1])
+        block = _publish(csr)
+        _published = (key, block)
+        return block.name
+
+
+def _unlink(block: shared_memory.SharedMemory):
+    block.close()
+    try:
+        block.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _detach_all():
+    # as views precisam ser soltas antes de fechar o bloco
+    for name, (block, csr) in list(_attached.items()):
+        for view in (csr.offsets, csr.targets, csr.weights):
+            view.release()
+        block.close()
+        del _attached[name]
+
+
+def _attach(name: str) -> CSRGraph:
+    entry = _attached.get(name)
+    if entry is not None:
+        return entry[1]
+
+    # o worker só guarda o grafo mais recente
+    if not _attached:
+        atexit.register(_detach_all)
+    _detach_all()
+
+    block = shared_memory.SharedMemory(name=name)
+    n, m = _HEADER.unpack_from(block.buf, 0)
+    csr = CSRGraph(range(n), *_sections(block.buf, n, m))
+    _attached[name] = (block, csr)
+    return csr
+
+
+def _run_chunk(graph_name: str, out_name: str, rows: list[tuple[int, int]], count: int):
+    """
+    No worker: Dijkstra de cada (linha, origem) de rows, gravado na linha
+    correspondente da matriz de saída (count linhas). Retorna as métricas
+    acumuladas no worker.
+    """
+    csr = _attach(graph_name)
+    n = csr.num_nodes
+    out = shared_memory.SharedMemory(name=out_name)
+    try:
+        dist_out = out.buf[:8 * count * n].cast("d")
+        pred_out = out.buf[8 * count * n:16 * count * n].cast("q")
+        for row, source in rows:
+            dist, pred = dijkstra(csr, source)
+            dist_out[row * n:(row + 1) * n] = dist
+            pred_out[row * n:(row + 1) * n] = pred
+        dist_out.release()
+        pred_out.release()
+    finally:
+        out.close()
+    return metrics.drain()
+
+
+def should_parallelize(csr: CSRGraph, sources: int) -> bool:
+    return (
+        np is not None and min(WORKERS, workers.WORKERS) > 1 and sources > 1
+        and sources * (csr.num_nodes + csr.num_edges) >= MIN_PARALLEL_WORK
+    )
+
+
+def dijkstra_matrix(csr: CSRGraph, sources: list[int], key):
+    """
+    Dijkstra a partir de cada índice denso de sources, dividido entre os
+    processos ociosos do pool de app.workers. key identifica o grafo (a
+    versão), para que o CSR compartilhado só seja publicado de novo quando
+    ele mudar.
+
+    Retorna (dist, pred): matrizes NumPy len(sources) × n (float64 e
+    int64), com a linha i correspondendo a sources[i], como em csr.dijkstra.
+    Com menos de dois processos ociosos levanta ParallelUnavailable.
+    """
+    n, count = csr.num_nodes, len(sources)
+    executor, idle = workers.idle_pool(WORKERS)
+    if idle < 2:
+        raise ParallelUnavailable("Sem processos ociosos no pool.")
+    graph_name = _shared_graph(csr, key)
+
+    out = shared_memory.SharedMemory(create=True, size=max(16 * count * n, 1))
+    try:
+        # algumas partes por worker equilibram origens mais caras que outras
+        parts = min(count, 2 * idle)
+        step = math.ceil(count / parts)
+        rows = list(enumerate(sources))
+        try:
+            futures = [
+                executor.submit(_run_chunk, graph_name, out.name, rows[i:i + step], count)
+                for i in range(0, count, step)
+            ]
+            for future in futures:
+                metrics.merge(future.result())
+        except BrokenProcessPool as exc:
+            workers.discard(executor)
+            raise ParallelUnavailable(str(exc))
+        except (OSError, RuntimeError) as exc:
+            # RuntimeError: pool encerrado entre idle_pool e o submit
+            raise ParallelUnavailable(str(exc))
+
+        dist = np.frombuffer(out.buf, dtype=np.float64, count=count * n).reshape(count, n).copy()
+        pred = np.frombuffer(out.buf, dtype=np.int64, count=count * n,
+                             offset=8 * count * n).reshape(count, n).copy()
+    finally:
+        _unlink(out)
+    return dist, pred
+
+
+def shutdown():
+    """
+    Solta o grafo publicado; o pool é encerrado em workers.shutdown().
+    """
+    global _published
+    with _lock:
+        published, _published = _published, None
+    if published is not None:
+        _unlink(published[1])
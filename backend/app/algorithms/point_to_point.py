@@ -0,0 +1,184 @@
+import heapq
+import math
+
+from app import metrics
+from app.algorithms.csr import INF, CSRGraph
+
+# As buscas ponto a ponto guardam distâncias em dicts: só os nós de fato
+# alcançados ocupam memória, em vez de arrays do tamanho do grafo.
+
+
+def _unwind(pred: dict[int, int], node: int) -> list[int]:
+    path = [node]
+    while pred.get(node, -1) != -1:
+        node = pred[node]
+        path.append(node)
+    return path
+
+
+def dijkstra(graph: CSRGraph, source: int, target: int):
+    """
+    Dijkstra que para ao fixar target.
+    Retorna (distância, caminho em índices densos, nós fixados);
+    (INF, [], fixados) se target for inalcançável.
+    """
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    dist = {source: 0.0}
+    pred = {source: -1}
+    heap = [(0.0, source)]
+    settled = 0
+    pushes = 1
+
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        settled += 1
+        if u == target:
+            metrics.search("point_to_point", pushes, settled)
+            path = _unwind(pred, target)
+            path.reverse()
+            return d, path, settled
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            nd = d + weights[e]
+            if nd < dist.get(v, INF):
+                dist[v] = nd
+                pred[v] = u
+                heapq.heappush(heap, (nd, v))
+                pushes += 1
+
+    metrics.search("point_to_point", pushes, settled)
+    return INF, [], settled
+
+
+def dijkstra_to_many(graph: CSRGraph, source: int, targets) -> dict[int, float]:
+    """
+    Dijkstra que para ao fixar todos os targets.
+    Retorna {target: distância}, com INF para os inalcançáveis.
+    """
+    offsets, targets_, weights = graph.offsets, graph.targets, graph.weights
+    remaining = set(targets)
+    found = dict.fromkeys(remaining, INF)
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    pushes, settled = 1, 0
+
+    while heap and remaining:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        settled += 1
+        if u in remaining:
+            found[u] = d
+            remaining.discard(u)
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets_[e]
+            nd = d + weights[e]
+            if nd < dist.get(v, INF):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+                pushes += 1
+
+    metrics.search("to_many", pushes, settled)
+    return found
+
+
+def bidirectional_dijkstra(graph: CSRGraph, reverse: CSRGraph, source: int, target: int):
+    """
+    Dijkstra simultâneo a partir de source (no grafo) e de target (no grafo
+    transposto), sempre avançando o lado de menor fronteira. Para quando a
+    soma dos topos das duas filas alcança o melhor caminho já visto.
+    Retorna (distância, caminho em índices densos, nós fixados).
+    """
+    if source == target:
+        return 0.0, [source], 1
+
+    sides = (graph, reverse)
+    dist = ({source: 0.0}, {target: 0.0})
+    pred = ({source: -1}, {target: -1})
+    heaps = ([(0.0, source)], [(0.0, target)])
+    best = INF
+    meeting = -1
+    settled = 0
+    pushes = 2
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        d, u = heapq.heappop(heaps[side])
+        if d > dist[side][u]:
+            continue
+        settled += 1
+
+        g = sides[side]
+        other = dist[1 - side]
+        for e in range(g.offsets[u], g.offsets[u + 1]):
+            v = g.targets[e]
+            nd = d + g.weights[e]
+            if nd < dist[side].get(v, INF):
+                dist[side][v] = nd
+                pred[side][v] = u
+                heapq.heappush(heaps[side], (nd, v))
+                pushes += 1
+            if v in other and nd + other[v] < best:
+                best = nd + other[v]
+                meeting = v
+        if u in other and d + other[u] < best:
+            best = d + other[u]
+            meeting = u
+
+    metrics.search("bidirectional", pushes, settled)
+    if meeting == -1:
+        return INF, [], settled
+
+    forward = _unwind(pred[0], meeting)
+    forward.reverse()
+    backward = _unwind(pred[1], meeting)
+    return best, forward + backward[1:], settled
+
+
+def astar(graph: CSRGraph, xs, ys, scale: float, source: int, target: int):
+    """
+    A* com heurística scale * distância euclidiana até target. Com scale
+    vindo de Graph.heuristic_scale a heurística é consistente, então cada
+    nó é fixado uma única vez e o primeiro pop de target é ótimo.
+    Retorna (distância, caminho em índices densos, nós fixados).
+    """
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    tx, ty = xs[target], ys[target]
+    if scale <= 0 or math.isnan(tx) or math.isnan(ty):
+        return dijkstra(graph, source, target)
+
+    def h(v: int) -> float:
+        return scale * math.hypot(xs[v] - tx, ys[v] - ty)
+
+    dist = {source: 0.0}
+    pred = {source: -1}
+    heap = [(h(source), 0.0, source)]
+    closed: set[int] = set()
+    pushes = 1
+
+    while heap:
+        _, d, u = heapq.heappop(heap)
+        if u in closed or d > dist[u]:
+            continue
+        closed.add(u)
+        if u == target:
+            metrics.search("astar", pushes, len(closed))
+            path = _unwind(pred, target)
+            path.reverse()
+            return d, path, len(closed)
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            nd = d + weights[e]
+            if nd < dist.get(v, INF):
+                dist[v] = nd
+                pred[v] = u
+                heapq.heappush(heap, (nd + h(v), nd, v))
+                pushes += 1
+
+    metrics.search("astar", pushes, len(closed))
+    return INF, [], len(closed)
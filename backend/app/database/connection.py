@@ -1,6 +1,282 @@
+import os
+import queue
 import sqlite3
+import threading
+from pathlib import Path
 
-def get_connection():
-    conn = sqlite3.connect("grafos.db")
-    conn.execute("PRAGMA foreign_keys = 1")
-    return conn
+from fastapi import HTTPException
+
+# mesmo arquivo criado por init_db.py (app/grafos.db), independente do CWD;
+# GRAFOS_DB permite apontar para outro banco
+DB_PATH = os.environ.get("GRAFOS_DB", str(Path(__file__).resolve().parent.parent / "grafos.db"))
+
+# conexões mantidas abertas por pool (um de escrita e um somente leitura)
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))
+# segundos esperando uma conexão livre antes de responder 503
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+
+# Migrações aplicadas em ordem; PRAGMA user_version guarda quantas o banco
+# já recebeu. Bancos antigos (criados por init_db.py antes das tabelas de
+# apoio e dos índices) são atualizados na primeira conexão do processo.
+MIGRATIONS = [
+    # 1: tabelas do dataset (as mesmas de schema.sql), versão do dataset e
+    # cache persistente de distâncias
+    """
+    CREATE TABLE IF NOT EXISTS nodes (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        x REAL,
+        y REAL
+    );
+
+    CREATE TABLE IF NOT EXISTS edges (
+        id INTEGER PRIMARY KEY,
+        from_node INTEGER NOT NULL,
+        to_node INTEGER NOT NULL,
+        weight REAL NOT NULL,
+        FOREIGN KEY (from_node) REFERENCES nodes(id),
+        FOREIGN KEY (to_node) REFERENCES nodes(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY,
+        type TEXT CHECK(type IN ('pickup', 'dropoff')),
+        node_id INTEGER NOT NULL,
+        FOREIGN KEY (node_id) REFERENCES nodes(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS precedences (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_before INTEGER NOT NULL,
+        job_after  INTEGER NOT NULL,
+        FOREIGN KEY (job_before) REFERENCES jobs(id),
+        FOREIGN KEY (job_after)  REFERENCES jobs(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS dataset_meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS distance_rows (
+        version INTEGER NOT NULL,
+        source_node INTEGER NOT NULL,
+        dist BLOB NOT NULL,
+        pred BLOB NOT NULL,
+        PRIMARY KEY (version, source_node)
+    );
+    """,
+    # 2: índices das chaves estrangeiras mais consultadas
+    """
+    CREATE INDEX IF NOT EXISTS idx_edges_from_node ON edges(from_node);
+    CREATE INDEX IF NOT EXISTS idx_edges_to_node ON edges(to_node);
+    CREATE INDEX IF NOT EXISTS idx_jobs_node_id ON jobs(node_id);
+    CREATE INDEX IF NOT EXISTS idx_precedences_job_after ON precedences(job_after);
+    """,
+    # 3: restrições opcionais dos jobs (tempo de atendimento, janela de
+    # tempo para o início do atendimento e demanda)
+    """
+    ALTER TABLE jobs ADD COLUMN service_time REAL NOT NULL DEFAULT 0;
+    ALTER TABLE jobs ADD COLUMN window_start REAL;
+    ALTER TABLE jobs ADD COLUMN window_end REAL;
+    ALTER TABLE jobs ADD COLUMN demand REAL NOT NULL DEFAULT 0;
+    """,
+    # 4: tickets de POST /routes/solve e rotas prontas, compartilhados entre
+    # os processos do servidor
+    """
+    CREATE TABLE IF NOT EXISTS solve_tickets (
+        id TEXT PRIMARY KEY,
+        key TEXT NOT NULL,
+        status TEXT NOT NULL,
+        start_node INTEGER NOT NULL,
+        strategy TEXT NOT NULL,
+        cached INTEGER NOT NULL DEFAULT 0,
+        created REAL NOT NULL,
+        updated REAL NOT NULL,
+        finished REAL,
+        progress TEXT,
+        result TEXT,
+        error TEXT,
+        cancel_requested INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_solve_tickets_active ON solve_tickets(key)
+        WHERE finished IS NULL;
+
+    CREATE TABLE IF NOT EXISTS solve_results (
+        key TEXT PRIMARY KEY,
+        result TEXT NOT NULL,
+        used REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_solve_results_used ON solve_results(used);
+    """,
+]
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    Conexão que volta para o pool em close(); o código que chama
+    get_connection() continua abrindo e fechando como antes.
+    """
+
+    pool: "ConnectionPool | None" = None
+    checked_out = False
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        elif self.checked_out:
+            self.checked_out = False
+            self.pool.release(self)
+
+
+class ConnectionPool:
+    """
+    Pool de conexões reaproveitáveis entre threads. As conexões são criadas
+    sob demanda até size; com todas em uso, acquire espera até timeout.
+    """
+
+    def __init__(self, path: str, size: int, readonly: bool = False):
+        self.path = path
+        self.size = size
+        self.readonly = readonly
+        self._idle: "queue.LifoQueue[PooledConnection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> PooledConnection:
+        if self.readonly:
+            uri = Path(self.path).resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, factory=PooledConnection, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.path, factory=PooledConnection, check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = 1")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.pool = self
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    conn = self._connect()
+                except BaseException:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=POOL_TIMEOUT)
+                except queue.Empty:
+                    raise HTTPException(
+                        status_code=503,
+                        detail="Banco de dados ocupado. Tente novamente."
+                    )
+        conn.checked_out = True
+        return conn
+
+    def release(self, conn: PooledConnection):
+        # nada de transação pendente para o próximo usuário da conexão
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close_all(self):
+        with self._lock:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.pool = None
+                conn.close()
+                self._created -= 1
+
+
+_lock = threading.Lock()
+_write_pool: ConnectionPool | None = None
+_read_pool: ConnectionPool | None = None
+
+
+def migrate(conn: sqlite3.Connection):
+    """
+    Aplica as migrações pendentes e liga o modo WAL (leitores não bloqueiam
+    a escrita e vice-versa). O modo WAL fica gravado no próprio arquivo.
+    """
+    conn.execute("PRAGMA journal_mode = WAL")
+    applied = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, script in enumerate(MIGRATIONS[applied:], start=applied + 1):
+        conn.executescript(f"BEGIN; {script} PRAGMA user_version = {number}; COMMIT;")
+
+
+def init():
+    """
+    Cria os pools e migra o banco; chamada na inicialização da aplicação
+    (e, sob demanda, na primeira conexão do processo).
+    """
+    global _write_pool, _read_pool
+    with _lock:
+        if _write_pool is not None:
+            return
+        write_pool = ConnectionPool(DB_PATH, POOL_SIZE)
+        conn = write_pool.acquire()
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
+        _read_pool = ConnectionPool(DB_PATH, POOL_SIZE, readonly=True)
+        _write_pool = write_pool
+
+
+def shutdown():
+    global _write_pool, _read_pool
+    with _lock:
+        for pool in (_write_pool, _read_pool):
+            if pool is not None:
+                pool.close_all()
+        _write_pool = _read_pool = None
+
+
+def get_connection() -> PooledConnection:
+    """
+    Conexão de leitura e escrita do pool; close() a devolve ao pool.
+    """
+    if _write_pool is None:
+        init()
+    return _write_pool.acquire()
+
+
+def get_read_connection() -> PooledConnection:
+    """
+    Conexão somente leitura (mode=ro) do pool, para consultas.
+    """
+    if _read_pool is None:
+        init()
+    return _read_pool.acquire()
+
+
+def get_db():
+    """
+    Dependência FastAPI: conexão de escrita devolvida ao fim da requisição.
+    """
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def get_read_db():
+    """
+    Dependência FastAPI: conexão somente leitura, para handlers GET.
+    """
+    conn = get_read_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
@@ -0,0 +1,199 @@
+import os
+import threading
+from array import array
+from collections import OrderedDict
+
+import app.database.connection as db
+from app import metrics
+from app.algorithms import csr as csr_alg
+from app.algorithms import dynamic_sssp, multi_source
+from app.database.graph_store import Graph
+
+# limite (em bytes) das linhas mantidas em memória por processo; as demais
+# continuam disponíveis na tabela distance_rows do SQLite
+MAX_MEMORY_BYTES = int(os.environ.get("DISTANCE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+_lock = threading.Lock()
+# (versão, nó de origem) -> (dist, pred)
+_rows: "OrderedDict[tuple[int, int], tuple[array, array]]" = OrderedDict()
+_rows_bytes = 0
+
+
+def _row_size(dist: array, pred: array) -> int:
+    return dist.itemsize * len(dist) + pred.itemsize * len(pred)
+
+
+def _remember(key: tuple[int, int], dist: array, pred: array):
+    global _rows_bytes
+    with _lock:
+        if key in _rows:
+            _rows.move_to_end(key)
+            return
+        _rows[key] = (dist, pred)
+        _rows_bytes += _row_size(dist, pred)
+        # descarta as linhas menos usadas recentemente
+        while _rows_bytes > MAX_MEMORY_BYTES and len(_rows) > 1:
+            _, (d, p) = _rows.popitem(last=False)
+            _rows_bytes -= _row_size(d, p)
+
+
+def _lookup(key: tuple[int, int]):
+    with _lock:
+        row = _rows.get(key)
+        if row is not None:
+            _rows.move_to_end(key)
+        return row
+
+
+def clear(cur):
+    """
+    Apaga as linhas persistidas, dentro da transação do chamador.
+    Usada quando o grafo muda (upload de dataset).
+    """
+    global _rows_bytes
+    cur.execute("DELETE FROM distance_rows")
+    with _lock:
+        _rows.clear()
+        _rows_bytes = 0
+
+
+def _load_persisted(version: int, sources: list[int]) -> dict[int, tuple[array, array]]:
+    found: dict[int, tuple[array, array]] = {}
+    if not sources:
+        return found
+
+    conn = db.get_read_connection()
+    cur = conn.cursor()
+    # o SQLite limita a quantidade de parâmetros por consulta
+    for i in range(0, len(sources), 500):
+        chunk = sources[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        cur.execute(
+            f"SELECT source_node, dist, pred FROM distance_rows "
+            f"WHERE version = ? AND source_node IN ({placeholders})",
+            (version, *chunk)
+        )
+        for source, dist_blob, pred_blob in cur.fetchall():
+            found[source] = (array("d", dist_blob), array("q", pred_blob))
+    conn.close()
+    return found
+
+
+def _persist(version: int, computed: dict[int, tuple[array, array]]):
+    if not computed:
+        return
+
+    conn = db.get_connection()
+    conn.executemany(
+        "INSERT OR IGNORE INTO distance_rows (version, source_node, dist, pred) VALUES (?, ?, ?, ?)",
+        [(version, s, d.tobytes(), p.tobytes()) for s, (d, p) in computed.items()]
+    )
+    conn.commit()
+    conn.close()
+
+
+def _compute(sources: list[int], graph: Graph) -> dict[int, tuple[array, array]]:
+    csr = graph.csr
+    if multi_source.should_parallelize(csr, len(sources)):
+        try:
+            dist, pred = multi_source.dijkstra_matrix(
+                csr, [csr.index[s] for s in sources], graph.version
+            )
+        except multi_source.ParallelUnavailable:
+            pass
+        else:
+            return {
+                s: (array("d", dist[i].tobytes()), array("q", pred[i].tobytes()))
+                for i, s in enumerate(sources)
+            }
+    return {s: csr_alg.dijkstra(csr, csr.index[s]) for s in sources}
+
+
+def get_rows(graph: Graph, sources) -> dict[int, tuple[array, array]]:
+    """
+    Retorna {nó de origem: (dist, pred)} para a versão do grafo, com dist/pred
+    indexados pelo índice denso (como em csr.dijkstra).
+
+    Procura primeiro na memória do processo, depois no SQLite (compartilhado
+    entre processos) e só roda Dijkstra para as origens que faltarem; com
+    bastante trabalho, elas são divididas entre processos (multi_source).
+    """
+    version = graph.version
+    result: dict[int, tuple[array, array]] = {}
+    missing: list[int] = []
+
+    for s in sources:
+        row = _lookup((version, s))
+        if row is None:
+            missing.append(s)
+        else:
+            result[s] = row
+
+    persisted = _load_persisted(version, missing)
+    computed = _compute([s for s in missing if s not in persisted], graph)
+    metrics.cache("distance_rows_memory", hit=True, value=len(result))
+    metrics.cache("distance_rows_memory", hit=False, value=len(missing))
+    metrics.cache("distance_rows_db", hit=True, value=len(persisted))
+    metrics.cache("distance_rows_db", hit=False, value=len(computed))
+    for s in missing:
+        row = persisted.get(s) or computed[s]
+        result[s] = row
+        _remember((version, s), *row)
+
+    _persist(version, computed)
+    return result
+
+
+def repair(old_version: int, graph: Graph, increased: list[tuple[int, int]],
+           decreased: list[tuple[int, int]]) -> dict[str, int]:
+    """
+    Leva as linhas persistidas de old_version para a versão de graph depois
+    de mudanças só em arestas (os nós, e portanto os índices densos, são os
+    mesmos). increased / decreased são pares (from_node, to_node) com
+    aresta removida ou mais cara / nova ou mais barata.
+
+    Cada linha é reparada com dynamic_sssp.repair em vez de recalculada;
+    as que não mudam são só copiadas para a nova versão. Linhas de versões
+    anteriores são apagadas.
+    Retorna quantas linhas foram reparadas e quantas ficaram intactas.
+    """
+    global _rows_bytes
+    csr = graph.csr
+    index = csr.index
+    inc = [(index[u], index[v]) for u, v in increased if u in index and v in index]
+    dec = [(index[u], index[v]) for u, v in decreased if u in index and v in index]
+
+    conn = db.get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT source_node, dist, pred FROM distance_rows WHERE version = ?", (old_version,))
+    rows = cur.fetchall()
+
+    stats = {"repaired": 0, "unchanged": 0}
+    updated: dict[int, tuple[array, array]] = {}
+    reverse = graph.reverse_csr() if inc else None
+    for source, dist_blob, pred_blob in rows:
+        dist, pred = array("d", dist_blob), array("q", pred_blob)
+        if len(dist) != csr.num_nodes or source not in index:
+            continue
+        if dynamic_sssp.repair(csr, reverse, dist, pred, inc, dec):
+            stats["repaired"] += 1
+        else:
+            stats["unchanged"] += 1
+        updated[source] = (dist, pred)
+
+    cur.executemany(
+        "INSERT OR REPLACE INTO distance_rows (version, source_node, dist, pred) VALUES (?, ?, ?, ?)",
+        [(graph.version, s, d.tobytes(), p.tobytes()) for s, (d, p) in updated.items()]
+    )
+    cur.execute("DELETE FROM distance_rows WHERE version < ?", (graph.version,))
+    conn.commit()
+    conn.close()
+
+    # linhas de versões antigas saem da memória deste processo
+    with _lock:
+        for key in [k for k in _rows if k[0] < graph.version]:
+            d, p = _rows.pop(key)
+            _rows_bytes -= _row_size(d, p)
+    for source, (dist, pred) in updated.items():
+        _remember((graph.version, source), dist, pred)
+    return stats
@@ -0,0 +1,207 @@
+import math
+import threading
+from array import array
+from dataclasses import dataclass, field
+
+from fastapi import HTTPException
+import app.database.connection as db
+from app import metrics
+from app.algorithms.csr import CSRGraph
+from app.database import snapshot
+
+
+@dataclass
+class Graph:
+    """
+    Grafo viário carregado do banco:
+    - version: versão do dataset em que o grafo foi lido
+    - nodes: lista de nós (ordenada por id)
+    - csr: arestas em formato CSR, com os nós remapeados para índices densos
+    - xs / ys: coordenadas de cada nó pelo índice denso (nan se ausentes)
+    Quando o grafo vem de um snapshot mapeado em memória, os arrays do CSR
+    e as coordenadas são memoryviews sobre o arquivo.
+    """
+    version: int
+    nodes: list[int]
+    csr: CSRGraph
+    xs: array
+    ys: array
+    _reverse: CSRGraph | None = field(default=None, repr=False)
+    _heuristic_scale: float | None = field(default=None, repr=False)
+
+    def __contains__(self, node_id: int) -> bool:
+        return node_id in self.csr.index
+
+    def reverse_csr(self) -> CSRGraph:
+        """
+        Grafo transposto, montado na primeira vez que for pedido.
+        """
+        if self._reverse is None:
+            self._reverse = self.csr.reversed()
+        return self._reverse
+
+    def heuristic_scale(self) -> float:
+        """
+        Maior fator c tal que c * distância euclidiana nunca passa do custo
+        real: o mínimo de peso / comprimento entre as arestas. Com ele a
+        heurística do A* é admissível e consistente. 0 se faltar coordenada.
+        """
+        if self._heuristic_scale is None:
+            csr, xs, ys = self.csr, self.xs, self.ys
+            scale = math.inf
+            for u in range(csr.num_nodes):
+                for e in range(csr.offsets[u], csr.offsets[u + 1]):
+                    v = csr.targets[e]
+                    length = math.hypot(xs[u] - xs[v], ys[u] - ys[v])
+                    if math.isnan(length):
+                        scale = 0.0
+                        break
+                    if length > 0:
+                        scale = min(scale, csr.weights[e] / length)
+                if scale == 0.0:
+                    break
+            self._heuristic_scale = 0.0 if scale == math.inf else scale
+        return self._heuristic_scale
+
+
+VERSION_KEY = "graph_version"
+# jobs e precedências não afetam o grafo: mudam só este contador
+JOBS_VERSION_KEY = "jobs_version"
+
+# capacidade do veículo (ausente = sem limite); faz parte dos jobs, então
+# toda mudança incrementa também JOBS_VERSION_KEY
+CAPACITY_KEY = "vehicle_capacity"
+
+_lock = threading.Lock()
+_graph: Graph | None = None
+
+
+def read_version(cur, key: str = VERSION_KEY) -> int:
+    """
+    Lê a versão do dataset gravada no banco (0 se nunca houve upload).
+    A versão fica no SQLite para que todos os processos a enxerguem.
+    key escolhe o contador: VERSION_KEY (grafo) ou JOBS_VERSION_KEY
+    (jobs e precedências).
+    """
+    cur.execute("SELECT value FROM dataset_meta WHERE key = ?", (key,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def bump_version(cur, key: str = VERSION_KEY) -> int:
+    """
+    Incrementa a versão do dataset dentro da transação do chamador.
+    Deve ser chamada sempre que nodes/edges forem alterados no banco
+    (com JOBS_VERSION_KEY, quando jobs/precedences mudarem).
+    """
+    version = read_version(cur, key) + 1
+    cur.execute(
+        "INSERT OR REPLACE INTO dataset_meta (key, value) VALUES (?, ?)",
+        (key, version)
+    )
+    return version
+
+
+def read_capacity(cur) -> float | None:
+    cur.execute("SELECT value FROM dataset_meta WHERE key = ?", (CAPACITY_KEY,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def write_capacity(cur, capacity: float | None):
+    """
+    Grava (ou apaga, com None) a capacidade do veículo, dentro da transação
+    do chamador.
+    """
+    if capacity is None:
+        cur.execute("DELETE FROM dataset_meta WHERE key = ?", (CAPACITY_KEY,))
+    else:
+        cur.execute(
+            "INSERT OR REPLACE INTO dataset_meta (key, value) VALUES (?, ?)",
+            (CAPACITY_KEY, capacity)
+        )
+
+
+def get_version() -> int:
+    conn = db.get_read_connection()
+    try:
+        return read_version(conn.cursor())
+    finally:
+        conn.close()
+
+
+def invalidate():
+    """
+    Descarta o grafo em memória deste processo.
+    """
+    global _graph
+    with _lock:
+        _graph = None
+
+
+def _load_graph_from_snapshot(version: int) -> Graph | None:
+    snap = snapshot.open_file(version)
+    if snap is None:
+        return None
+    nodes = snap.node_ids.tolist()
+    csr = CSRGraph(nodes, snap.offsets, snap.targets, snap.weights)
+    return Graph(version=version, nodes=nodes, csr=csr, xs=snap.xs, ys=snap.ys)
+
+
+def _load_graph_from_db() -> Graph:
+    conn = db.get_read_connection()
+    cur = conn.cursor()
+
+    # versão e dados lidos no mesmo snapshot do banco
+    cur.execute("BEGIN")
+    version = read_version(cur)
+
+    # se houver um snapshot binário desta versão, o grafo vem dele (mmap)
+    graph = _load_graph_from_snapshot(version)
+    if graph is not None:
+        conn.rollback()
+        conn.close()
+        return graph
+
+    cur.execute("SELECT id, x, y FROM nodes ORDER BY id")
+    rows = cur.fetchall()
+    nodes = [r[0] for r in rows]
+    xs = array("d", (math.nan if r[1] is None else r[1] for r in rows))
+    ys = array("d", (math.nan if r[2] is None else r[2] for r in rows))
+
+    # monta o CSR direto do cursor, sem passar por um dict de adjacência
+    cur.execute("SELECT from_node, to_node, weight FROM edges")
+    csr = CSRGraph.from_edges(nodes, cur)
+
+    conn.rollback()
+    conn.close()
+    return Graph(version=version, nodes=nodes, csr=csr, xs=xs, ys=ys)
+
+
+def get_graph() -> Graph:
+    """
+    Retorna o grafo da versão atual, lendo nodes/edges apenas quando
+    o cache estiver vazio ou desatualizado.
+    """
+    global _graph
+    version = get_version()
+    graph = _graph
+    if graph is None or graph.version != version:
+        with _lock:
+            graph = _graph
+            if graph is None or graph.version != version:
+                metrics.cache("graph", hit=False)
+                with metrics.span("load_graph_from_db"):
+                    graph = _load_graph_from_db()
+                _graph = graph
+            else:
+                metrics.cache("graph", hit=True)
+    else:
+        metrics.cache("graph", hit=True)
+
+    if not graph.nodes:
+        raise HTTPException(
+            status_code=400,
+            detail="Nenhum nó encontrado no banco. Faça upload do dataset primeiro."
+        )
+    return graph
@@ -0,0 +1,136 @@
+import os
+import threading
+
+from fastapi import HTTPException
+
+import app.database.connection as db
+from app.algorithms import contraction
+from app.database import graph_store
+from app.database.graph_store import Graph
+
+# a hierarquia fica num arquivo binário ao lado do banco (grafos.db -> grafos.ch);
+# CONTRACTION_HIERARCHY=0 desliga a construção e as consultas usam só Dijkstra
+ENABLED = os.environ.get("CONTRACTION_HIERARCHY", "1") != "0"
+
+_lock = threading.Lock()
+_hierarchy: contraction.Hierarchy | None = None
+# versões cuja construção já foi disparada por este processo
+_building: set[int] = set()
+
+
+def sidecar_path() -> str:
+    return os.path.splitext(db.DB_PATH)[0] + ".ch"
+
+
+def _read_file(version: int | None) -> contraction.Hierarchy | None:
+    """
+    Hierarquia gravada da versão (None = de qualquer versão).
+    """
+    try:
+        with open(sidecar_path(), "rb") as f:
+            # confere a versão pelo cabeçalho antes de ler o arquivo inteiro
+            found = contraction.read_version(f.read(contraction.HEADER_SIZE))
+            if version is not None and found != version:
+                return None
+            f.seek(0)
+            return contraction.Hierarchy.from_bytes(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_file(hierarchy: contraction.Hierarchy):
+    path = sidecar_path()
+    # um temporário por thread: duas gravações da mesma versão no mesmo
+    # processo não podem trocar o arquivo uma da outra
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(hierarchy.to_bytes())
+    # troca atômica: leitores nunca veem um arquivo pela metade
+    os.replace(tmp, path)
+
+
+def _previous_order(num_nodes: int):
+    """
+    Ordem de contração da hierarquia anterior (o arquivo só é trocado
+    quando a nova fica pronta), se ela tiver o mesmo número de nós.
+    """
+    previous = _read_file(None)
+    if previous is None or previous.num_nodes != num_nodes:
+        return None
+    return previous.rank
+
+
+def _build(version: int, reuse_order: bool = False):
+    """
+    Constrói e grava a hierarquia do grafo atual. Se o dataset mudar
+    antes ou durante a construção, o resultado é descartado.
+    Com reuse_order (só arestas mudaram), os nós são contraídos na ordem
+    da hierarquia anterior, sem recalcular prioridades.
+    """
+    global _hierarchy
+    try:
+        if graph_store.get_version() != version:
+            return  # uma alteração mais nova já agendou a sua construção
+        try:
+            graph = graph_store.get_graph()
+        except HTTPException:
+            return  # banco sem nós
+        if graph.version != version:
+            return
+        order = _previous_order(graph.csr.num_nodes) if reuse_order else None
+        hierarchy = contraction.build(graph.csr, graph.version, order)
+        if graph_store.get_version() != version:
+            return
+        _write_file(hierarchy)
+        with _lock:
+            _hierarchy = hierarchy
+    finally:
+        with _lock:
+            _building.discard(version)
+
+
+def schedule_build(version: int, delay: float = 0.0, reuse_order: bool = False):
+    """
+    Dispara a construção da hierarquia da versão em uma thread de segundo
+    plano (uma por versão neste processo), depois de delay segundos; se
+    outra versão surgir nesse meio tempo, esta nem chega a ser construída.
+    """
+    if not ENABLED:
+        return
+    with _lock:
+        if version in _building:
+            return
+        _building.add(version)
+    timer = threading.Timer(delay, _build, args=(version, reuse_order))
+    timer.daemon = True
+    timer.start()
+
+
+def invalidate():
+    global _hierarchy
+    with _lock:
+        _hierarchy = None
+
+
+def get_hierarchy(graph: Graph, build: bool = True) -> contraction.Hierarchy | None:
+    """
+    Hierarquia da versão de graph, ou None se ainda não estiver pronta;
+    nesse caso a construção é disparada em segundo plano (se build) e quem
+    chamou deve cair para o Dijkstra. Os workers de cálculo usam
+    build=False: só o processo principal constrói a hierarquia.
+    """
+    global _hierarchy
+    if not ENABLED:
+        return None
+    hierarchy = _hierarchy
+    if hierarchy is not None and hierarchy.version == graph.version:
+        return hierarchy
+
+    hierarchy = _read_file(graph.version)
+    if hierarchy is None:
+        if build:
+            schedule_build(graph.version)
+        return None
+    with _lock:
+        _hierarchy = hierarchy
+    return hierarchy
@@ -0,0 +1,233 @@
+import csv
+import json
+import sqlite3
+
+# colunas aceitas por tabela, na ordem do INSERT, com o conversor de cada uma
+TABLES = {
+    "nodes": (("id", int), ("name", str), ("x", float), ("y", float)),
+    "edges": (("id", int), ("from_node", int), ("to_node", int), ("weight", float)),
+    "jobs": (("id", int), ("type", str), ("node_id", int), ("service_time", float),
+             ("window_start", float), ("window_end", float), ("demand", float)),
+    "precedences": (("job_before", int), ("job_after", int)),
+}
+
+# colunas que podem faltar (ou vir vazias), com o valor usado nesse caso
+OPTIONAL = {
+    ("jobs", "service_time"): 0.0,
+    ("jobs", "window_start"): None,
+    ("jobs", "window_end"): None,
+    ("jobs", "demand"): 0.0,
+}
+
+# ordem de limpeza respeitando as chaves estrangeiras
+_DELETE_ORDER = ("precedences", "jobs", "edges", "nodes")
+
+# linhas acumuladas por tabela antes de cada executemany
+CHUNK_ROWS = 5000
+
+
+class IngestError(Exception):
+    """
+    Linha inválida no arquivo enviado (line é o número da linha, a partir de 1).
+    """
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"Linha {line}: {message}")
+        self.line = line
+
+
+def _insert_sql(table: str) -> str:
+    columns = [name for name, _ in TABLES[table]]
+    marks = ", ".join("?" for _ in columns)
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({marks})"
+
+
+def _convert(table: str, values: dict, line: int) -> tuple:
+    if table not in TABLES:
+        raise IngestError(line, f"tabela desconhecida '{table}'.")
+    row = []
+    for name, kind in TABLES[table]:
+        value = values.get(name)
+        if value is None or value == "":
+            if (table, name) in OPTIONAL:
+                row.append(OPTIONAL[(table, name)])
+                continue
+            raise IngestError(line, f"campo '{name}' ausente para '{table}'.")
+        try:
+            row.append(kind(value))
+        except (TypeError, ValueError):
+            raise IngestError(line, f"valor inválido em '{name}': {value!r}.")
+    if table == "jobs":
+        _check_job(*row[3:], line)
+    return tuple(row)
+
+
+def _check_job(service_time, window_start, window_end, demand, line: int):
+    # as mesmas regras do modelo Job de /dataset/upload_dataset
+    if service_time < 0:
+        raise IngestError(line, "service_time não pode ser negativo.")
+    if demand < 0:
+        raise IngestError(line, "demand não pode ser negativa.")
+    if window_start is not None and window_end is not None and window_start > window_end:
+        raise IngestError(line, "window_start maior que window_end.")
+
+
+def _decode(raw: bytes, number: int) -> str:
+    try:
+        return raw.decode("utf-8").rstrip("\r")
+    except UnicodeDecodeError:
+        raise IngestError(number, "UTF-8 inválido.")
+
+
+async def _lines(chunks):
+    """
+    Quebra o corpo (recebido em pedaços) em linhas, sem ler tudo de uma vez.
+    O separador b"\\n" nunca aparece dentro de um caractere UTF-8 multibyte.
+    Gera (número da linha, texto).
+    """
+    tail = b""
+    number = 0
+    async for chunk in chunks:
+        tail += chunk
+        *lines, tail = tail.split(b"\n")
+        for raw in lines:
+            number += 1
+            yield number, _decode(raw, number)
+    if tail:
+        number += 1
+        yield number, _decode(tail, number)
+
+
+async def parse_ndjson(chunks):
+    """
+    Um objeto JSON por linha, com o campo "table" indicando o destino.
+    Gera (número da linha, tabela, linha convertida).
+    """
+    async for number, line in _lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise IngestError(number, f"JSON inválido ({exc.msg}).")
+        if not isinstance(obj, dict):
+            raise IngestError(number, "esperado um objeto JSON.")
+        table = obj.get("table")
+        yield number, table, _convert(table, obj, number)
+
+
+async def parse_csv(chunks):
+    """
+    CSV com cabeçalho; a coluna "table" indica o destino de cada linha e as
+    colunas que não se aplicam à tabela ficam vazias. Campos entre aspas não
+    podem conter quebras de linha.
+    Gera (número da linha, tabela, linha convertida).
+    """
+    header = None
+    async for number, line in _lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            fields = next(csv.reader([line]))
+        except csv.Error as exc:
+            raise IngestError(number, f"CSV inválido ({exc}).")
+        if header is None:
+            header = [name.strip() for name in fields]
+            if "table" not in header:
+                raise IngestError(number, "o cabeçalho precisa da coluna 'table'.")
+            continue
+        values = dict(zip(header, fields))
+        table = values.get("table", "").strip()
+        yield number, table, _convert(table, values, number)
+
+
+def drop_indexes(cur) -> list[str]:
+    """
+    Remove os índices das tabelas do dataset e devolve o SQL para recriá-los:
+    montar o índice uma vez no fim sai mais barato que mantê-lo a cada INSERT.
+    """
+    names = ", ".join("?" for _ in TABLES)
+    cur.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+        f"AND sql IS NOT NULL AND tbl_name IN ({names})",
+        tuple(TABLES),
+    )
+    indexes = cur.fetchall()
+    for name, _ in indexes:
+        cur.execute(f'DROP INDEX "{name}"')
+    return [sql for _, sql in indexes]
+
+
+def _insert_batch(cur, table: str, sql: str, batch: list[tuple], lines: list[int]):
+    """
+    executemany do bloco; se ele violar alguma restrição (id repetido, type
+    inválido), o bloco é desfeito e refeito linha a linha para apontar a
+    linha do arquivo que falhou.
+    """
+    cur.execute("SAVEPOINT batch")
+    try:
+        cur.executemany(sql, batch)
+    except sqlite3.IntegrityError as exc:
+        cur.execute("ROLLBACK TO batch")
+        for row, line in zip(batch, lines):
+            try:
+                cur.execute(sql, row)
+            except sqlite3.IntegrityError as row_exc:
+                raise IngestError(line, f"{table}: {row_exc}.")
+        raise IngestError(lines[0], f"{table}: {exc}.")
+    finally:
+        cur.execute("RELEASE batch")
+
+
+async def load(conn: sqlite3.Connection, rows, run) -> dict:
+    """
+    Substitui o dataset pelas linhas geradas por rows (parse_ndjson ou
+    parse_csv) numa única transação, com executemany em blocos de
+    CHUNK_ROWS. run(func, *args) executa as chamadas ao SQLite (por exemplo
+    numa thread, para não travar o event loop).
+
+    A transação fica aberta para o chamador concluir (versão do dataset,
+    caches) e dar o commit; as chaves estrangeiras só são conferidas nesse
+    commit, então as tabelas podem vir em qualquer ordem. Em caso de erro
+    aqui a transação é desfeita.
+    Retorna as linhas inseridas por tabela.
+    """
+    cur = conn.cursor()
+    await run(cur.execute, "PRAGMA journal_mode = WAL")
+    await run(cur.execute, "PRAGMA synchronous = NORMAL")
+
+    counts = {table: 0 for table in TABLES}
+    pending: dict[str, list[tuple]] = {table: [] for table in TABLES}
+    # número da linha do arquivo de cada linha pendente, para os erros
+    pending_lines: dict[str, list[int]] = {table: [] for table in TABLES}
+    sql = {table: _insert_sql(table) for table in TABLES}
+
+    await run(cur.execute, "BEGIN")
+    try:
+        await run(cur.execute, "PRAGMA defer_foreign_keys = ON")
+        index_sql = await run(drop_indexes, cur)
+        for table in _DELETE_ORDER:
+            await run(cur.execute, f"DELETE FROM {table}")
+
+        async for number, table, row in rows:
+            batch = pending[table]
+            batch.append(row)
+            pending_lines[table].append(number)
+            if len(batch) >= CHUNK_ROWS:
+                await run(_insert_batch, cur, table, sql[table], batch, pending_lines[table])
+                counts[table] += len(batch)
+                batch.clear()
+                pending_lines[table].clear()
+
+        for table, batch in pending.items():
+            if batch:
+                await run(_insert_batch, cur, table, sql[table], batch, pending_lines[table])
+                counts[table] += len(batch)
+
+        for statement in index_sql:
+            await run(cur.execute, statement)
+    except BaseException:
+        await run(conn.rollback)
+        raise
+
+    return counts
@@ -1,10 +1,12 @@
+import os
 import sqlite3
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent
 
 SCHEMA_PATH = BASE_DIR / "schema.sql"         # .../app/database/schema.sql
-DB_PATH = BASE_DIR.parent / "grafos.db"       # .../app/grafos.db
+# .../app/grafos.db, o mesmo de app/database/connection.py (GRAFOS_DB sobrescreve)
+DB_PATH = Path(os.environ.get("GRAFOS_DB", BASE_DIR.parent / "grafos.db"))
 
 def init_db():
     conn = sqlite3.connect(DB_PATH)
@@ -19,6 +19,13 @@ CREATE TABLE jobs (
     id INTEGER PRIMARY KEY,
     type TEXT CHECK(type IN ('pickup', 'dropoff')),
     node_id INTEGER NOT NULL,
+    -- restrições opcionais: tempo de atendimento, janela para o início do
+    -- atendimento (NULL = sem limite) e demanda (carga coletada no pickup,
+    -- entregue no dropoff)
+    service_time REAL NOT NULL DEFAULT 0,
+    window_start REAL,
+    window_end REAL,
+    demand REAL NOT NULL DEFAULT 0,
     FOREIGN KEY (node_id) REFERENCES nodes(id)
 );
 
@@ -30,3 +37,60 @@ CREATE TABLE precedences (
     FOREIGN KEY (job_before) REFERENCES jobs(id),
     FOREIGN KEY (job_after)  REFERENCES jobs(id)
 );
+
+-- índices das chaves estrangeiras mais consultadas
+CREATE INDEX IF NOT EXISTS idx_edges_from_node ON edges(from_node);
+CREATE INDEX IF NOT EXISTS idx_edges_to_node ON edges(to_node);
+CREATE INDEX IF NOT EXISTS idx_jobs_node_id ON jobs(node_id);
+CREATE INDEX IF NOT EXISTS idx_precedences_job_after ON precedences(job_after);
+
+-- versão do dataset (chave 'graph_version'), incrementada a cada upload,
+-- e capacidade do veículo (chave 'vehicle_capacity', ausente = sem limite)
+CREATE TABLE IF NOT EXISTS dataset_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+-- distâncias e predecessores (arrays binários indexados pelo índice denso
+-- do nó) calculados a partir de source_node na versão indicada do dataset
+CREATE TABLE IF NOT EXISTS distance_rows (
+    version INTEGER NOT NULL,
+    source_node INTEGER NOT NULL,
+    dist BLOB NOT NULL,
+    pred BLOB NOT NULL,
+    PRIMARY KEY (version, source_node)
+);
+
+-- tickets de POST /routes/solve, visíveis para todos os processos do
+-- servidor: estado, progresso, resultado e erro (JSON); updated é o último
+-- sinal do processo que calcula e cancel_requested, um pedido de
+-- cancelamento vindo de outro processo (horários em segundos Unix)
+CREATE TABLE IF NOT EXISTS solve_tickets (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    start_node INTEGER NOT NULL,
+    strategy TEXT NOT NULL,
+    cached INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    finished REAL,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_solve_tickets_active ON solve_tickets(key)
+    WHERE finished IS NULL;
+
+-- rotas prontas por chave (versões do dataset, start_node, estratégia e
+-- opções), descartadas pela mais antiga em used
+CREATE TABLE IF NOT EXISTS solve_results (
+    key TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_solve_results_used ON solve_results(used);
+
+-- banco já no nível das migrações de app/database/connection.py
+PRAGMA user_version = 4;
@@ -0,0 +1,334 @@
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+
+import app.database.connection as db
+from app.algorithms.csr import CSRGraph
+from app.database import graph_store
+
+# Snapshot binário de um dataset (little-endian):
+#
+#   cabeçalho (64 bytes): magic, formato, reservado, versão do dataset,
+#                         n nós, m arestas, jobs, precedências, bytes dos nomes
+#   node_ids q[n] | xs d[n] | ys d[n]
+#   offsets q[n+1] | targets q[m] | weights d[m] | edge_ids q[m]   (CSR)
+#   job_ids q[j] | job_nodes q[j] | prec_before q[p] | prec_after q[p]
+#   job_types u8[j] (0 pickup, 1 dropoff, 255 nulo), completado até 8 bytes
+#   service_time d[j] | window_start d[j] | window_end d[j] | demand d[j]
+#   capacidade do veículo d[1]                  (formato 2; NaN = nulo)
+#   nomes dos nós: lista JSON
+#
+# Todas as seções numéricas começam em múltiplos de 8 bytes, então um
+# processo pode mapear o arquivo (mmap) e enxergar cada uma como
+# memoryview.cast sem copiar nada; vários workers compartilham as mesmas
+# páginas físicas do arquivo.
+
+MAGIC = b"GRAFSNP1"
+FORMAT_VERSION = 2
+# formatos que ainda são lidos (o 1 não tem as restrições dos jobs)
+_READABLE = (1, 2)
+_HEADER = struct.Struct("<8sIIqqqqqq")
+
+_JOB_TYPES = {"pickup": 0, "dropoff": 1, None: 255}
+_JOB_TYPE_NAMES = {code: name for name, code in _JOB_TYPES.items()}
+
+_lock = threading.Lock()
+_refreshing: set[int] = set()
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def _le(arr: array) -> bytes:
+    if sys.byteorder != "little":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _pad(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 8)
+
+
+def _nan(value) -> float:
+    return math.nan if value is None else value
+
+
+def _null(value: float):
+    return None if math.isnan(value) else value
+
+
+def encode(version: int, nodes, edges, jobs, precedences, capacity=None) -> bytes:
+    """
+    Monta o snapshot a partir das linhas das tabelas:
+    nodes (id, name, x, y), edges (id, from_node, to_node, weight),
+    jobs (id, type, node_id, service_time, window_start, window_end, demand),
+    precedences (job_before, job_after) e a capacidade do veículo.
+    """
+    nodes = sorted(nodes)
+    node_ids = array("q", (r[0] for r in nodes))
+    xs = array("d", (_nan(r[2]) for r in nodes))
+    ys = array("d", (_nan(r[3]) for r in nodes))
+    names = json.dumps([r[1] for r in nodes]).encode("utf-8")
+
+    # CSR na mesma ordem de CSRGraph.from_edges, guardando o id de cada aresta
+    edges = list(edges)
+    csr = CSRGraph.from_edges(list(node_ids), ((r[1], r[2], r[3]) for r in edges))
+    index = csr.index
+    fill = array("q", csr.offsets[:-1])
+    edge_ids = array("q", bytes(8 * csr.num_edges))
+    for edge_id, from_node, to_node, _ in edges:
+        u = index.get(from_node)
+        if u is None or to_node not in index:
+            continue
+        edge_ids[fill[u]] = edge_id
+        fill[u] += 1
+
+    job_ids = array("q", (r[0] for r in jobs))
+    job_nodes = array("q", (r[2] for r in jobs))
+    try:
+        job_types = bytes(_JOB_TYPES[r[1]] for r in jobs)
+    except KeyError as exc:
+        raise SnapshotError(f"Tipo de job inválido: {exc.args[0]!r}.")
+    job_columns = [array("d", (_nan(r[c]) for r in jobs)) for c in range(3, 7)]
+    prec_before = array("q", (r[0] for r in precedences))
+    prec_after = array("q", (r[1] for r in precedences))
+
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, 0, version,
+        len(node_ids), csr.num_edges, len(job_ids), len(prec_before), len(names),
+    )
+    return b"".join([
+        _pad(header),
+        _le(node_ids), _le(xs), _le(ys),
+        _le(csr.offsets), _le(csr.targets), _le(csr.weights), _le(edge_ids),
+        _le(job_ids), _le(job_nodes), _le(prec_before), _le(prec_after),
+        _pad(job_types),
+        *(_le(column) for column in job_columns),
+        _le(array("d", [_nan(capacity)])),
+        names,
+    ])
+
+
+class Snapshot:
+    """
+    Snapshot aberto sobre um buffer (bytes ou mmap). As seções numéricas são
+    memoryviews sobre o próprio buffer, sem cópia (em máquinas big-endian
+    são copiadas para arrays e convertidas).
+    """
+
+    def __init__(self, buffer):
+        if len(buffer) < _HEADER.size:
+            raise SnapshotError("Snapshot truncado.")
+        (magic, fmt, _, self.version, n, m, n_jobs, n_prec,
+         names_size) = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise SnapshotError("Arquivo não é um snapshot de dataset.")
+        if fmt not in _READABLE:
+            raise SnapshotError(f"Formato de snapshot {fmt} não suportado.")
+
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self._pos = _HEADER.size + (-_HEADER.size % 8)
+
+        self.node_ids = self._take("q", n)
+        self.xs = self._take("d", n)
+        self.ys = self._take("d", n)
+        self.offsets = self._take("q", n + 1)
+        self.targets = self._take("q", m)
+        self.weights = self._take("d", m)
+        self.edge_ids = self._take("q", m)
+        self.job_ids = self._take("q", n_jobs)
+        self.job_nodes = self._take("q", n_jobs)
+        self.prec_before = self._take("q", n_prec)
+        self.prec_after = self._take("q", n_prec)
+        self.job_types = self._take("B", n_jobs)
+        self._pos += -n_jobs % 8
+        if fmt >= 2:
+            self.job_columns = [self._take("d", n_jobs) for _ in range(4)]
+            self.capacity = _null(self._take("d", 1)[0])
+        else:
+            self.job_columns = None
+            self.capacity = None
+        self._names = self._take("B", names_size)
+        if self._pos != len(buffer):
+            raise SnapshotError("Tamanho do snapshot não confere com o cabeçalho.")
+
+    def _take(self, typecode: str, count: int):
+        size = struct.calcsize(typecode) * count
+        if self._pos + size > len(self._buffer):
+            raise SnapshotError("Snapshot truncado.")
+        view = self._view[self._pos:self._pos + size]
+        self._pos += size
+        if sys.byteorder != "little" and typecode != "B":
+            arr = array(typecode, view.tobytes())
+            arr.byteswap()
+            return arr
+        return view.cast(typecode)
+
+    def rows(self):
+        """
+        Linhas (nodes, edges, jobs, precedences) no formato das tabelas e a
+        capacidade do veículo.
+        """
+        node_ids = self.node_ids.tolist()
+        names = json.loads(bytes(self._names).decode("utf-8"))
+        nodes = [
+            (nid, name, _null(x), _null(y))
+            for nid, name, x, y in zip(node_ids, names, self.xs.tolist(), self.ys.tolist())
+        ]
+
+        offsets, targets, weights, edge_ids = self.offsets, self.targets, self.weights, self.edge_ids
+        try:
+            edges = [
+                (edge_ids[e], node_ids[u], node_ids[targets[e]], weights[e])
+                for u in range(len(node_ids))
+                for e in range(offsets[u], offsets[u + 1])
+            ]
+        except IndexError:
+            raise SnapshotError("CSR do snapshot inconsistente.")
+
+        n_jobs = len(self.job_ids)
+        if self.job_columns is None:
+            # formato 1: jobs sem restrições
+            columns = [[0.0] * n_jobs, [None] * n_jobs, [None] * n_jobs, [0.0] * n_jobs]
+        else:
+            columns = [[_null(v) for v in column.tolist()] for column in self.job_columns]
+        try:
+            jobs = [
+                (jid, _JOB_TYPE_NAMES[code], node, *extra)
+                for jid, code, node, *extra in zip(self.job_ids.tolist(), self.job_types.tolist(),
+                                                   self.job_nodes.tolist(), *columns)
+            ]
+        except KeyError as exc:
+            raise SnapshotError(f"Tipo de job inválido no snapshot: {exc.args[0]}.")
+        precedences = list(zip(self.prec_before.tolist(), self.prec_after.tolist()))
+        return nodes, edges, jobs, precedences, self.capacity
+
+
+def read_tables(cur):
+    """
+    Lê todas as tabelas do dataset; usar dentro de uma transação para que
+    versão e linhas venham do mesmo snapshot do banco.
+    """
+    cur.execute("SELECT id, name, x, y FROM nodes")
+    nodes = cur.fetchall()
+    cur.execute("SELECT id, from_node, to_node, weight FROM edges")
+    edges = cur.fetchall()
+    cur.execute(
+        "SELECT id, type, node_id, service_time, window_start, window_end, demand "
+        "FROM jobs ORDER BY id"
+    )
+    jobs = cur.fetchall()
+    cur.execute("SELECT job_before, job_after FROM precedences ORDER BY id")
+    precedences = cur.fetchall()
+    return nodes, edges, jobs, precedences, graph_store.read_capacity(cur)
+
+
+def _prefix() -> str:
+    return os.path.splitext(db.DB_PATH)[0]
+
+
+def path_for(version: int, jobs_version: int) -> str:
+    """
+    Um arquivo por versão do grafo e dos jobs (grafos.v<grafo>.j<jobs>.snap,
+    ao lado do banco): um snapshot mapeado por algum worker nunca é
+    sobrescrito, e jobs, precedências ou capacidade alterados levam a um
+    arquivo novo no próximo export.
+    """
+    return f"{_prefix()}.v{version}.j{jobs_version}.snap"
+
+
+def save(data: bytes, version: int, jobs_version: int) -> str:
+    """
+    Grava o snapshot da versão (troca atômica) e tenta apagar os de versões
+    anteriores; os que ainda estiverem mapeados em outro processo podem
+    falhar ao apagar (Windows) e ficam para a próxima vez.
+    """
+    path = path_for(version, jobs_version)
+    # um temporário por thread: duas gravações da mesma versão no mesmo
+    # processo não podem trocar o arquivo uma da outra
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+    for old in glob.glob(f"{glob.escape(_prefix())}.v*.snap"):
+        if old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return path
+
+
+def export_current() -> tuple[int, str]:
+    """
+    Garante o arquivo de snapshot das versões atuais (grafo e jobs) do banco.
+    Retorna (versão do grafo, caminho).
+    """
+    conn = db.get_read_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN")
+        version = graph_store.read_version(cur)
+        jobs_version = graph_store.read_version(cur, graph_store.JOBS_VERSION_KEY)
+        path = path_for(version, jobs_version)
+        if os.path.exists(path):
+            return version, path
+        tables = read_tables(cur)
+    finally:
+        conn.rollback()
+        conn.close()
+    return version, save(encode(version, *tables), version, jobs_version)
+
+
+def _refresh(version: int):
+    try:
+        if graph_store.get_version() == version:
+            export_current()
+    finally:
+        with _lock:
+            _refreshing.discard(version)
+
+
+def schedule_refresh(version: int, delay: float = 0.0):
+    """
+    Gera em segundo plano, depois de delay segundos, o snapshot da versão,
+    para que os próximos workers carreguem o grafo direto do arquivo; se
+    outra versão surgir nesse meio tempo, este nem chega a ser gravado.
+    """
+    with _lock:
+        if version in _refreshing:
+            return
+        _refreshing.add(version)
+    timer = threading.Timer(delay, _refresh, args=(version,))
+    timer.daemon = True
+    timer.start()
+
+
+def open_file(version: int) -> Snapshot | None:
+    """
+    Mapeia um snapshot válido da versão do grafo, se existir; o grafo é o
+    mesmo em qualquer versão dos jobs, então serve o de qualquer uma.
+    """
+    for path in glob.glob(f"{glob.escape(_prefix())}.v{version}.j*.snap"):
+        try:
+            with open(path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            continue
+        try:
+            snapshot = Snapshot(buffer)
+        except SnapshotError:
+            continue
+        if snapshot.version == version:
+            return snapshot
+    return None
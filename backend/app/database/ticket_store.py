@@ -0,0 +1,179 @@
+import json
+import time
+
+import app.database.connection as db
+
+# Tickets de POST /routes/solve e rotas prontas no SQLite, para que qualquer
+# processo do servidor (uvicorn --workers, réplicas atrás de um balanceador
+# no mesmo banco) responda por eles. O cálculo continua no processo que
+# recebeu o POST; ele publica estado e progresso aqui e lê os pedidos de
+# cancelamento feitos nos demais.
+
+_FIELDS = (
+    "id", "status", "start_node", "strategy", "cached", "created", "updated", "finished",
+    "progress", "result", "error", "cancel_requested",
+)
+_COLUMNS = ", ".join(_FIELDS)
+
+
+def _row(row) -> dict | None:
+    if row is None:
+        return None
+    fields = dict(zip(_FIELDS, row))
+    fields["cached"] = bool(fields["cached"])
+    fields["cancel_requested"] = bool(fields["cancel_requested"])
+    for name in ("progress", "result", "error"):
+        if fields[name] is not None:
+            fields[name] = json.loads(fields[name])
+    return fields
+
+
+def _dumps(value) -> str | None:
+    return None if value is None else json.dumps(value)
+
+
+def insert(ticket_id: str, key: str, status: str, start_node: int, strategy: str,
+           created: float, cached: bool = False, result: dict | None = None,
+           finished: float | None = None):
+    conn = db.get_connection()
+    try:
+        conn.execute(
+            "INSERT INTO solve_tickets (id, key, status, start_node, strategy, cached, "
+            "created, updated, finished, result) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (ticket_id, key, status, start_node, strategy, int(cached), created, created,
+             finished, _dumps(result))
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def publish(ticket_id: str, status: str, progress: dict) -> bool:
+    """
+    Estado e progresso de um ticket em andamento, com o horário como sinal
+    de vida do processo que calcula. Retorna se outro processo pediu o
+    cancelamento.
+    """
+    conn = db.get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "UPDATE solve_tickets SET status = ?, progress = ?, updated = ? "
+            "WHERE id = ? AND finished IS NULL",
+            (status, _dumps(progress), time.time(), ticket_id)
+        )
+        cur.execute("SELECT cancel_requested FROM solve_tickets WHERE id = ?", (ticket_id,))
+        row = cur.fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+    return bool(row and row[0])
+
+
+def finish(ticket_id: str, status: str, finished: float, result: dict | None = None,
+           error: dict | None = None):
+    conn = db.get_connection()
+    try:
+        conn.execute(
+            "UPDATE solve_tickets SET status = ?, progress = NULL, result = ?, error = ?, "
+            "updated = ?, finished = ? WHERE id = ?",
+            (status, _dumps(result), _dumps(error), finished, finished, ticket_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get(ticket_id: str) -> dict | None:
+    conn = db.get_read_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT {_COLUMNS} FROM solve_tickets WHERE id = ?", (ticket_id,))
+        return _row(cur.fetchone())
+    finally:
+        conn.close()
+
+
+def find_active(key: str) -> dict | None:
+    """
+    Ticket ainda em andamento com a mesma chave, se houver.
+    """
+    conn = db.get_read_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            f"SELECT {_COLUMNS} FROM solve_tickets WHERE key = ? AND finished IS NULL "
+            f"ORDER BY created LIMIT 1",
+            (key,)
+        )
+        return _row(cur.fetchone())
+    finally:
+        conn.close()
+
+
+def request_cancel(ticket_id: str):
+    conn = db.get_connection()
+    try:
+        conn.execute(
+            "UPDATE solve_tickets SET cancel_requested = 1 WHERE id = ? AND finished IS NULL",
+            (ticket_id,)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def expire(ttl: float, stale: float, stale_error: dict):
+    """
+    Apaga os tickets concluídos há mais de ttl segundos e encerra como
+    failed (com stale_error) os em andamento sem sinal de vida há mais de
+    stale segundos: o processo que os calculava terminou.
+    """
+    now = time.time()
+    conn = db.get_connection()
+    try:
+        conn.execute(
+            "DELETE FROM solve_tickets WHERE finished IS NOT NULL AND finished < ?", (now - ttl,)
+        )
+        conn.execute(
+            "UPDATE solve_tickets SET status = 'failed', error = ?, progress = NULL, "
+            "finished = ? WHERE finished IS NULL AND updated < ?",
+            (_dumps(stale_error), now, now - stale)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get_result(key: str) -> dict | None:
+    conn = db.get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT result FROM solve_results WHERE key = ?", (key,))
+        row = cur.fetchone()
+        if row is not None:
+            cur.execute("UPDATE solve_results SET used = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+    finally:
+        conn.close()
+    return None if row is None else json.loads(row[0])
+
+
+def put_result(key: str, result: dict, limit: int):
+    """
+    Guarda a rota pronta e descarta as menos usadas além de limit.
+    """
+    conn = db.get_connection()
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO solve_results (key, result, used) VALUES (?, ?, ?)",
+            (key, json.dumps(result), time.time())
+        )
+        conn.execute(
+            "DELETE FROM solve_results WHERE key NOT IN "
+            "(SELECT key FROM solve_results ORDER BY used DESC LIMIT ?)",
+            (limit,)
+        )
+        conn.commit()
+    finally:
+        conn.close()
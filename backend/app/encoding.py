@@ -0,0 +1,123 @@
+import json
+import os
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+try:
+    import msgpack
+except ImportError:  # MessagePack é opcional: sem ele só JSON e NDJSON
+    msgpack = None
+
+# Respostas grandes (matriz de custos, lista de adjacência) geradas aos
+# poucos: o corpo sai em pedaços enquanto as linhas são convertidas, sem
+# montar a estrutura inteira nem o texto inteiro em memória.
+
+JSON = "json"
+NDJSON = "ndjson"
+MSGPACK = "msgpack"
+
+MEDIA_TYPES = {
+    JSON: "application/json",
+    NDJSON: "application/x-ndjson",
+    MSGPACK: "application/x-msgpack",
+}
+
+# bytes acumulados antes de cada envio
+CHUNK_BYTES = int(os.environ.get("STREAM_CHUNK_BYTES", 64 * 1024))
+
+
+def require(format: str):
+    if format == MSGPACK and msgpack is None:
+        raise HTTPException(
+            status_code=400, detail="MessagePack requer o pacote msgpack instalado."
+        )
+
+
+def dumps(value) -> str:
+    # mesmo formato do JSONResponse: a resposta em streaming é idêntica
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def _json_document(head: dict, key: str, items):
+    """
+    {**head, key: [items...]} em texto, um item por vez.
+    """
+    start = dumps(head)[:-1]
+    yield f"{start}{',' if head else ''}{dumps(key)}:["
+    first = True
+    for item in items:
+        yield dumps(item) if first else "," + dumps(item)
+        first = False
+    yield "]}"
+
+
+def _ndjson(head: dict, items):
+    """
+    head na primeira linha e um item por linha depois.
+    """
+    yield dumps(head) + "\n"
+    for item in items:
+        yield dumps(item) + "\n"
+
+
+def _msgpack_document(head: dict, key: str, items, count: int):
+    packer = msgpack.Packer()
+    yield packer.pack_map_header(len(head) + 1)
+    for name, value in head.items():
+        yield packer.pack(name) + packer.pack(value)
+    yield packer.pack(key) + packer.pack_array_header(count)
+    for item in items:
+        yield packer.pack(item)
+
+
+def _chunks(parts):
+    buffer: list[bytes] = []
+    size = 0
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        buffer.append(part)
+        size += len(part)
+        if size >= CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def stream(format: str, head: dict, key: str, items, count: int, headers=None,
+           background=None) -> StreamingResponse:
+    """
+    Resposta em streaming com os campos de head e a lista key com os count
+    itens gerados por items (um iterável preguiçoso):
+    - json: o mesmo documento {**head, key: [...]} da resposta comum;
+    - ndjson: head na primeira linha, depois um item por linha;
+    - msgpack: o mesmo documento do json, em MessagePack.
+    items é consumido numa thread do servidor, à medida que o cliente lê;
+    background roda depois do envio (ou da desconexão do cliente).
+    """
+    require(format)
+    if format == NDJSON:
+        parts = _ndjson(head, items)
+    elif format == MSGPACK:
+        parts = _msgpack_document(head, key, items, count)
+    else:
+        parts = _json_document(head, key, items)
+    return StreamingResponse(_chunks(parts), media_type=MEDIA_TYPES[format], headers=headers,
+                             background=background)
+
+
+def node_runs(path_edges: list[tuple[int, int]]) -> list[list[int]]:
+    """
+    Arestas (u, v) consecutivas como sequências de nós: cada trecho em que
+    uma aresta começa onde a anterior terminou vira [u, v, w, ...]; a
+    lista só é quebrada quando o caminho não é contínuo.
+    """
+    runs: list[list[int]] = []
+    for u, v in path_edges:
+        if runs and runs[-1][-1] == u:
+            runs[-1].append(v)
+        else:
+            runs.append([u, v])
+    return runs
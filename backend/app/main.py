@@ -1,8 +1,25 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import dataset, graph, jobs, routes
+from fastapi.responses import PlainTextResponse
+import app.database.connection as db
+from app import metrics, workers
+from app.algorithms import multi_source
+from app.routers import dataset, graph, jobs, routes, solve
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # pools de conexão e migrações do banco antes da primeira requisição
+    db.init()
+    yield
+    workers.shutdown()
+    multi_source.shutdown()
+    db.shutdown()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 
 app.add_middleware(
@@ -11,13 +28,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 @app.get("/")
 def root():
     return {"message": "Backend funcionando!"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Contadores (buscas, estados do solver, caches, requisições) e duração
+    das fases e requisições, no formato de exposição do Prometheus.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 app.include_router(dataset.router, prefix="/dataset")
 app.include_router(graph.router,   prefix="/graph")
 app.include_router(jobs.router,    prefix="/jobs")
 app.include_router(routes.router,  prefix="/routes")
+app.include_router(solve.router,   prefix="/routes")
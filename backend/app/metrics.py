@@ -0,0 +1,219 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Métricas em memória do processo, expostas em /metrics no formato texto do
+# Prometheus. Os workers (ver workers._call) acumulam as suas localmente e
+# as devolvem junto com o resultado de cada cálculo (drain / merge).
+
+# com 1, as respostas trazem o cabeçalho Server-Timing com as fases medidas
+SERVER_TIMING = os.environ.get("METRICS_SERVER_TIMING", "0") == "1"
+
+PREFIX = "grafos_"
+
+# nome -> texto de ajuda; só os nomes daqui aparecem em /metrics
+COUNTERS = {
+    "dijkstra_runs_total": "Buscas de Dijkstra/A* executadas, por algoritmo.",
+    "dijkstra_heap_pushes_total": "Inserções na fila de prioridade das buscas, por algoritmo.",
+    "dijkstra_settled_nodes_total": "Nós fixados pelas buscas, por algoritmo.",
+    "solver_states_total": "Estados expandidos pelos solvers: (máscara, último job) do DP com sucessores testados, ou nós do branch and bound.",
+    "cache_hits_total": "Consultas atendidas por cache, por cache.",
+    "cache_misses_total": "Consultas que precisaram calcular ou ler do banco, por cache.",
+    "http_requests_total": "Requisições HTTP atendidas, por rota e status.",
+}
+HISTOGRAMS = {
+    "phase_duration_seconds": "Duração das fases de cada requisição (carga do grafo, custos, solver...).",
+    "http_request_duration_seconds": "Duração das requisições HTTP, por rota.",
+}
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+# (nome, rótulos) -> valor
+_counters: dict[tuple[str, tuple], float] = {}
+# (nome, rótulos) -> [contagem por bucket..., +Inf, soma]
+_histograms: dict[tuple[str, tuple], list[float]] = {}
+
+# fases medidas na requisição atual: [(nome, segundos)]
+_request_spans: ContextVar[list | None] = ContextVar("request_spans", default=None)
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def count(name: str, value: float = 1, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, seconds: float, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        values = _histograms.get(key)
+        if values is None:
+            values = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                values[i] += 1
+        values[-2] += 1
+        values[-1] += seconds
+
+
+@contextmanager
+def span(phase: str):
+    """
+    Mede o bloco como uma fase: entra no histograma phase_duration_seconds
+    e, dentro de uma requisição, no cabeçalho Server-Timing.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe("phase_duration_seconds", elapsed, phase=phase)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((phase, elapsed))
+
+
+def search(algorithm: str, pushes: int, settled: int):
+    """
+    Registra uma busca (Dijkstra, A*...) com o total de inserções na fila e
+    de nós fixados; as buscas contam localmente e chamam isto uma vez no fim.
+    """
+    count("dijkstra_runs_total", algorithm=algorithm)
+    count("dijkstra_heap_pushes_total", pushes, algorithm=algorithm)
+    count("dijkstra_settled_nodes_total", settled, algorithm=algorithm)
+
+
+def cache(name: str, hit: bool, value: int = 1):
+    count("cache_hits_total" if hit else "cache_misses_total", value, cache=name)
+
+
+def drain() -> tuple[dict, dict]:
+    """
+    Retira e devolve tudo o que foi acumulado neste processo (no worker,
+    para voltar ao processo principal junto com o resultado).
+    """
+    global _counters, _histograms
+    with _lock:
+        counters, histograms = _counters, _histograms
+        _counters, _histograms = {}, {}
+    return counters, histograms
+
+
+def merge(delta: tuple[dict, dict] | None):
+    if not delta:
+        return
+    counters, histograms = delta
+    with _lock:
+        for key, value in counters.items():
+            _counters[key] = _counters.get(key, 0) + value
+        for key, values in histograms.items():
+            current = _histograms.get(key)
+            if current is None:
+                _histograms[key] = list(values)
+            else:
+                for i, value in enumerate(values):
+                    current[i] += value
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render() -> str:
+    """
+    Todas as métricas no formato de exposição texto do Prometheus (0.0.4).
+    """
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+
+    lines = []
+    for name, help_text in COUNTERS.items():
+        lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}{name} counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{PREFIX}{name}{_format_labels(labels)} {_format_value(value)}")
+
+    for name, help_text in HISTOGRAMS.items():
+        lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}{name} histogram")
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, value in zip(BUCKETS, values):
+                le = (("le", _format_value(bound)),)
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, le)} {_format_value(value)}")
+            lines.append(f'{PREFIX}{name}_bucket{_format_labels(labels, (("le", "+Inf"),))} '
+                         f"{_format_value(values[-2])}")
+            lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {_format_value(values[-1])}")
+            lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {_format_value(values[-2])}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _server_timing(spans: list[tuple[str, float]]) -> str:
+    # fases repetidas na mesma requisição são somadas, na ordem da primeira
+    totals: dict[str, float] = {}
+    for phase, seconds in spans:
+        totals[phase] = totals.get(phase, 0.0) + seconds
+    return ", ".join(f"{phase};dur={seconds * 1000:.3f}" for phase, seconds in totals.items())
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: conta e mede cada requisição HTTP (pela rota do
+    FastAPI, não pela URL) e junta as fases medidas com span; com
+    SERVER_TIMING, elas vão no cabeçalho Server-Timing da resposta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans: list[tuple[str, float]] = []
+        token = _request_spans.set(spans)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING and spans:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(spans).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_spans.reset(token)
+            route = getattr(scope.get("route"), "path", "desconhecida")
+            observe("http_request_duration_seconds", time.perf_counter() - started, route=route)
+            count("http_requests_total", method=scope["method"], route=route, status=status)
@@ -1,9 +1,22 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+import os
+import sqlite3
+import time
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field, model_validator
+from starlette.concurrency import run_in_threadpool
 import app.database.connection as db
+from app import metrics
+from app.database import distance_table, graph_store, hierarchy_store, ingest, snapshot
 
 router = APIRouter()
 
+# segundos sem novas alterações de arestas antes de refazer a hierarquia e o
+# snapshot: PATCH /dataset/edges em sequência levam a um só trabalho
+EDGE_PATCH_DELAY = float(os.environ.get("EDGE_PATCH_DELAY", 1.0))
+
 class Node(BaseModel):
     id: int
     name: str
@@ -20,6 +33,23 @@ class Job(BaseModel):
     id: int
     type: str
     node_id: int
+    # restrições opcionais (ver app/algorithms/constraints.py): tempo de
+    # atendimento, janela para o início do atendimento e demanda
+    service_time: float = Field(0.0, ge=0)
+    window_start: float | None = None
+    window_end: float | None = None
+    demand: float = Field(0.0, ge=0)
+
+    @model_validator(mode="after")
+    def _check_window(self):
+        if (self.window_start is not None and self.window_end is not None
+                and self.window_start > self.window_end):
+            raise ValueError("window_start maior que window_end.")
+        return self
+
+    def row(self) -> tuple:
+        return (self.id, self.type, self.node_id, self.service_time,
+                self.window_start, self.window_end, self.demand)
 
 class Precedence(BaseModel):
     job_before: int
@@ -30,12 +60,70 @@ class Dataset(BaseModel):
     edges: list[Edge]
     jobs: list[Job]
     precedences: list[Precedence]
+    # carga máxima do veículo; None = sem limite
+    vehicle_capacity: float | None = Field(None, ge=0)
+
+class EdgeWeight(BaseModel):
+    id: int
+    weight: float
 
+class EdgeChanges(BaseModel):
+    add: list[Edge] = []
+    remove: list[int] = []
+    update: list[EdgeWeight] = []
+
+class JobChanges(BaseModel):
+    add: list[Job] = []
+    remove: list[int] = []
+
+class PrecedenceChanges(BaseModel):
+    add: list[Precedence] = []
+    remove: list[Precedence] = []
+
+class Vehicle(BaseModel):
+    capacity: float | None = Field(None, ge=0)
+
+
+def _after_dataset_change(conn, cur, tables=None) -> int:
+    """
+    Conclui a transação que alterou o dataset: nova versão, distâncias
+    persistidas descartadas, commit e caches deste processo invalidados.
+    A conexão continua com o chamador.
+    tables (nodes, edges, jobs, precedences), se informado, vira o snapshot
+    binário da nova versão na hora; senão o snapshot é gerado em segundo plano.
+    Retorna a nova versão.
+    """
+    version = graph_store.bump_version(cur)
+    jobs_version = graph_store.bump_version(cur, graph_store.JOBS_VERSION_KEY)
+    distance_table.clear(cur)
+
+    conn.commit()
+
+    graph_store.invalidate()
+    hierarchy_store.invalidate()
+    if tables is not None:
+        snapshot.save(snapshot.encode(version, *tables), version, jobs_version)
+    else:
+        snapshot.schedule_refresh(version)
+    # contraction hierarchy da nova versão, construída em segundo plano
+    hierarchy_store.schedule_build(version)
+    return version
+
+
+_INSERT_JOB = (
+    "INSERT INTO jobs (id, type, node_id, service_time, window_start, window_end, demand) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
 
-@router.post("/upload_dataset")
-def upload_dataset(data: Dataset):
-    conn = db.get_connection()
-    cur = conn.cursor()
+
+def _replace_dataset(cur, nodes, edges, jobs, precedences, capacity=None):
+    """
+    Troca o conteúdo das tabelas do dataset, dentro da transação do chamador.
+    Cada argumento é um iterável de tuplas na ordem das colunas do INSERT;
+    capacity é a capacidade do veículo (None = sem limite).
+    """
+    # índices recriados só no fim, depois de todas as linhas
+    index_sql = ingest.drop_indexes(cur)
 
     # limpar tabelas
     cur.execute("DELETE FROM precedences")
@@ -43,35 +131,314 @@ def upload_dataset(data: Dataset):
     cur.execute("DELETE FROM edges")
     cur.execute("DELETE FROM nodes")
 
-    # inserir nodes
-    for n in data.nodes:
-        cur.execute(
-            "INSERT INTO nodes (id, name, x, y) VALUES (?, ?, ?, ?)",
-            (n.id, n.name, n.x, n.y)
+    cur.executemany("INSERT INTO nodes (id, name, x, y) VALUES (?, ?, ?, ?)", nodes)
+    cur.executemany("INSERT INTO edges (id, from_node, to_node, weight) VALUES (?, ?, ?, ?)", edges)
+    cur.executemany(_INSERT_JOB, jobs)
+    cur.executemany("INSERT INTO precedences (job_before, job_after) VALUES (?, ?)", precedences)
+    graph_store.write_capacity(cur, capacity)
+
+    for statement in index_sql:
+        cur.execute(statement)
+
+
+@router.post("/upload_dataset")
+def upload_dataset(data: Dataset, conn: sqlite3.Connection = Depends(db.get_db)):
+    cur = conn.cursor()
+
+    with metrics.span("insert"):
+        _replace_dataset(
+            cur,
+            ((n.id, n.name, n.x, n.y) for n in data.nodes),
+            ((e.id, e.from_node, e.to_node, e.weight) for e in data.edges),
+            (j.row() for j in data.jobs),
+            ((p.job_before, p.job_after) for p in data.precedences),
+            data.vehicle_capacity,
         )
 
-    # inserir edges
-    for e in data.edges:
-        cur.execute(
+    with metrics.span("after_change"):
+        _after_dataset_change(conn, cur)
+
+    return {"message": "Dataset inserido com sucesso!"}
+
+
+@router.get("/snapshot")
+def export_snapshot():
+    """
+    Baixa o snapshot binário da versão atual do dataset (CSR das arestas,
+    coordenadas, jobs, precedências e capacidade do veículo; ver
+    app/database/snapshot.py).
+    """
+    version, path = snapshot.export_current()
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        filename=f"grafos.v{version}.snap",
+        headers={"X-Dataset-Version": str(version)},
+    )
+
+
+@router.post("/snapshot")
+async def import_snapshot(request: Request):
+    """
+    Substitui o dataset pelo conteúdo de um snapshot binário enviado no
+    corpo da requisição. O snapshot passa a ser também o arquivo de onde os
+    workers carregam o grafo.
+    """
+    data = await request.body()
+    try:
+        tables = snapshot.Snapshot(data).rows()
+    except snapshot.SnapshotError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    def apply():
+        conn = db.get_connection()
+        cur = conn.cursor()
+        try:
+            with metrics.span("insert"):
+                _replace_dataset(cur, *tables)
+            with metrics.span("after_change"):
+                return _after_dataset_change(conn, cur, tables)
+        except sqlite3.IntegrityError as exc:
+            conn.rollback()
+            raise HTTPException(status_code=400, detail=f"Dataset inconsistente: {exc}.")
+        finally:
+            conn.close()
+
+    version = await run_in_threadpool(apply)
+    nodes, edges, jobs, precedences, _ = tables
+    return {
+        "message": "Snapshot importado com sucesso!",
+        "version": version,
+        "rows": {
+            "nodes": len(nodes),
+            "edges": len(edges),
+            "jobs": len(jobs),
+            "precedences": len(precedences),
+        },
+    }
+
+
+@router.post("/bulk_upload")
+async def bulk_upload(request: Request, format: Literal["ndjson", "csv"] = "ndjson",
+                      vehicle_capacity: float | None = Query(None, ge=0)):
+    """
+    Substitui o dataset lendo o corpo da requisição aos poucos, sem montar
+    tudo em memória.
+
+    - ndjson: um objeto por linha, com "table" (nodes, edges, jobs ou
+      precedences) e os mesmos campos de /upload_dataset;
+    - csv: cabeçalho com a coluna "table" mais as colunas das tabelas
+      (id, name, x, y, from_node, to_node, weight, type, node_id,
+      service_time, window_start, window_end, demand, job_before,
+      job_after); as que não se aplicam ficam vazias, assim como as
+      restrições opcionais dos jobs.
+    A capacidade do veículo vem em vehicle_capacity (ausente = sem limite).
+
+    As linhas entram com executemany em blocos, numa única transação (WAL,
+    synchronous=NORMAL, índices recriados só no fim). Qualquer erro desfaz
+    tudo e responde 400 indicando a linha.
+    """
+    began = time.perf_counter()
+    parse = ingest.parse_ndjson if format == "ndjson" else ingest.parse_csv
+
+    # as chamadas ao SQLite rodam no threadpool, uma de cada vez
+    conn = await run_in_threadpool(db.get_connection)
+    try:
+        with metrics.span("insert"):
+            counts = await ingest.load(conn, parse(request.stream()), run_in_threadpool)
+        cur = conn.cursor()
+        await run_in_threadpool(graph_store.write_capacity, cur, vehicle_capacity)
+        with metrics.span("after_change"):
+            await run_in_threadpool(_after_dataset_change, conn, cur)
+    except ingest.IngestError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except sqlite3.IntegrityError as exc:
+        # chaves estrangeiras conferidas no commit
+        await run_in_threadpool(conn.rollback)
+        raise HTTPException(status_code=400, detail=f"Dataset inconsistente: {exc}.")
+    finally:
+        await run_in_threadpool(conn.close)
+
+    seconds = time.perf_counter() - began
+    total = sum(counts.values())
+    return {
+        "message": "Dataset inserido com sucesso!",
+        "rows": counts,
+        "seconds": seconds,
+        "rows_per_second": total / seconds if seconds > 0 else None,
+    }
+
+
+@router.patch("/edges")
+def patch_edges(changes: EdgeChanges, conn: sqlite3.Connection = Depends(db.get_db)):
+    """
+    Adiciona, remove (por id) ou muda o peso de arestas sem recarregar o
+    dataset. As linhas de distância já calculadas são reparadas para a nova
+    versão do grafo (só as afetadas pelas arestas alteradas mudam).
+
+    A contraction hierarchy e o snapshot são refeitos em segundo plano
+    depois de EDGE_PATCH_DELAY segundos sem novas alterações, com a
+    hierarquia mantendo a ordem de contração anterior. Até lá as rotas usam
+    as linhas de distância, que as próximas alterações também reparam.
+    """
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    old_version = graph_store.read_version(cur)
+
+    # pares (from_node, to_node) cujo custo subiu / desceu
+    increased: list[tuple[int, int]] = []
+    decreased: list[tuple[int, int]] = []
+
+    for edge_id in changes.remove:
+        cur.execute("SELECT from_node, to_node FROM edges WHERE id = ?", (edge_id,))
+        row = cur.fetchone()
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"Aresta {edge_id} não existe.")
+        cur.execute("DELETE FROM edges WHERE id = ?", (edge_id,))
+        increased.append(row)
+
+    for change in changes.update:
+        cur.execute("SELECT from_node, to_node, weight FROM edges WHERE id = ?", (change.id,))
+        row = cur.fetchone()
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"Aresta {change.id} não existe.")
+        from_node, to_node, weight = row
+        if change.weight == weight:
+            continue
+        cur.execute("UPDATE edges SET weight = ? WHERE id = ?", (change.weight, change.id))
+        (increased if change.weight > weight else decreased).append((from_node, to_node))
+
+    try:
+        cur.executemany(
             "INSERT INTO edges (id, from_node, to_node, weight) VALUES (?, ?, ?, ?)",
-            (e.id, e.from_node, e.to_node, e.weight)
+            [(e.id, e.from_node, e.to_node, e.weight) for e in changes.add]
         )
+    except sqlite3.IntegrityError as exc:
+        raise HTTPException(status_code=400, detail=f"Aresta inválida: {exc}.")
+    decreased.extend((e.from_node, e.to_node) for e in changes.add)
+
+    if not increased and not decreased:
+        conn.commit()
+        return {"message": "Nenhuma aresta alterada.", "version": old_version}
+
+    version = graph_store.bump_version(cur)
+    conn.commit()
+
+    # repara as distâncias da versão anterior sobre o grafo novo; se outra
+    # alteração já passou na frente, as linhas antigas ficam sem uso
+    graph = graph_store.get_graph()
+    rows = None
+    if graph.version == version:
+        with metrics.span("repair"):
+            rows = distance_table.repair(old_version, graph, increased, decreased)
+
+    hierarchy_store.invalidate()
+    hierarchy_store.schedule_build(version, EDGE_PATCH_DELAY, reuse_order=True)
+    snapshot.schedule_refresh(version, EDGE_PATCH_DELAY)
+
+    return {
+        "message": "Arestas atualizadas com sucesso!",
+        "version": version,
+        "added": len(changes.add),
+        "removed": len(changes.remove),
+        "updated": len(changes.update),
+        "distance_rows": rows,
+    }
+
 
-    # inserir jobs
-    for j in data.jobs:
+@router.patch("/jobs")
+def patch_jobs(changes: JobChanges, conn: sqlite3.Connection = Depends(db.get_db)):
+    """
+    Adiciona ou remove jobs. Remover um job remove também as precedências
+    que o citam. O grafo não muda, então nenhum cache de distâncias é
+    invalidado; só a versão dos jobs é incrementada (o próximo
+    GET /snapshot gera um arquivo novo).
+    """
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+
+    removed_precedences = 0
+    for job_id in changes.remove:
+        cur.execute("SELECT 1 FROM jobs WHERE id = ?", (job_id,))
+        if cur.fetchone() is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} não existe.")
         cur.execute(
-            "INSERT INTO jobs (id, type, node_id) VALUES (?, ?, ?)",
-            (j.id, j.type, j.node_id)
+            "DELETE FROM precedences WHERE job_before = ? OR job_after = ?", (job_id, job_id)
         )
+        removed_precedences += cur.rowcount
+        cur.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    try:
+        cur.executemany(_INSERT_JOB, [j.row() for j in changes.add])
+    except sqlite3.IntegrityError as exc:
+        raise HTTPException(status_code=400, detail=f"Job inválido: {exc}.")
+
+    jobs_version = graph_store.bump_version(cur, graph_store.JOBS_VERSION_KEY)
+    conn.commit()
 
-    # inserir precedences
-    for p in data.precedences:
+    return {
+        "message": "Jobs atualizados com sucesso!",
+        "jobs_version": jobs_version,
+        "added": len(changes.add),
+        "removed": len(changes.remove),
+        "removed_precedences": removed_precedences,
+    }
+
+
+@router.patch("/precedences")
+def patch_precedences(changes: PrecedenceChanges, conn: sqlite3.Connection = Depends(db.get_db)):
+    """
+    Adiciona ou remove precedências (pares job_before -> job_after).
+    Assim como em /jobs, só a versão dos jobs muda.
+    """
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+
+    for p in changes.remove:
         cur.execute(
-            "INSERT INTO precedences (job_before, job_after) VALUES (?, ?)",
+            "DELETE FROM precedences WHERE job_before = ? AND job_after = ?",
             (p.job_before, p.job_after)
         )
+        if cur.rowcount == 0:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Precedência {p.job_before} -> {p.job_after} não existe."
+            )
 
+    try:
+        cur.executemany(
+            "INSERT INTO precedences (job_before, job_after) VALUES (?, ?)",
+            [(p.job_before, p.job_after) for p in changes.add]
+        )
+    except sqlite3.IntegrityError as exc:
+        raise HTTPException(status_code=400, detail=f"Precedência inválida: {exc}.")
+
+    jobs_version = graph_store.bump_version(cur, graph_store.JOBS_VERSION_KEY)
     conn.commit()
-    conn.close()
 
-    return {"message": "Dataset inserido com sucesso!"}
+    return {
+        "message": "Precedências atualizadas com sucesso!",
+        "jobs_version": jobs_version,
+        "added": len(changes.add),
+        "removed": len(changes.remove),
+    }
+
+
+@router.put("/vehicle")
+def put_vehicle(vehicle: Vehicle, conn: sqlite3.Connection = Depends(db.get_db)):
+    """
+    Define a capacidade do veículo usada pelas rotas (null = sem limite).
+    Como em /jobs, só a versão dos jobs muda, e o próximo GET /snapshot
+    já leva a capacidade nova.
+    """
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    graph_store.write_capacity(cur, vehicle.capacity)
+    jobs_version = graph_store.bump_version(cur, graph_store.JOBS_VERSION_KEY)
+    conn.commit()
+
+    return {
+        "message": "Veículo atualizado com sucesso!",
+        "jobs_version": jobs_version,
+        "capacity": vehicle.capacity,
+    }
@@ -1,145 +1,188 @@
-from fastapi import APIRouter, HTTPException
-import heapq
-import app.database.connection as db
+import os
+import tempfile
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from app import encoding, metrics, workers
+from app.algorithms import all_pairs
+from app.algorithms import point_to_point
+from app.algorithms.cancel import never
+from app.database import graph_store, hierarchy_store
 
 router = APIRouter()
 
 
-def load_graph_from_db():
-    """
-    Carrega os nodes e edges do banco e monta:
-    - lista de nós (ordenada por id)
-    - grafo em forma de lista de adjacência.
-    """
-    conn = db.get_connection()
-    cur = conn.cursor()
-
-    cur.execute("SELECT id FROM nodes ORDER BY id")
-    rows = cur.fetchall()
-
-    if not rows:
-        conn.close()
-        raise HTTPException(
-            status_code=400,
-            detail="Nenhum nó encontrado no banco. Faça upload do dataset primeiro."
-        )
-
-    nodes = [r[0] for r in rows]
-
-    # monta adjacência
-    adj = {nid: [] for nid in nodes}
-    cur.execute("SELECT from_node, to_node, weight FROM edges")
-    for from_node, to_node, weight in cur.fetchall():
-        if from_node in adj:
-            adj[from_node].append((to_node, weight))
-
-    conn.close()
-    return nodes, adj
-
-
-def dijkstra(adj: dict[int, list[tuple[int, float]]], start: int):
-    INF = float("inf")
-    dist = {v: INF for v in adj.keys()}
-    prev = {v: None for v in adj.keys()}
-
-    if start not in adj:
-        raise HTTPException(status_code=404, detail=f"Nó {start} não encontrado no grafo.")
-
-    dist[start] = 0.0
-    heap: list[tuple[float, int]] = [(0.0, start)]
-
-    while heap:
-        d, u = heapq.heappop(heap)
-        if d > dist[u]:
-            continue
-
-        for v, w in adj[u]:
-            nd = d + w
-            if nd < dist[v]:
-                dist[v] = nd
-                prev[v] = u
-                heapq.heappush(heap, (nd, v))
-
-    return dist, prev
-
-
-def reconstruct_path(prev: dict[int, int | None], start: int, end: int) -> list[int]:
-    """
-    Reconstrói o caminho mínimo de start até end usando prev.
-    Se não houver caminho, retorna lista vazia.
-    """
-    if start == end:
-        return [start]
-
-    path: list[int] = []
-    cur = end
-    while cur is not None:
-        path.append(cur)
-        if cur == start:
-            break
-        cur = prev[cur]
-
-    if path[-1] != start:
-        return []
-
-    path.reverse()
-    return path
-
-
 @router.get("/path/{start_id}/{end_id}")
-def get_shortest_path(start_id: int, end_id: int):
+def get_shortest_path(
+    start_id: int,
+    end_id: int,
+    mode: Literal["auto", "dijkstra", "bidirectional", "astar", "ch"] = "auto",
+):
     """
-    Retorna o caminho mínimo e a distância entre dois nós usando Dijkstra.
+    Retorna o caminho mínimo e a distância entre dois nós.
+
+    Todos os modos param assim que o caminho até end_id está garantido:
+    - dijkstra: Dijkstra a partir de start_id;
+    - bidirectional: Dijkstra simultâneo a partir das duas pontas;
+    - astar: A* guiado pela distância euclidiana (coordenadas x/y dos nós),
+      escalada para nunca superestimar o custo real;
+    - ch: busca bidirecional subindo na contraction hierarchy, com os
+      atalhos desempacotados em arestas reais;
+    - auto: ch se a hierarquia da versão atual já estiver pronta, senão dijkstra.
+    mode na resposta informa o modo usado e settled quantos nós a busca
+    fixou (no ch, quantos nós as duas buscas visitaram).
     """
-    nodes, adj = load_graph_from_db()
+    with metrics.span("load_graph"):
+        graph = graph_store.get_graph()
+    csr = graph.csr
 
-    if start_id not in nodes:
+    if start_id not in graph:
         raise HTTPException(status_code=404, detail=f"Nó inicial {start_id} não existe.")
-    if end_id not in nodes:
+    if end_id not in graph:
         raise HTTPException(status_code=404, detail=f"Nó final {end_id} não existe.")
 
-    dist, prev = dijkstra(adj, start_id)
-    if dist[end_id] == float("inf"):
+    s, t = csr.index[start_id], csr.index[end_id]
+    hierarchy = None
+    if mode in ("auto", "ch"):
+        hierarchy = hierarchy_store.get_hierarchy(graph)
+        mode = "ch" if hierarchy is not None else "dijkstra"
+
+    with metrics.span("search"):
+        if mode == "ch":
+            distance, path, settled = hierarchy.query(s, t)
+        elif mode == "bidirectional":
+            distance, path, settled = point_to_point.bidirectional_dijkstra(csr, graph.reverse_csr(), s, t)
+        elif mode == "astar":
+            distance, path, settled = point_to_point.astar(
+                csr, graph.xs, graph.ys, graph.heuristic_scale(), s, t
+            )
+        else:
+            distance, path, settled = point_to_point.dijkstra(csr, s, t)
+
+    if distance == float("inf"):
         return {
             "start": start_id,
             "end": end_id,
             "distance": None,
             "path": [],
             "reachable": False,
+            "mode": mode,
+            "settled": settled,
         }
 
-    path = reconstruct_path(prev, start_id, end_id)
     return {
         "start": start_id,
         "end": end_id,
-        "distance": dist[end_id],
-        "path": path,
+        "distance": distance,
+        "path": [csr.node_ids[i] for i in path],
         "reachable": True,
+        "mode": mode,
+        "settled": settled,
     }
 
 
-@router.get("/cost_matrix")
-def get_cost_matrix():
+def cost_matrix_task(method: str, format: str, path: str, should_stop=never):
     """
-    Gera a matriz de custos C[i][j] entre todos os pares de nós.
-    Usa Dijkstra com cada nó como origem.
+    Calcula a matriz de custos num worker (ver workers.run) e grava em path
+    no formato pedido, linha a linha; para json, ndjson e msgpack, em
+    float64 cru, convertido durante o envio. Com Dijkstra cada linha vai
+    para o arquivo assim que é calculada, sem montar a matriz.
+    O grafo é carregado no próprio worker (snapshot mapeado em memória ou
+    banco) e a hierarquia só é usada se o arquivo já existir.
+    Retorna (nós, método usado).
     """
-    nodes, adj = load_graph_from_db()
+    graph = graph_store.get_graph()
 
-    matrix: list[list[float | None]] = []
+    hierarchy = None
+    if method == all_pairs.CONTRACTION_HIERARCHY:
+        hierarchy = hierarchy_store.get_hierarchy(graph, build=False)
+    rows, used_method = all_pairs.all_pairs_rows(graph.csr, method, hierarchy, should_stop)
 
-    for start in nodes:
-        dist, _ = dijkstra(adj, start)
-        row: list[float | None] = []
-        for end in nodes:
-            d = dist[end]
-            if d == float("inf"):
-                row.append(None)  # sem caminho
-            else:
-                row.append(d)
-        matrix.append(row)
+    with open(path, "wb") as f:
+        if format == "npy":
+            f.write(all_pairs.npy_header(len(graph.nodes)))
+        all_pairs.write_rows(f, rows, "f" if format == "f32" else "d")
+    return graph.nodes, used_method
 
-    return {
-        "nodes": nodes,
-        "matrix": matrix,
-    }
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _file_rows(path: str, n: int):
+    with open(path, "rb") as f:
+        yield from all_pairs.json_rows(f, n)
+
+
+@router.get("/cost_matrix")
+async def get_cost_matrix(
+    request: Request,
+    method: Literal["auto", "floyd_warshall", "dijkstra", "ch"] = "auto",
+    format: Literal["json", "ndjson", "msgpack", "npy", "f32"] = "json",
+):
+    """
+    Gera a matriz de custos C[i][j] entre todos os pares de nós.
+
+    - method: floyd_warshall (vetorizado, grafos densos), dijkstra (Dijkstra
+      a partir de cada nó, grafos esparsos), ch (many-to-many na contraction
+      hierarchy; dijkstra se ela ainda não estiver pronta) ou auto (escolhe
+      entre os dois primeiros pelo tamanho).
+    - format: json (None = sem caminho), ndjson (primeira linha com nodes e
+      method, depois {"node", "costs"} por linha da matriz), msgpack (o
+      mesmo documento do json; requer o pacote msgpack), npy (float64) ou
+      f32 (float32 cru, little-endian, linha a linha). Nos formatos
+      binários as linhas/colunas seguem a ordem crescente de id dos nós e
+      "sem caminho" vira +inf.
+      json, ndjson e msgpack saem em streaming, uma linha da matriz por vez.
+    O cálculo roda num processo worker, com limite de tempo (504) e
+    cancelamento se o cliente desconectar. O worker grava a matriz num
+    arquivo temporário, lido aos poucos durante o envio e apagado no fim:
+    nem o worker nem o servidor mantêm uma cópia serializada inteira.
+    """
+    with metrics.span("load_graph"):
+        graph = await run_in_threadpool(graph_store.get_graph)
+
+    if method == all_pairs.FLOYD_WARSHALL and not all_pairs.numpy_available():
+        raise HTTPException(status_code=400, detail="Floyd–Warshall requer NumPy instalado.")
+    encoding.require(format)
+
+    if method == all_pairs.CONTRACTION_HIERARCHY:
+        # dispara a construção aqui, se preciso; o worker só lê o arquivo
+        await run_in_threadpool(hierarchy_store.get_hierarchy, graph)
+    fd, path = tempfile.mkstemp(prefix="cost_matrix.", suffix=".bin")
+    os.close(fd)
+    try:
+        with metrics.span("compute"):
+            nodes, used_method = await workers.run(request, cost_matrix_task, method, format, path)
+    except BaseException:
+        _remove(path)
+        raise
+    cleanup = BackgroundTask(_remove, path)
+
+    n = len(nodes)
+    if format in ("npy", "f32"):
+        filename = "cost_matrix.npy" if format == "npy" else "cost_matrix.f32"
+        return FileResponse(
+            path,
+            media_type="application/octet-stream",
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}"',
+                "X-Matrix-Shape": f"{n},{n}",
+                "X-Cost-Matrix-Method": used_method,
+            },
+            background=cleanup,
+        )
+
+    rows = _file_rows(path, n)
+    if format == encoding.NDJSON:
+        rows = ({"node": node, "costs": row} for node, row in zip(nodes, rows))
+    return encoding.stream(
+        format, {"nodes": nodes, "method": used_method}, "matrix", rows, n,
+        headers={"X-Cost-Matrix-Method": used_method}, background=cleanup,
+    )
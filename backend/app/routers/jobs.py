@@ -1,22 +1,22 @@
-from fastapi import APIRouter, HTTPException
+import sqlite3
+
+from fastapi import APIRouter, Depends, HTTPException
 import app.database.connection as db
 
 router = APIRouter()
 
 
-def load_jobs_and_precedences():
+def load_jobs_and_precedences(conn: sqlite3.Connection):
     """
     Carrega do banco:
 
     """
-    conn = db.get_connection()
     cur = conn.cursor()
 
     # pega todos os jobs
     cur.execute("SELECT id FROM jobs ORDER BY id")
     job_rows = cur.fetchall()
     if not job_rows:
-        conn.close()
         raise HTTPException(
             status_code=400,
             detail="Nenhum job encontrado no banco. Faça upload do dataset primeiro."
@@ -28,7 +28,6 @@ def load_jobs_and_precedences():
     cur.execute("SELECT job_before, job_after FROM precedences")
     prec_rows = cur.fetchall()
 
-    conn.close()
     return jobs, prec_rows
 
 
@@ -73,12 +72,12 @@ def topological_sort(jobs: list[int], precedences: list[tuple[int, int]]):
 
 
 @router.get("/topo")
-def get_topological_order():
+def get_topological_order(conn: sqlite3.Connection = Depends(db.get_read_db)):
     """
     Retorna a ordenação topológica dos jobs com base nas precedências.
     Se houver ciclo, sinaliza has_cycle = true e não retorna ordem.
     """
-    jobs, precs = load_jobs_and_precedences()
+    jobs, precs = load_jobs_and_precedences(conn)
     has_cycle, order = topological_sort(jobs, precs)
 
     if has_cycle:
@@ -94,15 +93,23 @@ def get_topological_order():
     }
 
 @router.get("/")
-def list_jobs():
+def list_jobs(conn: sqlite3.Connection = Depends(db.get_read_db)):
     """
-    Retorna todos os jobs com id, type e node_id.
+    Retorna todos os jobs com id, type e node_id, mais as restrições
+    opcionais (service_time, window_start, window_end, demand).
     Usado pelo frontend para mostrar a tabela e montar as rotas no mapa.
     """
-    conn = db.get_connection()
     cur = conn.cursor()
-    cur.execute("SELECT id, type, node_id FROM jobs ORDER BY id")
+    cur.execute(
+        "SELECT id, type, node_id, service_time, window_start, window_end, demand "
+        "FROM jobs ORDER BY id"
+    )
     rows = cur.fetchall()
-    conn.close()
 
-    return [{"id": r[0], "type": r[1], "node_id": r[2]} for r in rows]
\ No newline at end of file
+    return [
+        {
+            "id": r[0], "type": r[1], "node_id": r[2], "service_time": r[3],
+            "window_start": r[4], "window_end": r[5], "demand": r[6],
+        }
+        for r in rows
+    ]
\ No newline at end of file
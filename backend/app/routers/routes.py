@@ -1,43 +1,38 @@
-from fastapi import APIRouter, HTTPException
+from typing import Literal
+
+import asyncio
+import math
+import os
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 import app.database.connection as db
-import heapq
-from collections import defaultdict
+from app import encoding, metrics, workers
+from app.database import distance_table, graph_store, hierarchy_store
+from array import array
+from app.algorithms import branch_bound, fleet, greedy, held_karp, local_search, point_to_point
+from app.algorithms.cancel import never, no_progress
+from app.algorithms.constraints import build_constraints
+from app.algorithms.csr import CSRGraph
 from app.routers import jobs as jobs_router
 
 router = APIRouter()
 
-
-def load_graph_from_db():
-
-    conn = db.get_connection()
-    cur = conn.cursor()
-
-    cur.execute("SELECT id FROM nodes ORDER BY id")
-    rows = cur.fetchall()
-    if not rows:
-        conn.close()
-        raise HTTPException(
-            status_code=400,
-            detail="Nenhum nó encontrado em 'nodes'. Faça upload do dataset primeiro."
-        )
-
-    nodes = [r[0] for r in rows]
-    adj: dict[int, list[tuple[int, float]]] = {nid: [] for nid in nodes}
-    
-    cur.execute("SELECT from_node, to_node, weight FROM edges")
-    for from_node, to_node, weight in cur.fetchall():
-        if from_node in adj:
-            adj[from_node].append((to_node, weight))
-
-    conn.close()
-    return nodes, adj
+# a partir deste trabalho, em origens × nós do grafo, as rotas guardam só as
+# distâncias entre os nós relevantes e refazem os caminhos usados na rota
+# com buscas ponto a ponto (0 faz isso sempre)
+LAZY_PATHS_MIN_WORK = int(os.environ.get("ROUTE_LAZY_PATHS_MIN_WORK", 20_000_000))
 
 
 def load_jobs_and_precedences():
-    conn = db.get_connection()
+    conn = db.get_read_connection()
     cur = conn.cursor()
 
-    cur.execute("SELECT id, type, node_id FROM jobs ORDER BY id")
+    cur.execute(
+        "SELECT id, type, node_id, service_time, window_start, window_end, demand "
+        "FROM jobs ORDER BY id"
+    )
     job_rows = cur.fetchall()
     if not job_rows:
         conn.close()
@@ -52,64 +47,108 @@ def load_jobs_and_precedences():
     cur.execute("SELECT job_before, job_after FROM precedences")
     prec_rows = cur.fetchall()
 
-    conn.close()
-    return jobs, job_nodes, prec_rows
-
+    # janelas, atendimento, demanda e capacidade; None se nada disso foi definido
+    constraints = build_constraints(
+        [(row[1], *row[3:]) for row in job_rows], graph_store.read_capacity(cur)
+    )
 
+    conn.close()
+    return jobs, job_nodes, prec_rows, constraints
 
 
-def dijkstra_with_path(adj: dict[int, list[tuple[int, float]]], start: int):
 
-    INF = float("inf")
-    dist = {v: INF for v in adj.keys()}
-    parents = {v: None for v in adj.keys()}  
+def compute_costs_and_paths(graph: graph_store.Graph, relevant_nodes: set[int]):
+    """
+    Distâncias entre os nós relevantes e uma função que devolve as arestas
+    do caminho mínimo entre dois deles.
 
-    if start not in adj:
-        raise HTTPException(status_code=404, detail=f"Nó {start} não existe no grafo.")
+    Com a contraction hierarchy pronta, as distâncias saem de uma busca
+    many-to-many com buckets e os caminhos de consultas ponto a ponto com
+    os atalhos desempacotados. Sem ela, as linhas vêm da tabela de
+    distâncias (Dijkstra completo a partir de cada nó relevante), ou, em
+    grafos grandes (LAZY_PATHS_MIN_WORK), de Dijkstras que param nos nós
+    relevantes; aí só essas distâncias ficam guardadas e cada trecho usado
+    na rota é refeito com A* (Dijkstra sem coordenadas).
+    costs[u][i] é a distância de u até o nó de índice denso i.
+    """
+    for u in relevant_nodes:
+        if u not in graph:
+            raise HTTPException(status_code=404, detail=f"Nó {u} não existe no grafo.")
+
+    csr = graph.csr
+    hierarchy = hierarchy_store.get_hierarchy(graph)
+    if hierarchy is not None:
+        nodes = sorted(relevant_nodes)
+        idx = [csr.index[u] for u in nodes]
+        rows = hierarchy.many_to_many(idx, idx)
+        costs = {u: dict(zip(idx, row)) for u, row in zip(nodes, rows)}
+
+        def leg(start: int, end: int) -> list[tuple[int, int]]:
+            _, path, _ = hierarchy.query(csr.index[start], csr.index[end])
+            return [(csr.node_ids[a], csr.node_ids[b]) for a, b in zip(path, path[1:])]
+
+        return costs, leg
+
+    if len(relevant_nodes) * csr.num_nodes >= LAZY_PATHS_MIN_WORK:
+        idx = [csr.index[u] for u in relevant_nodes]
+        costs = {
+            u: point_to_point.dijkstra_to_many(csr, csr.index[u], idx)
+            for u in relevant_nodes
+        }
+        scale = graph.heuristic_scale()
+
+        def leg(start: int, end: int) -> list[tuple[int, int]]:
+            _, path, _ = point_to_point.astar(
+                csr, graph.xs, graph.ys, scale, csr.index[start], csr.index[end]
+            )
+            return [(csr.node_ids[a], csr.node_ids[b]) for a, b in zip(path, path[1:])]
+
+        return costs, leg
+
+    rows = distance_table.get_rows(graph, relevant_nodes)
+
+    costs: dict[int, array] = {}
+    all_parents: dict[int, array] = {}
+    for u, (dist, parents) in rows.items():
+        costs[u] = dist
+        all_parents[u] = parents
 
-    dist[start] = 0.0
-    heap: list[tuple[float, int]] = [(0.0, start)]
+    def leg(start: int, end: int) -> list[tuple[int, int]]:
+        return get_path_edges(csr, all_parents[start], start, end)
 
-    while heap:
-        d, u = heapq.heappop(heap)
-        if d > dist[u]:
-            continue
-        for v, w in adj[u]:
-            nd = d + w
-            if nd < dist[v]:
-                dist[v] = nd
-                parents[v] = u  # Guardamos de onde viemos
-                heapq.heappush(heap, (nd, v))
+    return costs, leg
 
-    return dist, parents
 
+# formato do caminho nas respostas: pares (u, v) ou sequências de nós
+PathFormat = Literal["edges", "nodes"]
 
-def compute_costs_and_paths(adj: dict[int, list[tuple[int, float]]], relevant_nodes: set[int]):
- 
-    costs: dict[int, dict[int, float]] = {}
-    all_parents: dict[int, dict[int, int | None]] = {}
 
-    for u in relevant_nodes:
-        dist, parents = dijkstra_with_path(adj, u)
-        costs[u] = dist
-        all_parents[u] = parents
-        
-    return costs, all_parents
+def path_body(path_edges: list[tuple[int, int]], path_format: str = "edges") -> dict:
+    """
+    path_edges com as arestas (u, v) ou, com path_format "nodes", path_nodes
+    com as sequências de nós (ver encoding.node_runs), cerca de metade do
+    tamanho.
+    """
+    if path_format == "nodes":
+        return {"path_nodes": encoding.node_runs(path_edges)}
+    return {"path_edges": path_edges}
 
 
-def get_path_edges(parents: dict[int, int | None], start: int, end: int) -> list[tuple[int, int]]:
+def get_path_edges(graph: CSRGraph, parents, start: int, end: int) -> list[tuple[int, int]]:
 
     if start == end:
         return []
-    
+
+    node_ids = graph.node_ids
+    s = graph.index[start]
     path = []
-    curr = end
-    while curr != start:
-        prev = parents.get(curr)
-        if prev is None:
+    curr = graph.index[end]
+    while curr != s:
+        prev = parents[curr]
+        if prev == -1:
             # Sem caminho possível
             return []
-        path.append((prev, curr))
+        path.append((node_ids[prev], node_ids[curr]))
         curr = prev
     
     # O caminho foi montado do fim pro começo, então invertemos
@@ -129,247 +168,676 @@ def build_prereqs(jobs: list[int], precedences: list[tuple[int, int]]):
     return prereqs, succs
 
 
-def greedy_route(start_node: int):
-    
-    nodes, adj = load_graph_from_db()
-    jobs, job_nodes, prec_rows = load_jobs_and_precedences()
+class RouteInstance:
+    """
+    Tudo o que os solvers precisam para montar rotas a partir de start_node:
+    - jobs / job_nodes: ids dos jobs (ordenados) e o nó de cada um
+    - prereq_masks: pré-requisitos de cada job como bitmask de índices
+    - start_to_job[k] / job_to_job[i][k]: custos mínimos no grafo
+    - leg_edges(u, v): arestas do caminho mínimo entre dois nós relevantes
+    - constraints: janelas, atendimento, demanda e capacidade
+      (constraints.Constraints), ou None sem restrições
+    """
+
+    def __init__(self, graph, start_node, jobs, job_nodes, prereq_masks,
+                 start_to_job, job_to_job, leg_edges, constraints=None):
+        self.graph = graph
+        self.start_node = start_node
+        self.jobs = jobs
+        self.job_nodes = job_nodes
+        self.prereq_masks = prereq_masks
+        self.start_to_job = start_to_job
+        self.job_to_job = job_to_job
+        self.leg_edges = leg_edges
+        self.constraints = constraints
+
+    def job_ids(self, order: list[int]) -> list[int]:
+        return [self.jobs[i] for i in order]
+
+    def subset(self, indices: list[int]) -> "RouteInstance":
+        """
+        Instância com só os jobs de indices (índices desta instância); as
+        precedências com jobs de fora são descartadas.
+        """
+        position = {k: i for i, k in enumerate(indices)}
+        prereq_masks = []
+        for k in indices:
+            mask = 0
+            for before, i in position.items():
+                if (self.prereq_masks[k] >> before) & 1:
+                    mask |= 1 << i
+            prereq_masks.append(mask)
+        return RouteInstance(
+            self.graph, self.start_node, [self.jobs[k] for k in indices], self.job_nodes,
+            prereq_masks, [self.start_to_job[k] for k in indices],
+            [[self.job_to_job[a][b] for b in indices] for a in indices], self.leg_edges,
+            self.constraints.subset(indices) if self.constraints is not None else None,
+        )
 
-    if start_node not in nodes:
-        raise HTTPException(status_code=404, detail=f"start_node {start_node} não existe.")
+    def schedule_info(self, order: list[int]) -> dict:
+        """
+        Com restrições, o horário de término e o início / fim do atendimento
+        de cada job da ordem; vazio sem restrições.
+        """
+        if self.constraints is None:
+            return {}
+        times = self.constraints.schedule(self.start_to_job, self.job_to_job, order) or []
+        return {
+            "finish_time": times[-1][1] if times else 0.0,
+            "schedule": [
+                {"job": self.jobs[k], "start": start, "end": end}
+                for k, (start, end) in zip(order, times)
+            ],
+        }
+
+    def path_edges(self, order: list[int]) -> list[tuple[int, int]]:
+        """
+        Arestas do grafo percorridas ao executar os jobs na ordem dada
+        (índices de jobs), saindo de start_node.
+        """
+        full_path_edges: list[tuple[int, int]] = []
+        current_node = self.start_node
+        for k in order:
+            target_node = self.job_nodes[self.jobs[k]]
+            if target_node != current_node:
+                full_path_edges.extend(self.leg_edges(current_node, target_node))
+            current_node = target_node
+        return full_path_edges
+
+
+def load_route_instances(start_nodes: list[int]) -> dict[int, RouteInstance]:
+    """
+    Instâncias de vários nós iniciais com uma única carga: as distâncias
+    entre os nós relevantes e a matriz job_to_job (a mesma lista em todas
+    as instâncias) saem uma vez só.
+    """
+    with metrics.span("load_graph"):
+        graph = graph_store.get_graph()
+    csr = graph.csr
+    with metrics.span("load_jobs"):
+        jobs, job_nodes, prec_rows, constraints = load_jobs_and_precedences()
+
+    for start_node in start_nodes:
+        if start_node not in graph:
+            raise HTTPException(status_code=404, detail=f"start_node {start_node} não existe.")
 
-    
     has_cycle, _ = jobs_router.topological_sort(jobs, prec_rows) # type: ignore
     if has_cycle:
         raise HTTPException(status_code=400, detail="Ciclo detectado nas precedências.")
 
-    
     prereqs, _ = build_prereqs(jobs, prec_rows)
+    prereq_masks = held_karp.prerequisite_masks(jobs, prereqs)
 
-    
+    n = len(jobs)
     relevant_nodes: set[int] = set(job_nodes.values())
-    relevant_nodes.add(start_node)
+    relevant_nodes.update(start_nodes)
 
-    
-    costs, all_parents = compute_costs_and_paths(adj, relevant_nodes)
+    with metrics.span("costs"):
+        costs_nodes, leg_edges = compute_costs_and_paths(graph, relevant_nodes)
 
-    
-    completed: set[int] = set()
-    remaining: set[int] = set(jobs)
-    current_node = start_node
-    total_cost = 0.0
-    job_order: list[int] = []
-    
-    full_path_edges: list[tuple[int, int]] = []  # Lista final de arestas
+    job_cols = [csr.index[job_nodes[job_id]] for job_id in jobs]
+
+    job_to_job = [[float("inf")] * n for _ in range(n)]
+    for i, job_i in enumerate(jobs):
+        dist_row = costs_nodes.get(job_nodes[job_i])
+        if dist_row is None:
+            continue
+        job_to_job[i] = [dist_row[c] for c in job_cols]
+
+    instances: dict[int, RouteInstance] = {}
+    for start_node in start_nodes:
+        start_row = costs_nodes[start_node]
+        start_to_job = [start_row[c] for c in job_cols]
+        instances[start_node] = RouteInstance(
+            graph, start_node, jobs, job_nodes, prereq_masks,
+            start_to_job, job_to_job, leg_edges, constraints,
+        )
+    return instances
 
-    while remaining:
-        available = [j for j in remaining if prereqs[j].issubset(completed)]
 
-        if not available:
-            raise HTTPException(status_code=400, detail="Sem jobs disponíveis (precedências).")
+def load_route_instance(start_node: int) -> RouteInstance:
+    return load_route_instances([start_node])[start_node]
 
-        best_job = None
-        best_cost = float("inf")
 
-        for j in available:
-            target_node = job_nodes[j]
-            dist_map = costs.get(current_node)
-            if dist_map is None:
-                continue
-            d = dist_map.get(target_node, float("inf"))
-            if d < best_cost:
-                best_cost = d
-                best_job = j
+def _check_greedy(failure):
+    if failure == greedy.NO_AVAILABLE_JOB:
+        raise HTTPException(status_code=400, detail="Sem jobs disponíveis (precedências).")
+    if failure == greedy.UNREACHABLE:
+        raise HTTPException(status_code=400, detail="Caminho inalcançável no grafo.")
+    if failure == greedy.CONSTRAINED:
+        raise HTTPException(
+            status_code=400,
+            detail="A rota gulosa não consegue respeitar a capacidade ou as janelas de tempo."
+        )
 
-        if best_job is None or best_cost == float("inf"):
-            raise HTTPException(status_code=400, detail="Caminho inalcançável no grafo.")
 
-        # Executar job e gravar arestas
-        target_node = job_nodes[best_job]
-        
-        # Recupera o caminho físico
-        parents_from_curr = all_parents[current_node]
-        segment_edges = get_path_edges(parents_from_curr, current_node, target_node)
-        full_path_edges.extend(segment_edges)
+def solve_greedy(instance: RouteInstance):
+    total_cost, order, failure = greedy.greedy_order(
+        instance.start_to_job, instance.job_to_job, instance.prereq_masks, instance.constraints
+    )
+    _check_greedy(failure)
+    return total_cost, order
 
-        total_cost += best_cost
-        current_node = target_node
-        completed.add(best_job)
-        remaining.remove(best_job)
-        job_order.append(best_job)
 
-    return job_order, total_cost, start_node, full_path_edges
+def greedy_route(start_node: int):
+    instance = load_route_instance(start_node)
+    with metrics.span("solve"):
+        total_cost, order = solve_greedy(instance)
+    with metrics.span("paths"):
+        path_edges = instance.path_edges(order)
+    return instance.job_ids(order), total_cost, start_node, path_edges, instance.schedule_info(order)
 
 
 @router.get("/greedy")
-def get_greedy_route(start_node: int = 1):
-    job_order, total_cost, start, path_edges = greedy_route(start_node)
+def get_greedy_route(start_node: int = 1, path_format: PathFormat = "edges"):
+    job_order, total_cost, start, path_edges, schedule = greedy_route(start_node)
 
     return {
         "strategy": "greedy",
         "start_node": start,
         "job_order": job_order,
         "total_cost": total_cost,
-        "path_edges": path_edges  
+        **path_body(path_edges, path_format),
+        **schedule,
     }
 
 
-def optimal_route(start_node: int):
-    nodes, adj = load_graph_from_db()
-    jobs, job_nodes, prec_rows = load_jobs_and_precedences()
-
-    if start_node not in nodes:
-        raise HTTPException(status_code=404, detail=f"start_node {start_node} não existe.")
+def solve_improved(start_to_job: list[float], job_to_job: list[list[float]],
+                   prereq_masks: list[int], time_budget_ms: int, constraints=None,
+                   should_stop=never, progress=no_progress):
+    """
+    Rota gulosa + busca local; roda num worker (ver workers.run). Se o
+    guloso não respeitar capacidade ou janelas, a busca parte de
+    greedy.feasible_order.
+    Retorna (custo, ordem, search_info); o custo é sempre o de viagem, e
+    com janelas de tempo a trajetória registra o horário de término.
+    """
+    initial_cost, order, failure = greedy.greedy_order(
+        start_to_job, job_to_job, prereq_masks, constraints
+    )
+    if failure == greedy.CONSTRAINED:
+        # o guloso é míope com janelas e capacidade apertadas; a busca local
+        # só precisa de alguma ordem viável para começar
+        initial_cost, order = greedy.feasible_order(
+            start_to_job, job_to_job, prereq_masks, constraints, should_stop
+        )
+        if not order:
+            raise HTTPException(
+                status_code=400,
+                detail="Nenhuma ordem encontrada respeita a capacidade e as janelas de tempo."
+            )
+    else:
+        _check_greedy(failure)
+
+    total_cost, order, trajectory, iterations = local_search.improve(
+        start_to_job, job_to_job, prereq_masks,
+        order, time_budget=time_budget_ms / 1000, should_stop=should_stop, progress=progress,
+        constraints=constraints,
+    )
+    if constraints is not None:
+        total_cost = held_karp.route_cost(start_to_job, job_to_job, order)
+
+    search_info = {
+        "initial_cost": initial_cost,
+        "iterations": iterations,
+        "trajectory": [
+            {"iteration": it, "elapsed_ms": round(elapsed * 1000, 3), "cost": cost}
+            for it, elapsed, cost in trajectory
+        ],
+    }
+    return total_cost, order, search_info
+
+
+async def improved_route(start_node: int, time_budget_ms: int = 200, request: Request | None = None,
+                         timeout: float = workers.TIMEOUT, on_task=None):
+    """
+    on_task, se dado, recebe o workers.Task assim que o cálculo é agendado
+    (para acompanhar o progresso).
+    """
+    instance = await run_in_threadpool(load_route_instance, start_node)
+
+    task = workers.submit(
+        solve_improved,
+        instance.start_to_job, instance.job_to_job, instance.prereq_masks, time_budget_ms,
+        instance.constraints, progress=on_task is not None,
+    )
+    if on_task is not None:
+        on_task(task)
+    with metrics.span("solve"):
+        total_cost, order, search_info = await task.result(request, timeout)
+
+    with metrics.span("paths"):
+        path_edges = await run_in_threadpool(instance.path_edges, order)
+    return (instance.job_ids(order), total_cost, start_node, path_edges,
+            {**search_info, **instance.schedule_info(order)})
+
+
+@router.get("/improved")
+async def get_improved_route(
+    request: Request,
+    start_node: int = 1,
+    time_budget_ms: int = Query(200, ge=0, le=60000),
+    path_format: PathFormat = "edges",
+):
+    """
+    Parte da rota gulosa e aplica busca local que preserva as precedências
+    (Or-opt, swap e 2-opt) até não haver melhora ou o tempo acabar.
+    Retorna a melhor ordem encontrada, a trajetória de custos e o número
+    de melhorias aplicadas. A busca roda num processo worker.
+    path_format=nodes troca path_edges por path_nodes (sequências de nós).
+    """
+    job_order, total_cost, start, path_edges, search_info = await improved_route(
+        start_node, time_budget_ms, request
+    )
 
-    has_cycle, _ = jobs_router.topological_sort(jobs, prec_rows) # type: ignore
-    if has_cycle:
-        raise HTTPException(status_code=400, detail="Ciclo detectado nas precedências.")
+    return {
+        "strategy": "improved",
+        "start_node": start,
+        "job_order": job_order,
+        "total_cost": total_cost,
+        **path_body(path_edges, path_format),
+        **search_info,
+    }
 
-    prereqs, _ = build_prereqs(jobs, prec_rows)
 
-    n = len(jobs)
-    job_index = {job_id: i for i, job_id in enumerate(jobs)}
+def solve_optimal(start_to_job: list[float], job_to_job: list[list[float]],
+                  prereq_masks: list[int], backend: str = "auto", solver: str = "dp",
+                  constraints=None, should_stop=never, progress=no_progress):
+    """
+    Roda o solver exato pedido; roda num worker (ver workers.run).
+    Retorna (custo, ordem, solver_info); a ordem é [] se não houver rota.
+    Com janelas de tempo a rota ótima é a que termina mais cedo, mas o
+    custo devolvido continua sendo o de viagem.
+    """
+    args = (start_to_job, job_to_job, prereq_masks)
+
+    if solver == "bnb":
+        best_cost, order, stats = branch_bound.solve(
+            *args, should_stop=should_stop, progress=progress, constraints=constraints
+        )
+        info = {"solver": "bnb", "stats": stats}
+    else:
+        backend = held_karp.resolve_backend(backend)
+        try:
+            best_cost, order = held_karp.solve(
+                *args, backend, should_stop=should_stop, progress=progress, constraints=constraints
+            )
+        except held_karp.MemoryBudgetExceeded as e:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Conjunto de jobs grande demais para a rota ótima: {e}"
+            )
+        info = {"solver": "dp", "backend": backend}
+
+    if constraints is not None and order:
+        best_cost = held_karp.route_cost(start_to_job, job_to_job, order)
+    return best_cost, order, info
+
+
+def _infeasible(instance: RouteInstance) -> HTTPException:
+    if instance.constraints is not None:
+        return HTTPException(
+            status_code=400,
+            detail="Rota ótima impossível (precedências, capacidade ou janelas de tempo)."
+        )
+    return HTTPException(status_code=400, detail="Rota ótima impossível.")
+
+
+async def optimal_route(start_node: int, backend: str = "auto", solver: str = "dp",
+                        request: Request | None = None, timeout: float = workers.TIMEOUT,
+                        on_task=None):
+    """
+    on_task, se dado, recebe o workers.Task assim que o cálculo é agendado
+    (para acompanhar o progresso).
+    """
+    instance = await run_in_threadpool(load_route_instance, start_node)
+
+    task = workers.submit(
+        solve_optimal,
+        instance.start_to_job, instance.job_to_job, instance.prereq_masks, backend, solver,
+        instance.constraints, progress=on_task is not None,
+    )
+    if on_task is not None:
+        on_task(task)
+    with metrics.span("solve"):
+        best_cost, order, solver_info = await task.result(request, timeout)
+    if not order:
+        raise _infeasible(instance)
+
+    with metrics.span("paths"):
+        path_edges = await run_in_threadpool(instance.path_edges, order)
+    return (instance.job_ids(order), best_cost, start_node, path_edges,
+            {**solver_info, **instance.schedule_info(order)})
 
-    relevant_nodes: set[int] = set(job_nodes.values())
-    relevant_nodes.add(start_node)
-    
-    
-    costs_nodes, all_parents = compute_costs_and_paths(adj, relevant_nodes)
 
-   
-    start_to_job = [float("inf")] * n
-    for job_id, idx in job_index.items():
-        node_j = job_nodes[job_id]
-        d = costs_nodes[start_node].get(node_j, float("inf"))
-        start_to_job[idx] = d
+@router.get("/optimal")
+async def get_optimal_route(
+    request: Request,
+    start_node: int = 1,
+    backend: Literal["auto", "python", "numpy"] = "auto",
+    solver: Literal["dp", "bnb"] = "dp",
+    path_format: PathFormat = "edges",
+):
+    """
+    Rota ótima respeitando as precedências e, se definidas, a capacidade do
+    veículo e as janelas de tempo dos jobs (com janelas, a rota que termina
+    mais cedo; finish_time e schedule trazem os horários).
+
+    - solver=dp: programação dinâmica (Held–Karp); backend escolhe a
+      implementação: python (laços em Python puro) ou numpy (transições
+      vetorizadas por camada); auto usa NumPy se instalado.
+    - solver=bnb: busca best-first (A*) com limites inferiores e a rota gulosa
+      como limite superior; ocupa memória só com os estados visitados e
+      devolve as estatísticas da busca.
+    O cálculo roda num processo worker, com limite de tempo (504) e
+    cancelamento se o cliente desconectar. path_format=nodes troca
+    path_edges por path_nodes (sequências de nós).
+    """
+    job_order, total_cost, start, path_edges, solver_info = await optimal_route(
+        start_node, backend, solver, request
+    )
 
-    job_to_job = [[float("inf")] * n for _ in range(n)]
-    for i, job_i in enumerate(jobs):
-        node_i = job_nodes[job_i]
-        dist_map = costs_nodes.get(node_i)
-        if dist_map is None:
-            continue
-        for j, job_j in enumerate(jobs):
-            node_j = job_nodes[job_j]
-            d = dist_map.get(node_j, float("inf"))
-            job_to_job[i][j] = d
-
-    INF = float("inf")
-    size = 1 << n
-    dp = [[INF] * n for _ in range(size)]
-    parent_state: dict[tuple[int, int], tuple[int, int] | None] = {}
-
-   
-    for job_id, idx in job_index.items():
-        if prereqs[job_id]:
-            continue
-        cost = start_to_job[idx]
-        if cost == INF:
-            continue
-        mask = 1 << idx
-        dp[mask][idx] = cost
-        parent_state[(mask, idx)] = None 
+    return {
+        "strategy": "optimal",
+        "start_node": start,
+        "job_order": job_order,
+        "total_cost": total_cost,
+        **path_body(path_edges, path_format),
+        **solver_info,
+    }
 
-    
-    for mask in range(size):
-        for last in range(n):
-            cur_cost = dp[mask][last]
-            if cur_cost == INF:
-                continue
-
-            last_job_id = jobs[last]
-
-            for k in range(n):
-                if mask & (1 << k):
-                    continue 
-
-                next_job_id = jobs[k]
-                
-                
-                jobs_done_in_mask = {jobs[i] for i in range(n) if mask & (1 << i)}
-                if not prereqs[next_job_id].issubset(jobs_done_in_mask):
-                    continue
-
-                move_cost = job_to_job[last][k]
-                if move_cost == INF:
-                    continue
-
-                next_mask = mask | (1 << k)
-                new_cost = cur_cost + move_cost
-                if new_cost < dp[next_mask][k]:
-                    dp[next_mask][k] = new_cost
-                    parent_state[(next_mask, k)] = (mask, last)
 
-    
-    full_mask = (1 << n) - 1
-    best_cost = INF
-    best_last = -1
-
-    for last in range(n):
-        if dp[full_mask][last] < best_cost:
-            best_cost = dp[full_mask][last]
-            best_last = last
-
-    if best_cost == INF or best_last == -1:
-        raise HTTPException(status_code=400, detail="Rota ótima impossível.")
-
-    job_order_indices: list[int] = []
-    cur_state = (full_mask, best_last)
-    while cur_state is not None:
-        mask, last = cur_state
-        job_order_indices.append(last)
-        cur_state = parent_state.get(cur_state)
-
-    job_order_indices.reverse()
-    job_order = [jobs[i] for i in job_order_indices]
-
-   
-    full_path_edges = []
-    current_node = start_node
-    
-    for job_id in job_order:
-        target_node = job_nodes[job_id]
-        
-        
-        parents_from_curr = all_parents[current_node]
-        
-        
-        segment_edges = get_path_edges(parents_from_curr, current_node, target_node)
-        full_path_edges.extend(segment_edges)
-        
-        current_node = target_node
+# nós iniciais aceitos por chamada de /routes/batch
+BATCH_MAX_STARTS = int(os.environ.get("ROUTE_BATCH_MAX_STARTS", 1000))
+
+
+class BatchRequest(BaseModel):
+    start_nodes: list[int] = Field(min_length=1, max_length=BATCH_MAX_STARTS)
+    strategies: list[Literal["greedy", "improved", "optimal"]] = Field(["optimal"], min_length=1)
+    # só para optimal
+    solver: Literal["dp", "bnb"] = "dp"
+    backend: Literal["auto", "python", "numpy"] = "auto"
+    # só para improved
+    time_budget_ms: int = Field(200, ge=0, le=60000)
+    path_format: PathFormat = "edges"
+
+
+def solve_optimal_batch(start_rows: list[list[float]], job_to_job: list[list[float]],
+                        prereq_masks: list[int], backend: str = "auto", constraints=None,
+                        should_stop=never, progress=no_progress):
+    """
+    Rotas ótimas (DP) de vários nós iniciais com uma única passada do DP de
+    sufixos (held_karp.solve_cost_to_go), que não depende do início; cada
+    nó inicial custa só O(n²) a mais. Roda num worker (ver workers.run).
+    constraints não pode ter janelas de tempo (só capacidade).
+    Retorna ([(custo, ordem)] na ordem de start_rows, backend usado).
+    """
+    backend = held_karp.resolve_backend(backend)
+    try:
+        table = held_karp.solve_cost_to_go(
+            job_to_job, prereq_masks, backend, should_stop=should_stop, progress=progress,
+            constraints=constraints,
+        )
+    except held_karp.MemoryBudgetExceeded as e:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Conjunto de jobs grande demais para a rota ótima: {e}"
+        )
+    return [table.route(row, job_to_job) for row in start_rows], backend
 
-    return job_order, best_cost, start_node, full_path_edges
 
+def _route_body(strategy: str, instance: RouteInstance, order: list[int], total_cost: float,
+                extra: dict, path_format: str = "edges") -> dict:
+    return {
+        "strategy": strategy,
+        "start_node": instance.start_node,
+        "job_order": instance.job_ids(order),
+        "total_cost": total_cost,
+        **path_body(instance.path_edges(order), path_format),
+        **extra,
+        **instance.schedule_info(order),
+    }
 
-@router.get("/optimal")
-def get_optimal_route(start_node: int = 1):
-    job_order, total_cost, start, path_edges = optimal_route(start_node)
 
+def _error_body(strategy: str, start_node: int, exc: HTTPException) -> dict:
     return {
-        "strategy": "optimal",
-        "start_node": start,
-        "job_order": job_order,
-        "total_cost": total_cost,
-        "path_edges": path_edges 
+        "strategy": strategy,
+        "start_node": start_node,
+        "error": {"status_code": exc.status_code, "detail": exc.detail},
     }
-@router.get("/adjacency")
-def get_adjacency_list():
-    
-    # reaproveita a função que você já tem
-    nodes, adj = load_graph_from_db()
-
-    adjacency = []
-    for node_id in nodes:
-        neighbors = [
-            {"to": neighbor_id, "weight": weight}
-            for (neighbor_id, weight) in adj[node_id]
-        ]
-        adjacency.append({
-            "node": node_id,
-            "neighbors": neighbors
-        })
 
+
+@router.post("/batch")
+async def batch_routes(params: BatchRequest, request: Request):
+    """
+    Rotas de vários nós iniciais (depósitos) e estratégias numa chamada só.
+
+    O grafo, as distâncias e a matriz job_to_job são calculados uma vez para
+    todos os nós iniciais. Com strategy optimal e solver dp, um único DP de
+    sufixos atende todos os inícios (sem janelas de tempo, que dependem do
+    início); bnb, improved e o DP com janelas rodam um cálculo por início,
+    em paralelo nos workers.
+    results traz uma entrada por (start_node, estratégia), na ordem pedida,
+    com o mesmo corpo das rotas GET correspondentes ou, se aquele cálculo
+    falhar, error com o status HTTP e a mensagem.
+    """
+    starts = list(dict.fromkeys(params.start_nodes))
+    strategies = list(dict.fromkeys(params.strategies))
+
+    graph = await run_in_threadpool(graph_store.get_graph)
+    valid = [s for s in starts if s in graph]
+    instances = await run_in_threadpool(load_route_instances, valid) if valid else {}
+
+    results: dict[tuple[int, str], dict] = {}
+    for start_node in starts:
+        if start_node not in instances:
+            missing = HTTPException(status_code=404, detail=f"start_node {start_node} não existe.")
+            for strategy in strategies:
+                results[(start_node, strategy)] = _error_body(strategy, start_node, missing)
+
+    def finish(strategy: str, instance: RouteInstance, solution, extra: dict):
+        total_cost, order = solution
+        if not order:
+            raise _infeasible(instance)
+        return _route_body(strategy, instance, order, total_cost, extra, params.path_format)
+
+    def greedy_all():
+        for start_node, instance in instances.items():
+            try:
+                total_cost, order = solve_greedy(instance)
+                body = _route_body("greedy", instance, order, total_cost, {}, params.path_format)
+            except HTTPException as exc:
+                body = _error_body("greedy", start_node, exc)
+            results[(start_node, "greedy")] = body
+
+    async def optimal_dp():
+        ordered = list(instances.values())
+        solutions, backend = await workers.run(
+            request, solve_optimal_batch,
+            [inst.start_to_job for inst in ordered], ordered[0].job_to_job,
+            ordered[0].prereq_masks, params.backend, ordered[0].constraints,
+        )
+        extra = {"solver": "dp", "backend": backend, "shared_dp": True}
+        for instance, solution in zip(ordered, solutions):
+            try:
+                body = await run_in_threadpool(finish, "optimal", instance, solution, extra)
+            except HTTPException as exc:
+                body = _error_body("optimal", instance.start_node, exc)
+            results[(instance.start_node, "optimal")] = body
+
+    # um cálculo por início, no máximo um por worker de cada vez
+    limit = asyncio.Semaphore(max(workers.WORKERS, 1))
+
+    async def per_start(strategy: str, instance: RouteInstance):
+        args = (instance.start_to_job, instance.job_to_job, instance.prereq_masks)
+        try:
+            async with limit:
+                if strategy == "improved":
+                    total_cost, order, extra = await workers.run(
+                        request, solve_improved, *args, params.time_budget_ms,
+                        instance.constraints,
+                    )
+                else:
+                    total_cost, order, extra = await workers.run(
+                        request, solve_optimal, *args, params.backend, params.solver,
+                        instance.constraints,
+                    )
+            body = await run_in_threadpool(finish, strategy, instance, (total_cost, order), extra)
+        except HTTPException as exc:
+            if exc.status_code == 499:
+                raise
+            body = _error_body(strategy, instance.start_node, exc)
+        results[(instance.start_node, strategy)] = body
+
+    async def group(strategy: str, coroutine):
+        try:
+            await coroutine
+        except HTTPException as exc:
+            # falha que vale para todos os inícios (ex.: DP grande demais)
+            if exc.status_code == 499:
+                raise
+            for start_node in instances:
+                results.setdefault((start_node, strategy), _error_body(strategy, start_node, exc))
+
+    # janelas de tempo dependem do início: sem DP de sufixos compartilhado
+    constraints = next(iter(instances.values())).constraints if instances else None
+    shared_dp = params.solver == "dp" and not (constraints is not None and constraints.timed)
+
+    pending = []
+    if instances:
+        if "greedy" in strategies:
+            pending.append(group("greedy", run_in_threadpool(greedy_all)))
+        if "optimal" in strategies and shared_dp:
+            pending.append(group("optimal", optimal_dp()))
+        for strategy in strategies:
+            if strategy == "improved" or (strategy == "optimal" and not shared_dp):
+                pending += [per_start(strategy, inst) for inst in instances.values()]
+    with metrics.span("solve"):
+        await asyncio.gather(*pending)
+
+    return {"results": [results[(s, strategy)] for s in starts for strategy in strategies]}
+
+
+# veículos aceitos por chamada de /routes/fleet
+FLEET_MAX_VEHICLES = int(os.environ.get("ROUTE_FLEET_MAX_VEHICLES", 100))
+
+
+class FleetRequest(BaseModel):
+    # nó inicial de cada veículo; repetir o nó para vários veículos no mesmo depósito
+    start_nodes: list[int] = Field(min_length=1, max_length=FLEET_MAX_VEHICLES)
+    strategy: Literal["greedy", "improved", "optimal"] = "optimal"
+    # só para optimal
+    solver: Literal["dp", "bnb"] = "dp"
+    backend: Literal["auto", "python", "numpy"] = "auto"
+    # só para improved
+    time_budget_ms: int = Field(200, ge=0, le=60000)
+    path_format: PathFormat = "edges"
+    # jobs por veículo; None divide por igual (teto de jobs / veículos)
+    max_jobs_per_vehicle: int | None = Field(None, ge=1)
+
+
+@router.post("/fleet")
+async def fleet_routes(params: FleetRequest, request: Request):
+    """
+    Divide os jobs entre vários veículos (um por item de start_nodes) e
+    monta a rota de cada um.
+
+    Jobs ligados por precedências (ex.: um pickup e o seu dropoff) ficam
+    sempre no mesmo veículo. Os grupos são distribuídos pela matriz de
+    distâncias já usada nas rotas: os clusters crescem a partir dos nós
+    iniciais, cada grupo indo para o cluster mais próximo que ainda tenha
+    espaço (max_jobs_per_vehicle). Depois, a rota de cada veículo é
+    calculada com a estratégia pedida, em paralelo nos workers.
+    vehicles traz, na ordem de start_nodes, o corpo da rota de cada
+    veículo ou error; unassigned_jobs lista os jobs que nenhum veículo
+    alcança.
+    """
+    starts = list(dict.fromkeys(params.start_nodes))
+    instances = await run_in_threadpool(load_route_instances, starts)
+    first = instances[starts[0]]
+    vehicles = len(params.start_nodes)
+    max_jobs = params.max_jobs_per_vehicle or math.ceil(len(first.jobs) / vehicles)
+
+    with metrics.span("partition"):
+        assignment, unreachable = fleet.partition(
+            [instances[s].start_to_job for s in params.start_nodes], first.job_to_job,
+            fleet.precedence_components(first.prereq_masks), max_jobs,
+        )
+
+    # no máximo um cálculo por worker de cada vez
+    limit = asyncio.Semaphore(max(workers.WORKERS, 1))
+
+    async def route(vehicle: int, start_node: int, indices: list[int]) -> dict:
+        instance = instances[start_node].subset(indices)
+        args = (instance.start_to_job, instance.job_to_job, instance.prereq_masks)
+        try:
+            if not indices:
+                total_cost, order, extra = 0.0, [], {}
+            elif params.strategy == "greedy":
+                total_cost, order = await run_in_threadpool(solve_greedy, instance)
+                extra = {}
+            else:
+                async with limit:
+                    if params.strategy == "improved":
+                        total_cost, order, extra = await workers.run(
+                            request, solve_improved, *args, params.time_budget_ms,
+                            instance.constraints,
+                        )
+                    else:
+                        total_cost, order, extra = await workers.run(
+                            request, solve_optimal, *args, params.backend, params.solver,
+                            instance.constraints,
+                        )
+                if not order:
+                    raise _infeasible(instance)
+            body = await run_in_threadpool(
+                _route_body, params.strategy, instance, order, total_cost, extra,
+                params.path_format,
+            )
+        except HTTPException as exc:
+            if exc.status_code == 499:
+                raise
+            body = _error_body(params.strategy, start_node, exc)
+            body["assigned_jobs"] = instance.jobs
+        return {"vehicle": vehicle, **body}
+
+    with metrics.span("solve"):
+        results = await asyncio.gather(*(
+            route(vehicle, start_node, indices)
+            for vehicle, (start_node, indices) in enumerate(zip(params.start_nodes, assignment))
+        ))
+
+    failed = any("error" in body for body in results)
     return {
-        "nodes": nodes,
-        "adjacency": adjacency
+        "strategy": params.strategy,
+        "vehicles": results,
+        # soma dos custos; None se a rota de algum veículo falhou
+        "total_cost": None if failed else sum(body["total_cost"] for body in results),
+        "unassigned_jobs": [first.jobs[k] for k in unreachable],
     }
+
+
+@router.get("/adjacency")
+def get_adjacency_list(format: Literal["json", "ndjson", "msgpack"] = "json"):
+    """
+    Lista de adjacência do grafo, gerada em streaming (um nó por vez).
+    format: json ({"nodes", "adjacency"}), ndjson (primeira linha com
+    nodes, depois um {"node", "neighbors"} por linha) ou msgpack (o mesmo
+    documento do json; requer o pacote msgpack).
+    """
+    encoding.require(format)
+    graph = graph_store.get_graph()
+    nodes, csr = graph.nodes, graph.csr
+
+    def adjacency():
+        for i, node_id in enumerate(nodes):
+            neighbors = [
+                {"to": nodes[neighbor], "weight": weight}
+                for (neighbor, weight) in csr.neighbors(i)
+            ]
+            yield {
+                "node": node_id,
+                "neighbors": neighbors
+            }
+
+    return encoding.stream(format, {"nodes": nodes}, "adjacency", adjacency(), len(nodes))
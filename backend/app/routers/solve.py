@@ -0,0 +1,338 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+
+import app.database.connection as db
+from app import metrics
+from app.algorithms import held_karp
+from app.database import graph_store, ticket_store
+from app.routers import routes
+
+router = APIRouter()
+
+# Tickets e rotas prontas ficam no SQLite (ver app/database/ticket_store.py):
+# com vários processos (uvicorn --workers), qualquer um responde por um
+# ticket. O cálculo roda no processo que recebeu o POST.
+
+# rotas prontas guardadas por (versões do dataset, start_node, estratégia, opções)
+RESULT_CACHE_SIZE = int(os.environ.get("SOLVE_CACHE_SIZE", 256))
+# segundos que um ticket concluído continua consultável
+TICKET_TTL = float(os.environ.get("SOLVE_TICKET_TTL", 900))
+# limite de tempo de um cálculo disparado por ticket (bem acima do das
+# rotas síncronas, que precisam caber no timeout do balanceador)
+TICKET_TIMEOUT = float(os.environ.get("SOLVE_TICKET_TIMEOUT", 3600))
+# segundos sem sinal do processo que calcula um ticket até ele ser dado
+# como perdido (processo encerrado no meio do cálculo)
+TICKET_STALE = float(os.environ.get("SOLVE_TICKET_STALE", 30))
+
+# intervalo entre as publicações de estado e progresso de um ticket em
+# andamento (e as verificações de cancelamento pedido por outro processo)
+_PUBLISH_SECONDS = 0.5
+# intervalo mínimo entre limpezas dos tickets expirados
+_EXPIRE_SECONDS = 1.0
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_STALE_ERROR = {"status_code": 503, "detail": "O processo que calculava o ticket foi encerrado."}
+
+
+class SolveRequest(BaseModel):
+    start_node: int = 1
+    strategy: Literal["greedy", "improved", "optimal"] = "optimal"
+    # só para optimal
+    solver: Literal["dp", "bnb"] = "dp"
+    backend: Literal["auto", "python", "numpy"] = "auto"
+    # só para improved
+    time_budget_ms: int = Field(200, ge=0, le=60000)
+    path_format: routes.PathFormat = "edges"
+
+
+class Ticket:
+    """
+    Ticket em andamento neste processo. Os demais processos enxergam o
+    estado publicado em ticket_store.
+    """
+
+    def __init__(self, key: str, versions: tuple[int, int], params: SolveRequest):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.versions = versions
+        self.params = params
+        self.status = QUEUED
+        self.created = time.time()
+        self.task = None      # workers.Task, quando o cálculo vai para um worker
+        self.work = None      # asyncio.Task do cálculo
+        self.runner = None    # asyncio.Task que conduz o ticket (_run)
+
+    def refresh(self) -> str:
+        if self.status == QUEUED and self.task is not None and self.task.running():
+            self.status = RUNNING
+        return self.status
+
+    def progress(self) -> dict:
+        return self.task.progress() if self.task is not None else {}
+
+    def cancel(self):
+        """
+        Na fila ou rodando num worker, o cálculo para no próximo
+        should_stop(); numa thread do servidor (greedy), o ticket é
+        cancelado sem esperar o fim.
+        """
+        if self.task is not None:
+            self.task.cancel()
+        elif self.work is not None:
+            self.work.cancel()
+
+    def view(self) -> dict:
+        return _view({
+            "id": self.id,
+            "status": self.refresh(),
+            "start_node": self.params.start_node,
+            "strategy": self.params.strategy,
+            "cached": False,
+            "created": self.created,
+            "finished": None,
+            "progress": self.progress(),
+            "result": None,
+            "error": None,
+        })
+
+
+def _view(ticket: dict) -> dict:
+    end = ticket["finished"] if ticket["finished"] is not None else time.time()
+    return {
+        "id": ticket["id"],
+        "status": ticket["status"],
+        "start_node": ticket["start_node"],
+        "strategy": ticket["strategy"],
+        "cached": ticket["cached"],
+        "elapsed_ms": round((end - ticket["created"]) * 1000, 3),
+        "progress": ticket["progress"] or {},
+        "result": ticket["result"],
+        "error": ticket["error"],
+    }
+
+
+# tickets em andamento neste processo, por id e por chave: pedidos iguais
+# acompanham o mesmo cálculo
+_local: dict[str, Ticket] = {}
+_in_flight: dict[str, Ticket] = {}
+_last_expire = 0.0
+
+
+def _dataset_versions() -> tuple[int, int]:
+    conn = db.get_read_connection()
+    try:
+        cur = conn.cursor()
+        return (
+            graph_store.read_version(cur),
+            graph_store.read_version(cur, graph_store.JOBS_VERSION_KEY),
+        )
+    finally:
+        conn.close()
+
+
+def _options(params: SolveRequest) -> list:
+    """
+    Opções que mudam o resultado de cada estratégia; o backend do DP só
+    muda a velocidade, mas entra na chave por causa dos empates.
+    """
+    if params.strategy == "optimal":
+        if params.solver == "bnb":
+            return ["bnb"]
+        return ["dp", held_karp.resolve_backend(params.backend)]
+    if params.strategy == "improved":
+        return [params.time_budget_ms]
+    return []
+
+
+async def _expire():
+    global _last_expire
+    now = time.monotonic()
+    if now - _last_expire < _EXPIRE_SECONDS:
+        return
+    _last_expire = now
+    await run_in_threadpool(ticket_store.expire, TICKET_TTL, TICKET_STALE, _STALE_ERROR)
+
+
+async def _compute(ticket: Ticket) -> dict:
+    params = ticket.params
+
+    def attach(task):
+        ticket.task = task
+
+    if params.strategy == "greedy":
+        # numa thread do servidor, sem fila: começa na hora
+        ticket.status = RUNNING
+        job_order, total_cost, start, path_edges, extra = await run_in_threadpool(
+            routes.greedy_route, params.start_node
+        )
+    elif params.strategy == "improved":
+        job_order, total_cost, start, path_edges, extra = await routes.improved_route(
+            params.start_node, params.time_budget_ms, timeout=TICKET_TIMEOUT, on_task=attach
+        )
+    else:
+        job_order, total_cost, start, path_edges, extra = await routes.optimal_route(
+            params.start_node, params.backend, params.solver, timeout=TICKET_TIMEOUT, on_task=attach
+        )
+
+    return {
+        "strategy": params.strategy,
+        "start_node": start,
+        "job_order": job_order,
+        "total_cost": total_cost,
+        **routes.path_body(path_edges, params.path_format),
+        **extra,
+    }
+
+
+async def _run(ticket: Ticket):
+    """
+    Conduz o cálculo do ticket, publicando estado e progresso a cada
+    _PUBLISH_SECONDS, e grava o desfecho.
+    """
+    ticket.work = asyncio.create_task(_compute(ticket))
+    result = error = None
+    try:
+        while not (await asyncio.wait({ticket.work}, timeout=_PUBLISH_SECONDS))[0]:
+            cancel = await run_in_threadpool(
+                ticket_store.publish, ticket.id, ticket.refresh(), ticket.progress()
+            )
+            if cancel:
+                ticket.cancel()
+        result = ticket.work.result()
+    except HTTPException as exc:
+        error = {"status_code": exc.status_code, "detail": exc.detail}
+        status = CANCELLED if exc.status_code == 499 else FAILED
+    except asyncio.CancelledError:
+        if not ticket.work.done():
+            # o próprio _run foi cancelado (servidor encerrando)
+            ticket.cancel()
+            ticket_store.finish(ticket.id, CANCELLED, time.time())
+            _forget(ticket)
+            raise
+        status = CANCELLED
+    except Exception as exc:
+        error = {"status_code": 500, "detail": f"Erro no cálculo: {exc}"}
+        status = FAILED
+    else:
+        status = DONE
+        # se o dataset mudou durante o cálculo, a rota pode não corresponder
+        # às versões da chave: fica só neste ticket, fora do cache
+        if await run_in_threadpool(_dataset_versions) == ticket.versions:
+            await run_in_threadpool(ticket_store.put_result, ticket.key, result, RESULT_CACHE_SIZE)
+
+    try:
+        await run_in_threadpool(ticket_store.finish, ticket.id, status, time.time(), result, error)
+    finally:
+        _forget(ticket)
+
+
+def _forget(ticket: Ticket):
+    _local.pop(ticket.id, None)
+    if _in_flight.get(ticket.key) is ticket:
+        del _in_flight[ticket.key]
+
+
+@router.post("/solve", status_code=202)
+async def create_solve_ticket(params: SolveRequest):
+    """
+    Agenda o cálculo de uma rota e responde na hora com um ticket; o
+    andamento e o resultado ficam em GET /routes/solve/{id}, em qualquer
+    processo do servidor.
+
+    Rotas já calculadas para a mesma versão do dataset (grafo e jobs),
+    start_node, estratégia e opções voltam prontas (cached = true), e um
+    pedido igual a outro ainda em andamento recebe o mesmo ticket.
+    """
+    await _expire()
+    versions = await run_in_threadpool(_dataset_versions)
+    key = json.dumps(
+        [*versions, params.start_node, params.strategy, _options(params), params.path_format]
+    )
+
+    running = _in_flight.get(key)
+    if running is not None:
+        return running.view()
+    active = await run_in_threadpool(ticket_store.find_active, key)
+    if active is not None:
+        return _view(active)
+
+    cached = await run_in_threadpool(ticket_store.get_result, key)
+    metrics.cache("solve_results", hit=cached is not None)
+    ticket = Ticket(key, versions, params)
+    if cached is not None:
+        await run_in_threadpool(
+            ticket_store.insert, ticket.id, key, DONE, params.start_node, params.strategy,
+            ticket.created, True, cached, time.time(),
+        )
+        return _view(await run_in_threadpool(ticket_store.get, ticket.id))
+
+    # outro pedido igual pode ter passado na frente durante as consultas
+    running = _in_flight.get(key)
+    if running is not None:
+        return running.view()
+    _in_flight[key] = ticket
+    _local[ticket.id] = ticket
+    try:
+        await run_in_threadpool(
+            ticket_store.insert, ticket.id, key, QUEUED, params.start_node, params.strategy,
+            ticket.created,
+        )
+    except BaseException:
+        _forget(ticket)
+        raise
+    ticket.runner = asyncio.create_task(_run(ticket))
+    return ticket.view()
+
+
+async def _get_ticket(ticket_id: str) -> dict:
+    ticket = await run_in_threadpool(ticket_store.get, ticket_id)
+    if ticket is None:
+        raise HTTPException(status_code=404, detail="Ticket não encontrado (ou expirado).")
+    return ticket
+
+
+@router.get("/solve/{ticket_id}")
+async def get_solve_ticket(ticket_id: str):
+    """
+    Estado do ticket (queued, running, done, failed ou cancelled), tempo
+    decorrido e progresso informado pelo solver: camada do DP (layer /
+    layers) ou estados processados (masks_done / masks), estados expandidos
+    (expanded) e custo da melhor rota até agora (incumbent_cost). Concluído,
+    traz o mesmo corpo da rota síncrona correspondente em result; com falha,
+    o status HTTP e a mensagem em error.
+    """
+    await _expire()
+    local = _local.get(ticket_id)
+    if local is not None:
+        return local.view()
+    return _view(await _get_ticket(ticket_id))
+
+
+@router.delete("/solve/{ticket_id}")
+async def cancel_solve_ticket(ticket_id: str):
+    """
+    Cancela o cálculo de um ticket ainda em andamento. Se ele estiver em
+    outro processo, o pedido fica registrado e o cálculo para em até meio
+    segundo.
+    """
+    local = _local.get(ticket_id)
+    if local is not None:
+        local.cancel()
+        return local.view()
+    ticket = await _get_ticket(ticket_id)
+    if ticket["finished"] is None:
+        await run_in_threadpool(ticket_store.request_cancel, ticket_id)
+    return _view(ticket)
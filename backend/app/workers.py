@@ -0,0 +1,293 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException, Request
+
+from app import metrics
+from app.algorithms.cancel import PROGRESS_FIELDS, Cancelled
+
+# Processos que rodam os cálculos pesados (rota ótima, busca local, matriz
+# de custos), fora do processo que atende as requisições. Com 0 eles rodam
+# em threads do próprio processo (útil para depurar).
+WORKERS = int(os.environ.get("SOLVER_WORKERS", os.cpu_count() or 1))
+# cálculos aceitos na fila além dos que já estão rodando; acima disso, 503
+MAX_PENDING = int(os.environ.get("SOLVER_MAX_PENDING", 2 * max(WORKERS, 1)))
+# segundos até desistir de um cálculo (504)
+TIMEOUT = float(os.environ.get("SOLVER_TIMEOUT", 60))
+
+# intervalo entre as verificações de desconexão do cliente
+_POLL_SECONDS = 0.25
+
+_lock = threading.Lock()
+_executor: ProcessPoolExecutor | ThreadPoolExecutor | None = None
+# uma flag de cancelamento e um bloco de progresso (PROGRESS_FIELDS, NaN =
+# não informado) por vaga (rodando + na fila), compartilhados com os
+# workers; a vaga só volta para _free quando o cálculo termina de fato
+_flags = None
+_progress = None
+_free: list[int] = []
+# verdadeiro dentro dos processos worker
+_in_worker = False
+
+_FIELDS = len(PROGRESS_FIELDS)
+_FIELD_INDEX = {name: i for i, name in enumerate(PROGRESS_FIELDS)}
+
+
+class _RemoteHTTPError(Exception):
+    """
+    HTTPException levantada dentro de um worker, em forma que atravessa o
+    pickle de volta para o processo principal.
+    """
+
+    def __init__(self, status_code: int, detail):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _init_worker(flags, progress):
+    global _flags, _progress, _in_worker
+    _flags, _progress = flags, progress
+    _in_worker = True
+
+
+def _call(slot: int, func, args, track: bool):
+    """
+    Roda func(*args, should_stop=...) no worker; should_stop lê a flag da
+    vaga, ligada pelo processo principal ao cancelar. Com track, func
+    também recebe progress(**campos), que grava no bloco da vaga.
+    Retorna (resultado, métricas acumuladas no worker); em threads as
+    métricas já caem direto no processo principal (None).
+    """
+    flags, shared = _flags, _progress
+    base = slot * _FIELDS
+
+    def should_stop() -> bool:
+        return flags[slot] != 0
+
+    def progress(**fields):
+        for name, value in fields.items():
+            shared[base + _FIELD_INDEX[name]] = value
+
+    kwargs = {"should_stop": should_stop}
+    if track:
+        kwargs["progress"] = progress
+    try:
+        result = func(*args, **kwargs)
+        return result, metrics.drain() if _in_worker else None
+    except HTTPException as exc:
+        raise _RemoteHTTPError(exc.status_code, exc.detail)
+
+
+def _get_executor():
+    global _executor, _flags, _progress
+    with _lock:
+        if _executor is None:
+            slots = max(WORKERS, 1) + MAX_PENDING
+            if WORKERS > 0:
+                # spawn: nada de fork com as threads e conexões do servidor
+                context = multiprocessing.get_context("spawn")
+                _flags = context.Array("b", slots, lock=False)
+                _progress = context.Array("d", slots * _FIELDS, lock=False)
+                _executor = ProcessPoolExecutor(
+                    WORKERS, mp_context=context,
+                    initializer=_init_worker, initargs=(_flags, _progress),
+                )
+            else:
+                _flags = bytearray(slots)
+                _progress = array("d", bytes(8 * slots * _FIELDS))
+                _executor = ThreadPoolExecutor(os.cpu_count() or 1)
+            _free[:] = range(slots)
+        return _executor
+
+
+def _take_slot() -> int:
+    with _lock:
+        if not _free:
+            raise HTTPException(
+                status_code=503,
+                detail="Fila de cálculo cheia. Tente novamente em instantes."
+            )
+        slot = _free.pop()
+        _flags[slot] = 0
+        for i in range(slot * _FIELDS, (slot + 1) * _FIELDS):
+            _progress[i] = math.nan
+        return slot
+
+
+def _release_slot(flags, slot: int):
+    with _lock:
+        # vagas de um pool já descartado não voltam para o atual
+        if flags is _flags:
+            _free.append(slot)
+
+
+class Task:
+    """
+    Cálculo submetido a um worker (ver submit).
+    """
+
+    def __init__(self, executor, future, flags, progress, slot: int):
+        self._executor = executor
+        self._future = future
+        self._flags = flags
+        self._progress = progress
+        self._slot = slot
+        self._waiter = asyncio.wrap_future(future)
+
+    def running(self) -> bool:
+        return self._future.running()
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def progress(self) -> dict:
+        """
+        Últimos valores informados pelo solver (só os campos informados);
+        vazio depois que o cálculo termina, quando a vaga pode ser reusada.
+        """
+        if self._future.done():
+            return {}
+        base = self._slot * _FIELDS
+        fields = {}
+        for i, name in enumerate(PROGRESS_FIELDS):
+            value = self._progress[base + i]
+            if not math.isnan(value):
+                fields[name] = value if name == "incumbent_cost" else int(value)
+        return fields
+
+    def cancel(self):
+        """
+        Na fila, o cálculo sai sem rodar; rodando, o solver para no próximo
+        should_stop().
+        """
+        if not self._future.cancel():
+            self._flags[self._slot] = 1
+        # ninguém mais vai ler o resultado (Cancelled, em geral)
+        self._waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    async def result(self, request: Request | None = None, timeout: float = TIMEOUT):
+        """
+        Espera o resultado sem bloquear o event loop.
+
+        - mais de timeout segundos: o cálculo é cancelado e a resposta é 504;
+        - cliente desconectado (request.is_disconnected()): o cálculo é
+          cancelado e a resposta é 499, que ninguém mais vai ler.
+        HTTPException levantada pela função chega como HTTPException.
+        """
+        waiter = self._waiter
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while not waiter.done():
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.cancel()
+                    raise HTTPException(
+                        status_code=504,
+                        detail=f"Cálculo excedeu o limite de {timeout:g} s e foi cancelado."
+                    )
+                await asyncio.wait({waiter}, timeout=min(_POLL_SECONDS, remaining))
+                if not waiter.done() and request is not None and await request.is_disconnected():
+                    self.cancel()
+                    raise HTTPException(status_code=499, detail="Cliente desconectado.")
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+        try:
+            result, delta = waiter.result()
+        except _RemoteHTTPError as exc:
+            raise HTTPException(status_code=exc.status_code, detail=exc.detail)
+        except (Cancelled, asyncio.CancelledError):
+            raise HTTPException(status_code=499, detail="Cálculo cancelado.")
+        except BrokenProcessPool:
+            discard(self._executor)
+            raise HTTPException(
+                status_code=503,
+                detail="Um worker de cálculo foi encerrado inesperadamente. Tente novamente."
+            )
+        metrics.merge(delta)
+        return result
+
+
+def submit(func, *args, progress: bool = False) -> Task:
+    """
+    Agenda func(*args, should_stop=...) num worker e devolve o Task. func
+    precisa ser uma função de módulo (vai por pickle) e chamar
+    should_stop() de tempos em tempos; com progress=True ela também recebe
+    progress(**campos) (ver cancel.PROGRESS_FIELDS).
+    Com a fila cheia levanta HTTPException 503.
+    """
+    executor = _get_executor()
+    flags, shared = _flags, _progress
+    slot = _take_slot()
+    try:
+        future = executor.submit(_call, slot, func, args, progress)
+    except BaseException:
+        _release_slot(flags, slot)
+        raise
+    future.add_done_callback(lambda _: _release_slot(flags, slot))
+    return Task(executor, future, flags, shared, slot)
+
+
+async def run(request: Request | None, func, *args, timeout: float = TIMEOUT):
+    """
+    submit + Task.result: executa func num worker e devolve o resultado,
+    com fila limitada (503), limite de tempo (504) e cancelamento se o
+    cliente desconectar.
+    """
+    return await submit(func, *args).result(request, timeout)
+
+
+def idle_pool(max_processes: int):
+    """
+    Para quem divide um cálculo em partes fora da fila (multi_source): o
+    pool de processos e quantos dos seus processos, até max_processes, não
+    têm cálculo rodando nem na fila. Assim a divisão só usa processos
+    ociosos e o total continua em WORKERS. (None, 0) quando os cálculos
+    rodam em threads.
+    """
+    if WORKERS <= 0:
+        return None, 0
+    executor = _get_executor()
+    with _lock:
+        if _flags is None:
+            return None, 0
+        busy = len(_flags) - len(_free)
+    return executor, max(0, min(WORKERS - busy, max_processes))
+
+
+def discard(executor):
+    """
+    Tira de uso um pool com worker encerrado; o próximo submit cria outro.
+    """
+    global _executor, _flags, _progress
+    with _lock:
+        if _executor is not executor:
+            return
+        _executor, _flags, _progress = None, None, None
+        _free.clear()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown():
+    """
+    Cancela os cálculos em andamento e encerra os workers.
+    """
+    global _executor, _flags, _progress
+    with _lock:
+        executor, flags = _executor, _flags
+        _executor, _flags, _progress = None, None, None
+        _free.clear()
+    if executor is None:
+        return
+    for slot in range(len(flags)):
+        flags[slot] = 1
+    executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,223 @@
+"""
+Gerador de datasets sintéticos no formato de POST /dataset/upload_dataset.
+
+Exemplos (na pasta backend):
+
+    py -m bench.generate grid --nodes 10000 --jobs 12 > grid.json
+    py -m bench.generate geometric --nodes 5000 --degree 6 --precedences chains
+    py -m bench.generate scale_free --nodes 20000 --degree 4 --precedences random --density 0.1
+"""
+import argparse
+import json
+import math
+import random
+import sys
+
+SHAPES = ("grid", "geometric", "scale_free")
+PRECEDENCES = ("pairs", "chains", "random", "none")
+
+# lado do quadrado onde os nós são espalhados
+AREA = 1000.0
+
+
+def _weight(rng: random.Random, a: dict, b: dict) -> float:
+    # comprimento euclidiano com um fator de trânsito >= 1: a heurística do
+    # A* (escala × distância) continua admissível
+    length = math.hypot(a["x"] - b["x"], a["y"] - b["y"])
+    return round(max(length, 1.0) * rng.uniform(1.0, 1.5), 3)
+
+
+def _nodes(points: list[tuple[float, float]]) -> list[dict]:
+    return [
+        {"id": i + 1, "name": f"N{i + 1}", "x": round(x, 3), "y": round(y, 3)}
+        for i, (x, y) in enumerate(points)
+    ]
+
+
+def _edges(rng: random.Random, nodes: list[dict], pairs, one_way: float) -> list[dict]:
+    """
+    Arestas nos dois sentidos para cada par (u, v) de índices; com
+    probabilidade one_way só o sentido u -> v é criado.
+    """
+    edges = []
+    for u, v in pairs:
+        directions = ((u, v),) if rng.random() < one_way else ((u, v), (v, u))
+        for a, b in directions:
+            edges.append({
+                "id": len(edges) + 1,
+                "from_node": nodes[a]["id"],
+                "to_node": nodes[b]["id"],
+                "weight": _weight(rng, nodes[a], nodes[b]),
+            })
+    return edges
+
+
+def grid(rng: random.Random, n: int, drop: float = 0.0, one_way: float = 0.0):
+    """
+    Grade aproximadamente quadrada com n nós; cada ligação entre vizinhos é
+    omitida com probabilidade drop.
+    """
+    cols = max(1, math.isqrt(n))
+    rows = math.ceil(n / cols)
+    step = AREA / max(cols, rows)
+    points = [((i % cols) * step, (i // cols) * step) for i in range(n)]
+
+    pairs = []
+    for i in range(n):
+        right, below = i + 1, i + cols
+        if right < n and right % cols != 0 and rng.random() >= drop:
+            pairs.append((i, right))
+        if below < n and rng.random() >= drop:
+            pairs.append((i, below))
+
+    nodes = _nodes(points)
+    return nodes, _edges(rng, nodes, pairs, one_way)
+
+
+def geometric(rng: random.Random, n: int, degree: float = 6.0, one_way: float = 0.0):
+    """
+    Grafo geométrico aleatório: n pontos uniformes no quadrado, ligados
+    quando estão a menos de um raio escolhido para dar o grau médio pedido.
+    """
+    points = [(rng.uniform(0, AREA), rng.uniform(0, AREA)) for _ in range(n)]
+    radius = math.sqrt(degree * AREA * AREA / (math.pi * max(n, 1)))
+
+    # baldes do tamanho do raio: só vizinhos de baldes adjacentes são testados
+    buckets: dict[tuple[int, int], list[int]] = {}
+    for i, (x, y) in enumerate(points):
+        buckets.setdefault((int(x // radius), int(y // radius)), []).append(i)
+
+    pairs = []
+    for (bx, by), members in buckets.items():
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in buckets.get((bx + dx, by + dy), ()):
+                    for i in members:
+                        if i < j and math.dist(points[i], points[j]) <= radius:
+                            pairs.append((i, j))
+
+    nodes = _nodes(points)
+    return nodes, _edges(rng, nodes, pairs, one_way)
+
+
+def scale_free(rng: random.Random, n: int, degree: float = 4.0, one_way: float = 0.0):
+    """
+    Barabási–Albert: cada nó novo se liga a degree / 2 nós existentes,
+    escolhidos com probabilidade proporcional ao grau.
+    """
+    attach = max(1, round(degree / 2))
+    points = [(rng.uniform(0, AREA), rng.uniform(0, AREA)) for _ in range(n)]
+
+    pairs = []
+    # cada nó aparece aqui uma vez por aresta: sortear um elemento é
+    # sortear um nó proporcionalmente ao grau
+    ends: list[int] = []
+    for i in range(min(attach + 1, n)):
+        for j in range(i):
+            pairs.append((j, i))
+            ends += (i, j)
+    for i in range(attach + 1, n):
+        chosen = set()
+        while len(chosen) < attach:
+            chosen.add(rng.choice(ends))
+        for j in chosen:
+            pairs.append((j, i))
+            ends += (i, j)
+
+    nodes = _nodes(points)
+    return nodes, _edges(rng, nodes, pairs, one_way)
+
+
+def jobs_and_precedences(rng: random.Random, nodes: list[dict], count: int,
+                         mode: str = "pairs", chain_length: int = 3, density: float = 0.1):
+    """
+    count jobs em nós sorteados, com precedências conforme mode:
+    - pairs: pickup -> dropoff dois a dois;
+    - chains: cadeias de chain_length jobs em sequência;
+    - random: cada par (i, j), i < j, com probabilidade density (acíclico);
+    - none: sem precedências.
+    """
+    jobs = [
+        {"id": i + 1, "type": "pickup" if i % 2 == 0 else "dropoff", "node_id": rng.choice(nodes)["id"]}
+        for i in range(count)
+    ]
+
+    precedences = []
+    if mode == "pairs":
+        precedences = [(i, i + 1) for i in range(1, count, 2)]
+    elif mode == "chains":
+        length = max(2, chain_length)
+        for start in range(1, count + 1, length):
+            chain = range(start, min(start + length, count + 1))
+            precedences += zip(chain, chain[1:])
+    elif mode == "random":
+        precedences = [
+            (i, j) for i in range(1, count + 1) for j in range(i + 1, count + 1)
+            if rng.random() < density
+        ]
+
+    return jobs, [{"job_before": a, "job_after": b} for a, b in precedences]
+
+
+def generate(shape: str = "grid", nodes: int = 1000, jobs: int = 10, seed: int = 1,
+             degree: float = 4.0, drop: float = 0.0, one_way: float = 0.0,
+             precedences: str = "pairs", chain_length: int = 3, density: float = 0.1) -> dict:
+    """
+    Dataset completo (nodes, edges, jobs, precedences), reproduzível pela seed.
+    degree vale para geometric e scale_free; drop, para grid.
+    """
+    rng = random.Random(seed)
+    if shape == "grid":
+        node_list, edges = grid(rng, nodes, drop, one_way)
+    elif shape == "geometric":
+        node_list, edges = geometric(rng, nodes, degree, one_way)
+    elif shape == "scale_free":
+        node_list, edges = scale_free(rng, nodes, degree, one_way)
+    else:
+        raise ValueError(f"Formato desconhecido: {shape}")
+
+    job_list, precedence_list = jobs_and_precedences(
+        rng, node_list, jobs, precedences, chain_length, density
+    )
+    return {"nodes": node_list, "edges": edges, "jobs": job_list, "precedences": precedence_list}
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """
+    Opções do gerador, menos --nodes e --jobs (que o benchmark varre).
+    """
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--degree", type=float, default=4.0,
+                        help="grau médio (geometric, scale_free)")
+    parser.add_argument("--drop", type=float, default=0.0,
+                        help="fração de ligações omitidas na grade")
+    parser.add_argument("--one-way", type=float, default=0.0,
+                        help="fração de ligações com um só sentido")
+    parser.add_argument("--precedences", choices=PRECEDENCES, default="pairs")
+    parser.add_argument("--chain-length", type=int, default=3)
+    parser.add_argument("--density", type=float, default=0.1,
+                        help="probabilidade de cada precedência (random)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera um dataset sintético em JSON.")
+    parser.add_argument("shape", choices=SHAPES)
+    parser.add_argument("--nodes", type=int, default=1000, help="quantidade de nós")
+    parser.add_argument("--jobs", type=int, default=10, help="quantidade de jobs")
+    add_arguments(parser)
+    parser.add_argument("-o", "--output", help="arquivo de saída (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    dataset = generate(
+        args.shape, args.nodes, args.jobs, args.seed, args.degree, args.drop,
+        args.one_way, args.precedences, args.chain_length, args.density,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(dataset, f)
+    else:
+        json.dump(dataset, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+Benchmark da API: sobe um servidor uvicorn por tamanho de dataset (banco
+temporário), envia um dataset sintético (bench.generate) e mede cada
+endpoint/solver:
+
+- latência (p50, p90, p99, média e máximo) de requisições em sequência;
+- vazão com várias requisições simultâneas;
+- pico de memória (RSS) do servidor e dos seus workers durante a medição.
+
+Exemplo (na pasta backend):
+
+    py -m bench.run --shape grid --nodes 1000,10000 --jobs 10 -o base.json
+    py -m bench.run --shape grid --nodes 1000,10000 --jobs 10 -o novo.json --baseline base.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from bench import generate
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# endpoint -> caminho (com {a}, {b} e {start} sorteados a cada requisição)
+ENDPOINTS = {
+    "path_dijkstra": "/graph/path/{a}/{b}?mode=dijkstra",
+    "path_auto": "/graph/path/{a}/{b}",
+    "cost_matrix": "/graph/cost_matrix?format=f32",
+    "greedy": "/routes/greedy?start_node={start}",
+    "improved": "/routes/improved?start_node={start}&time_budget_ms=50",
+    "optimal_dp": "/routes/optimal?start_node={start}&solver=dp",
+    "optimal_bnb": "/routes/optimal?start_node={start}&solver=bnb",
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _request(base: str, method: str, path: str, body: bytes | None = None,
+             timeout: float = 600) -> tuple[int, bytes]:
+    req = urllib.request.Request(base + path, data=body, method=method)
+    if body is not None:
+        req.add_header("Content-Type", "application/json")
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as exc:
+        return exc.code, exc.read()
+
+
+def _process_tree(pid: int) -> list[int]:
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending += [int(p) for p in f.read().split()]
+        except OSError:
+            pass
+    return pids
+
+
+def _rss_bytes(pid: int) -> int | None:
+    """
+    RSS somado do processo e dos seus descendentes (workers); None fora do
+    Linux.
+    """
+    total = 0
+    for p in _process_tree(pid):
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            if p == pid:
+                return None
+    return total
+
+
+class RSSSampler:
+    """
+    Amostra o RSS do servidor numa thread enquanto o bloco with roda e
+    guarda o maior valor visto.
+    """
+
+    def __init__(self, pid: int, interval: float = 0.02):
+        self.pid = pid
+        self.interval = interval
+        self.peak: int | None = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        rss = _rss_bytes(self.pid)
+        if rss is not None:
+            self.peak = rss if self.peak is None else max(self.peak, rss)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+class Server:
+    """
+    uvicorn com um banco próprio num diretório temporário.
+    """
+
+    def __init__(self, workdir: str, env: dict[str, str]):
+        self.port = _free_port()
+        self.base = f"http://127.0.0.1:{self.port}"
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env={**os.environ, "GRAFOS_DB": os.path.join(workdir, "grafos.db"), **env},
+        )
+
+    def wait_ready(self, timeout: float = 60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("O servidor encerrou ao subir.")
+            try:
+                if _request(self.base, "GET", "/", timeout=1)[0] == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.1)
+        raise RuntimeError("O servidor não respondeu a tempo.")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    # interpolação linear entre as duas posições vizinhas
+    pos = (len(sorted_values) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+def summarize(latencies: list[float]) -> dict:
+    values = sorted(latencies)
+    if not values:
+        return {}
+    return {
+        "p50": round(_percentile(values, 0.50), 3),
+        "p90": round(_percentile(values, 0.90), 3),
+        "p99": round(_percentile(values, 0.99), 3),
+        "mean": round(statistics.fmean(values), 3),
+        "max": round(values[-1], 3),
+    }
+
+
+def _timed(base: str, path: str) -> tuple[float, int]:
+    started = time.perf_counter()
+    status, _ = _request(base, "GET", path)
+    return (time.perf_counter() - started) * 1000, status
+
+
+def measure(server: Server, paths, repeat: int, concurrency: int) -> dict:
+    """
+    repeat requisições em sequência (latência) e depois repeat requisições
+    com concurrency simultâneas (vazão); paths() sorteia o caminho de cada uma.
+    """
+    statuses: dict[str, int] = {}
+    latencies = []
+    with RSSSampler(server.process.pid) as rss:
+        for _ in range(repeat):
+            elapsed, status = _timed(server.base, paths())
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+        throughput = None
+        if concurrency > 1:
+            batch = [paths() for _ in range(repeat)]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                for _, status in pool.map(lambda p: _timed(server.base, p), batch):
+                    statuses[str(status)] = statuses.get(str(status), 0) + 1
+            throughput = round(repeat / (time.perf_counter() - started), 3)
+
+    return {
+        "requests": repeat,
+        "latency_ms": summarize(latencies),
+        "throughput_rps": throughput,
+        "concurrency": concurrency,
+        "peak_rss_mb": None if rss.peak is None else round(rss.peak / 2**20, 1),
+        "status_codes": statuses,
+    }
+
+
+def _wait_hierarchy(server: Server, a: int, b: int, timeout: float = 600):
+    # /graph/path informa o modo usado: ch só depois que a hierarquia fica pronta
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status, body = _request(server.base, "GET", f"/graph/path/{a}/{b}")
+        if status == 200 and json.loads(body)["mode"] == "ch":
+            return
+        time.sleep(0.5)
+    raise RuntimeError("A contraction hierarchy não ficou pronta a tempo.")
+
+
+def run_size(args, nodes: int, jobs: int) -> list[dict]:
+    dataset = generate.generate(
+        args.shape, nodes, jobs, args.seed, args.degree, args.drop, args.one_way,
+        args.precedences, args.chain_length, args.density,
+    )
+    body = json.dumps(dataset).encode()
+    node_ids = [n["id"] for n in dataset["nodes"]]
+    rng = random.Random(args.seed)
+    starts = rng.sample(node_ids, min(len(node_ids), 8))
+    base_row = {
+        "shape": args.shape,
+        "nodes": len(dataset["nodes"]),
+        "edges": len(dataset["edges"]),
+        "jobs": len(dataset["jobs"]),
+        "precedences": len(dataset["precedences"]),
+    }
+    print(f"{args.shape}: {base_row['nodes']} nós, {base_row['edges']} arestas, "
+          f"{base_row['jobs']} jobs", file=sys.stderr)
+
+    env = {"CONTRACTION_HIERARCHY": "1" if args.hierarchy else "0"}
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        server = Server(workdir, env)
+        try:
+            server.wait_ready()
+
+            upload = {"requests": 0, "latency_ms": {}, "status_codes": {}}
+            latencies = []
+            with RSSSampler(server.process.pid) as rss:
+                for _ in range(args.upload_repeat):
+                    started = time.perf_counter()
+                    status, _ = _request(server.base, "POST", "/dataset/upload_dataset", body)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    upload["status_codes"][str(status)] = upload["status_codes"].get(str(status), 0) + 1
+            upload.update(
+                requests=args.upload_repeat,
+                latency_ms=summarize(latencies),
+                payload_mb=round(len(body) / 2**20, 2),
+                peak_rss_mb=None if rss.peak is None else round(rss.peak / 2**20, 1),
+            )
+            results.append({**base_row, "endpoint": "upload_dataset", **upload})
+
+            if args.hierarchy:
+                _wait_hierarchy(server, node_ids[0], node_ids[-1])
+
+            for name in args.endpoints:
+                if name == "cost_matrix" and base_row["nodes"] > args.matrix_max_nodes:
+                    continue
+                template = ENDPOINTS[name]
+
+                def paths():
+                    a, b = rng.choice(node_ids), rng.choice(node_ids)
+                    return template.format(a=a, b=b, start=rng.choice(starts))
+
+                for _ in range(args.warmup):
+                    _request(server.base, "GET", paths())
+                print(f"  {name}", file=sys.stderr)
+                results.append({
+                    **base_row, "endpoint": name,
+                    **measure(server, paths, args.repeat, args.concurrency),
+                })
+        finally:
+            server.stop()
+    return results
+
+
+def compare(results: list[dict], baseline: dict):
+    """
+    Imprime a variação de p50/p90 e do pico de RSS em relação a uma
+    execução anterior (mesmo formato, mesmos nós/jobs/endpoint).
+    """
+    key = lambda r: (r["shape"], r["nodes"], r["jobs"], r["endpoint"])
+    previous = {key(r): r for r in baseline["results"]}
+
+    def change(old, new):
+        if not old or new is None:
+            return "   n/d"
+        return f"{(new - old) / old * 100:+6.1f}%"
+
+    print(f"{'endpoint':<16}{'nós':>9}{'jobs':>6}{'p50':>10}{'p90':>10}{'rss':>10}")
+    for r in results:
+        old = previous.get(key(r))
+        if old is None:
+            continue
+        print(
+            f"{r['endpoint']:<16}{r['nodes']:>9}{r['jobs']:>6}"
+            f"{change(old['latency_ms'].get('p50'), r['latency_ms'].get('p50')):>10}"
+            f"{change(old['latency_ms'].get('p90'), r['latency_ms'].get('p90')):>10}"
+            f"{change(old.get('peak_rss_mb'), r.get('peak_rss_mb')):>10}"
+        )
+
+
+def _int_list(text: str) -> list[int]:
+    return [int(v) for v in text.split(",") if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos endpoints com datasets sintéticos.")
+    parser.add_argument("--shape", choices=generate.SHAPES, default="grid")
+    generate.add_arguments(parser)
+    # varreduras: uma execução por combinação de --nodes e --jobs
+    parser.add_argument("--nodes", default="1000,10000", help="tamanhos separados por vírgula")
+    parser.add_argument("--jobs", default="10", help="quantidades de jobs separadas por vírgula")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        help="endpoints separados por vírgula: " + ", ".join(ENDPOINTS))
+    parser.add_argument("--repeat", type=int, default=20, help="requisições por endpoint e fase")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="requisições simultâneas na fase de vazão (1 desliga)")
+    parser.add_argument("--upload-repeat", type=int, default=3)
+    parser.add_argument("--matrix-max-nodes", type=int, default=1000,
+                        help="maior grafo em que cost_matrix é medido")
+    parser.add_argument("--hierarchy", action="store_true",
+                        help="espera a contraction hierarchy antes de medir")
+    parser.add_argument("-o", "--output", help="arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args(argv)
+
+    args.endpoints = [e for e in args.endpoints.split(",") if e]
+    unknown = [e for e in args.endpoints if e not in ENDPOINTS]
+    if unknown:
+        parser.error(f"endpoints desconhecidos: {', '.join(unknown)}")
+
+    started = time.time()
+    results = []
+    for nodes in _int_list(args.nodes):
+        for jobs in _int_list(args.jobs):
+            results += run_size(args, nodes, jobs)
+
+    report = {
+        "meta": {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+            "duration_s": round(time.time() - started, 1),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import time
+import tempfile
+
+import pytest
+
+# banco, hierarquia e snapshots dos testes num diretório temporário; as
+# variáveis precisam estar definidas antes de importar o app
+_TMP = tempfile.mkdtemp(prefix="grafos-tests-")
+os.environ["GRAFOS_DB"] = os.path.join(_TMP, "grafos.db")
+# cálculos em threads do próprio processo
+os.environ.setdefault("SOLVER_WORKERS", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from bench.generate import generate  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def upload(client):
+    """
+    Envia um dataset sintético (ver bench.generate) e devolve o dataset.
+    """
+
+    def send(**options) -> dict:
+        dataset = generate(**options)
+        response = client.post("/dataset/upload_dataset", json=dataset)
+        assert response.status_code == 200, response.text
+        return dataset
+
+    return send
+
+
+def wait_for_hierarchy(timeout: float = 60.0):
+    """
+    Espera a contraction hierarchy da versão atual ficar pronta.
+    """
+    from app.database import graph_store, hierarchy_store
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        hierarchy = hierarchy_store.get_hierarchy(graph_store.get_graph())
+        if hierarchy is not None:
+            return hierarchy
+        time.sleep(0.05)
+    raise AssertionError("Contraction hierarchy não ficou pronta.")
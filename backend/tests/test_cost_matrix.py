@@ -0,0 +1,66 @@
+import glob
+import io
+import json
+import os
+import struct
+import tempfile
+
+import pytest
+
+from app import encoding
+from app.algorithms import all_pairs
+
+METHODS = [
+    "dijkstra",
+    pytest.param("floyd_warshall", marks=pytest.mark.skipif(
+        all_pairs.np is None, reason="NumPy não instalado")),
+]
+
+
+def _leftovers() -> set[str]:
+    return set(glob.glob(os.path.join(tempfile.gettempdir(), "cost_matrix.*.bin")))
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_formats_agree(client, upload, method):
+    upload(nodes=49, jobs=4, seed=7, one_way=0.3)
+    before = _leftovers()
+
+    response = client.get(f"/graph/cost_matrix?method={method}")
+    assert response.status_code == 200
+    body = response.json()
+    n = len(body["nodes"])
+    matrix = [[float("inf") if d is None else d for d in row] for row in body["matrix"]]
+    assert body["method"] == method
+
+    lines = client.get(f"/graph/cost_matrix?method={method}&format=ndjson").text.splitlines()
+    assert json.loads(lines[0]) == {"nodes": body["nodes"], "method": method}
+    assert [json.loads(line)["costs"] for line in lines[1:]] == body["matrix"]
+
+    raw = client.get(f"/graph/cost_matrix?method={method}&format=f32").content
+    f32 = struct.unpack(f"<{n * n}f", raw)
+    assert f32 == pytest.approx([d for row in matrix for d in row], rel=1e-6)
+
+    npy = client.get(f"/graph/cost_matrix?method={method}&format=npy").content
+    assert npy.startswith(b"\x93NUMPY")
+    assert struct.unpack(f"<{n * n}d", npy[-8 * n * n:]) == tuple(d for row in matrix for d in row)
+
+    if encoding.msgpack is not None:
+        packed = client.get(f"/graph/cost_matrix?method={method}&format=msgpack").content
+        assert encoding.msgpack.unpackb(packed) == body
+
+    # os arquivos temporários do worker são apagados depois do envio
+    assert _leftovers() <= before
+
+
+def test_npy_loads_with_numpy(client, upload):
+    np = pytest.importorskip("numpy")
+    upload(nodes=25, jobs=2, seed=1)
+
+    npy = client.get("/graph/cost_matrix?format=npy").content
+    matrix = np.load(io.BytesIO(npy))
+
+    body = client.get("/graph/cost_matrix").json()
+    assert matrix.shape == (len(body["nodes"]),) * 2
+    assert np.array_equal(np.where(np.isinf(matrix), -1, matrix),
+                          np.array([[-1 if d is None else d for d in row] for row in body["matrix"]]))
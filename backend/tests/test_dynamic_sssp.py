@@ -0,0 +1,48 @@
+import random
+
+from app.algorithms import csr as csr_alg
+from app.algorithms import dynamic_sssp
+
+
+def _graph(edges):
+    graph = csr_alg.CSRGraph.from_edges(sorted({x for e in edges for x in e[:2]}), edges)
+    return graph, graph.reversed()
+
+
+def test_same_distance_through_other_path_is_not_counted():
+    before, _ = _graph([(0, 1, 1), (0, 2, 1), (2, 1, 0)])
+    dist, pred = csr_alg.dijkstra(before, 0)
+    old = list(dist)
+    assert pred[1] == 0
+
+    # 0 -> 1 fica mais cara, mas 0 -> 2 -> 1 mantém a distância de 1
+    graph, reverse = _graph([(0, 1, 5), (0, 2, 1), (2, 1, 0)])
+
+    assert dynamic_sssp.repair(graph, reverse, dist, pred, [(0, 1)], []) == 0
+    assert list(dist) == old
+    assert pred[1] == 2
+
+
+def test_repair_counts_changed_distances():
+    rng = random.Random(7)
+    for _ in range(30):
+        edges = [(rng.randrange(30), rng.randrange(30), rng.choice([0, 1, 2, 3])) for _ in range(90)]
+        edges += [(i, i + 1, 5) for i in range(29)]
+        before, _ = _graph(edges)
+        dist, pred = csr_alg.dijkstra(before, 0)
+        old = list(dist)
+
+        changed = rng.sample(range(len(edges)), 6)
+        new_edges = list(edges)
+        increased, decreased = [], []
+        for i in changed:
+            u, v, w = edges[i]
+            new_w = rng.choice([0, 1, 2, 3, 9])
+            new_edges[i] = (u, v, new_w)
+            (increased if new_w > w else decreased).append((u, v))
+        graph, reverse = _graph(new_edges)
+
+        count = dynamic_sssp.repair(graph, reverse, dist, pred, increased, decreased)
+        expected = csr_alg.dijkstra(graph, 0)[0]
+        assert list(dist) == list(expected)
+        assert count == sum(1 for a, b in zip(old, expected) if a != b)
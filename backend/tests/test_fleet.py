@@ -0,0 +1,30 @@
+from app.algorithms import fleet
+
+INF = fleet.INF
+
+
+def test_full_fleet_takes_group_by_insertion_cost():
+    # 1 job por veículo: o job 1 sobra e fica com o veículo 1, cujo
+    # cluster (o job 2) está mais perto dele que o do veículo 0
+    start_rows = [[1, 1, 10], [10, 10, 1]]
+    job_to_job = [[0, 5, 5], [5, 0, 5], [5, 0.5, 0]]
+    assignment, unreachable = fleet.partition(start_rows, job_to_job, [[0], [1], [2]], 1)
+    assert assignment == [[0], [1, 2]]
+    assert unreachable == []
+
+
+def test_full_fleet_prefers_least_loaded_vehicle():
+    # 1 job por veículo: os jobs 1 e 3 sobram, os dois perto do veículo 0;
+    # ele fica com o mais próximo e o outro vai para o veículo 1, com menos jobs
+    start_rows = [[1, 2, 9, 3], [9, 9, 1, 9]]
+    job_to_job = [[0, 1, 9, 2], [1, 0, 9, 2], [9, 9, 0, 9], [2, 2, 9, 0]]
+    assignment, _ = fleet.partition(start_rows, job_to_job, [[0], [1], [2], [3]], 1)
+    assert assignment == [[0, 1], [2, 3]]
+
+
+def test_unreachable_groups():
+    start_rows = [[1, INF], [1, INF]]
+    job_to_job = [[0, INF], [INF, 0]]
+    assignment, unreachable = fleet.partition(start_rows, job_to_job, [[0], [1]], 1)
+    assert assignment == [[0], []]
+    assert unreachable == [1]
@@ -0,0 +1,78 @@
+import random
+
+import pytest
+from fastapi import HTTPException
+
+from app.algorithms import greedy, held_karp
+from app.algorithms.constraints import Constraints
+from app.routers import routes
+
+INF = greedy.INF
+
+
+def _stuck_instance():
+    """
+    O guloso faz o job 0 (mais perto) e chega tarde à janela do job 1;
+    começando pelo job 1 as duas janelas cabem.
+    """
+    start_to_job = [1.0, 5.0]
+    job_to_job = [[0.0, 10.0], [10.0, 0.0]]
+    constraints = Constraints([0.0, 0.0], [0.0, 0.0], [INF, 5.0], [0.0, 0.0])
+    return start_to_job, job_to_job, [0, 0], constraints
+
+
+def test_feasible_order_when_greedy_is_stuck():
+    start_to_job, job_to_job, prereq, constraints = _stuck_instance()
+    assert greedy.greedy_order(start_to_job, job_to_job, prereq, constraints)[2] == greedy.CONSTRAINED
+
+    assert greedy.feasible_order(start_to_job, job_to_job, prereq, constraints) == (15.0, [1, 0])
+
+
+def test_improved_starts_from_feasible_order():
+    start_to_job, job_to_job, prereq, constraints = _stuck_instance()
+
+    cost, order, info = routes.solve_improved(start_to_job, job_to_job, prereq, 50, constraints)
+    assert order == [1, 0]
+    assert cost == info["initial_cost"] == 15.0
+
+
+def test_improved_without_feasible_order():
+    start_to_job, job_to_job, prereq, _ = _stuck_instance()
+    constraints = Constraints([0.0, 0.0], [0.0, 0.0], [2.0, 5.0], [0.0, 0.0])
+
+    with pytest.raises(HTTPException) as exc:
+        routes.solve_improved(start_to_job, job_to_job, prereq, 50, constraints)
+    assert exc.value.status_code == 400
+
+
+def test_feasible_order_agrees_with_dp():
+    rng = random.Random(5)
+    for _ in range(80):
+        n = rng.randint(4, 8)
+        points = [(rng.uniform(0, 10), rng.uniform(0, 10)) for _ in range(n + 1)]
+
+        def dist(a, b):
+            return abs(points[a][0] - points[b][0]) + abs(points[a][1] - points[b][1])
+
+        start_to_job = [dist(0, k + 1) for k in range(n)]
+        job_to_job = [[dist(i + 1, k + 1) for k in range(n)] for i in range(n)]
+        # pares pickup -> dropoff com demanda
+        prereq, load = [0] * n, [0.0] * n
+        for p in range(0, n - 1, 2):
+            if rng.random() < 0.6:
+                demand = rng.randint(1, 3)
+                prereq[p + 1], load[p], load[p + 1] = 1 << p, demand, -demand
+        ready = [rng.uniform(0, 30) if rng.random() < 0.6 else 0.0 for _ in range(n)]
+        due = [r + rng.uniform(2, 15) if r else INF for r in ready]
+        constraints = Constraints([rng.uniform(0, 2) for _ in range(n)], ready, due, load,
+                                  rng.choice([3, 4, INF]))
+
+        _, best = held_karp.solve(start_to_job, job_to_job, prereq, constraints=constraints)
+        _, order = greedy.feasible_order(start_to_job, job_to_job, prereq, constraints)
+        assert bool(order) == bool(best)
+        if order:
+            assert constraints.schedule(start_to_job, job_to_job, order) is not None
+            done = 0
+            for k in order:
+                assert not prereq[k] & ~done
+                done |= 1 << k
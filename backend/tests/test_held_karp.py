@@ -0,0 +1,114 @@
+import random
+
+import pytest
+
+from app import metrics
+from app.algorithms import held_karp
+
+BACKENDS = [
+    held_karp.PYTHON,
+    pytest.param(held_karp.NUMPY, marks=pytest.mark.skipif(
+        held_karp.np is None, reason="NumPy não instalado")),
+]
+
+
+def _instance(n: int, chain: int, seed: int = 1):
+    """
+    Custos aleatórios e cadeias de precedência de chain jobs cada.
+    """
+    rng = random.Random(seed)
+    prereq = [0 if k % chain == 0 else 1 << (k - 1) for k in range(n)]
+    start_to_job = [rng.uniform(1, 9) for _ in range(n)]
+    job_to_job = [[0.0 if i == j else rng.uniform(1, 9) for j in range(n)] for i in range(n)]
+    return start_to_job, job_to_job, prereq
+
+
+@pytest.mark.parametrize("n", [63, 64, 70])
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_chain_around_int64_masks(n, backend):
+    start_to_job, job_to_job, prereq = _instance(n, chain=n)
+
+    cost, order = held_karp.solve(start_to_job, job_to_job, prereq, backend)
+
+    assert order == list(range(n))
+    assert cost == pytest.approx(held_karp.route_cost(start_to_job, job_to_job, order))
+
+
+@pytest.mark.parametrize("n", [63, 64, 70])
+def test_backends_agree_around_int64_masks(n):
+    if held_karp.np is None:
+        pytest.skip("NumPy não instalado")
+    start_to_job, job_to_job, prereq = _instance(n, chain=25)
+
+    python = held_karp.solve(start_to_job, job_to_job, prereq, held_karp.PYTHON)
+    numpy = held_karp.solve(start_to_job, job_to_job, prereq, held_karp.NUMPY)
+    go = held_karp.solve_cost_to_go(job_to_job, prereq, held_karp.NUMPY)
+
+    assert python[0] < held_karp.INF
+    assert numpy == pytest.approx(python)
+    assert go.route(start_to_job, job_to_job)[0] == pytest.approx(python[0])
+
+
+def _states(func, *args) -> dict:
+    """
+    solver_states_total contado durante func(*args), por solver.
+    """
+    saved = metrics.drain()
+    try:
+        func(*args)
+        counters, _ = metrics.drain()
+    finally:
+        metrics.merge(saved)
+    return {
+        dict(labels)["solver"]: value
+        for (name, labels), value in counters.items() if name == "solver_states_total"
+    }
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_states_count_expanded_states(backend):
+    # 3 jobs livres: 3 estados com 1 job e 6 com 2 têm sucessores; as
+    # tabelas têm 8 máscaras × 3 colunas
+    start_to_job = [1.0, 2.0, 3.0]
+    job_to_job = [[0.0, 1.0, 1.0], [1.0, 0.0, 1.0], [1.0, 1.0, 0.0]]
+
+    assert _states(held_karp.solve, start_to_job, job_to_job, [0, 0, 0], backend) == {
+        "held_karp": 9}
+    assert _states(held_karp.solve_cost_to_go, job_to_job, [0, 0, 0], backend) == {
+        "cost_to_go": 9}
+
+
+def test_backends_count_the_same_states():
+    if held_karp.np is None:
+        pytest.skip("NumPy não instalado")
+    start_to_job, job_to_job, prereq = _instance(14, chain=3, seed=4)
+    # job 5 inalcançável a partir de qualquer outro
+    for row in job_to_job:
+        row[5] = held_karp.INF
+
+    python = _states(held_karp.solve, start_to_job, job_to_job, prereq, held_karp.PYTHON)
+    numpy = _states(held_karp.solve, start_to_job, job_to_job, prereq, held_karp.NUMPY)
+    layout = held_karp.plan(prereq)
+    assert python == numpy
+    assert 0 < python["held_karp"] < layout.size * layout.n
+
+    python = _states(held_karp.solve_cost_to_go, job_to_job, prereq, held_karp.PYTHON)
+    numpy = _states(held_karp.solve_cost_to_go, job_to_job, prereq, held_karp.NUMPY)
+    assert python == numpy
+
+
+def test_memory_budget_above_int64_masks():
+    start_to_job, job_to_job, prereq = _instance(70, chain=2)
+
+    with pytest.raises(held_karp.MemoryBudgetExceeded):
+        held_karp.solve(start_to_job, job_to_job, prereq, held_karp.PYTHON,
+                        budget_bytes=1024 * 1024)
+
+
+def test_optimal_route_with_70_jobs(client, upload):
+    upload(nodes=400, jobs=70, seed=2, precedences="chains", chain_length=70)
+
+    for backend in ("python", "numpy"):
+        response = client.get(f"/routes/optimal?start_node=1&backend={backend}")
+        assert response.status_code == 200, response.text
+        assert response.json()["job_order"] == list(range(1, 71))
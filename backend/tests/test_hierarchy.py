@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from app.algorithms import csr as csr_alg
+from app.database import distance_table, graph_store, hierarchy_store
+from app.routers import dataset
+from conftest import wait_for_hierarchy
+
+
+def _edge_weights(data: dict) -> dict[tuple[int, int], float]:
+    weights: dict[tuple[int, int], float] = {}
+    for e in data["edges"]:
+        key = (e["from_node"], e["to_node"])
+        weights[key] = min(weights.get(key, float("inf")), e["weight"])
+    return weights
+
+
+@pytest.mark.parametrize("shape", ["grid", "geometric", "scale_free"])
+def test_ch_paths_match_dijkstra(client, upload, shape):
+    data = upload(shape=shape, nodes=150, jobs=2, seed=11, one_way=0.2)
+    wait_for_hierarchy()
+    weights = _edge_weights(data)
+
+    rng = random.Random(4)
+    for _ in range(60):
+        s, t = rng.randint(1, 150), rng.randint(1, 150)
+        ch = client.get(f"/graph/path/{s}/{t}?mode=ch").json()
+        ref = client.get(f"/graph/path/{s}/{t}?mode=dijkstra").json()
+        assert ch["mode"] == "ch"
+        assert ch["reachable"] == ref["reachable"]
+        if not ref["reachable"]:
+            continue
+        assert ch["distance"] == pytest.approx(ref["distance"])
+        # o caminho desempacotado usa só arestas reais e soma a distância
+        path = ch["path"]
+        assert path[0] == s and path[-1] == t
+        assert sum(weights[a, b] for a, b in zip(path, path[1:])) == pytest.approx(ch["distance"])
+
+
+def test_ch_routes_match_dijkstra(client, upload, monkeypatch):
+    upload(nodes=144, jobs=8, seed=6)
+    wait_for_hierarchy()
+    with_ch = client.get("/routes/optimal?start_node=1").json()
+
+    monkeypatch.setattr(hierarchy_store, "ENABLED", False)
+    without_ch = client.get("/routes/optimal?start_node=1").json()
+
+    assert with_ch["total_cost"] == pytest.approx(without_ch["total_cost"])
+    assert with_ch["job_order"] == without_ch["job_order"]
+
+
+def test_patch_edges_repairs_rows_with_ch_on(client, upload, monkeypatch):
+    # a reconstrução adiada não acontece durante o teste
+    monkeypatch.setattr(dataset, "EDGE_PATCH_DELAY", 60.0)
+    data = upload(nodes=144, jobs=8, seed=6)
+    wait_for_hierarchy()
+    assert client.get("/routes/optimal?start_node=1").status_code == 200
+
+    edge = data["edges"][10]
+    response = client.patch("/dataset/edges",
+                            json={"update": [{"id": edge["id"], "weight": edge["weight"] * 5}]})
+    assert response.status_code == 200
+    # com a hierarquia pronta as rotas não gravaram linhas de distância
+    assert response.json()["distance_rows"] == {"repaired": 0, "unchanged": 0}
+
+    # hierarquia desatualizada: as rotas usam as linhas de distância
+    graph = graph_store.get_graph()
+    assert hierarchy_store.get_hierarchy(graph) is None
+    assert client.get("/routes/optimal?start_node=1").status_code == 200
+
+    edge = data["edges"][20]
+    response = client.patch("/dataset/edges",
+                            json={"update": [{"id": edge["id"], "weight": edge["weight"] / 4}]})
+    rows = response.json()["distance_rows"]
+    assert rows["repaired"] + rows["unchanged"] > 0
+
+    graph = graph_store.get_graph()
+    sources = [job["node_id"] for job in data["jobs"]] + [1]
+    for source, (dist, _) in distance_table.get_rows(graph, sources).items():
+        expected, _ = csr_alg.dijkstra(graph.csr, graph.csr.index[source])
+        assert list(dist) == pytest.approx(list(expected))
+
+
+def test_patch_edges_rebuilds_once_with_previous_order(client, upload, monkeypatch):
+    monkeypatch.setattr(dataset, "EDGE_PATCH_DELAY", 0.3)
+    data = upload(nodes=144, jobs=4, seed=8)
+    before = wait_for_hierarchy()
+
+    builds = []
+    real_build = hierarchy_store.contraction.build
+
+    def build(graph, version, order=None):
+        builds.append((version, order is not None))
+        return real_build(graph, version, order)
+
+    monkeypatch.setattr(hierarchy_store.contraction, "build", build)
+    for i in range(3):
+        edge = data["edges"][i]
+        client.patch("/dataset/edges",
+                     json={"update": [{"id": edge["id"], "weight": edge["weight"] * 2}]})
+
+    after = wait_for_hierarchy()
+    assert after.version == before.version + 3
+    assert builds == [(after.version, True)]
+    assert list(after.rank) == list(before.rank)
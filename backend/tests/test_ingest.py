@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from app.database import ingest
+
+NODES = [{"table": "nodes", "id": i, "name": f"N{i}", "x": i, "y": 0} for i in (1, 2, 3)]
+EDGES = [{"table": "edges", "id": 1, "from_node": 1, "to_node": 2, "weight": 1},
+         {"table": "edges", "id": 2, "from_node": 2, "to_node": 3, "weight": 1}]
+
+
+def _ndjson(records) -> bytes:
+    return "\n".join(json.dumps(record) for record in records).encode()
+
+
+def _bulk(client, body: bytes, format: str = "ndjson"):
+    return client.post(f"/dataset/bulk_upload?format={format}", content=body)
+
+
+def _job(**fields) -> dict:
+    return {"table": "jobs", "id": 1, "type": "pickup", "node_id": 2, **fields}
+
+
+def test_valid_jobs(client):
+    job = _job(service_time=2, window_start=0, window_end=10, demand=1)
+    response = _bulk(client, _ndjson([*NODES, *EDGES, job]))
+    assert response.status_code == 200, response.text
+
+
+@pytest.mark.parametrize("fields", [
+    {"service_time": -3},
+    {"demand": -5},
+    {"window_start": 100, "window_end": 10},
+])
+def test_jobs_checked_like_upload_dataset(client, fields):
+    response = _bulk(client, _ndjson([*NODES, *EDGES, _job(**fields)]))
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Linha 6:")
+
+
+def test_invalid_utf8_reports_line(client):
+    body = _ndjson(NODES) + b'\n{"table": "nodes", "id": 4, "name": "\xff", "x": 0, "y": 0}'
+    response = _bulk(client, body)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Linha 4: UTF-8 inválido."
+
+
+def test_csv_error_reports_line(client):
+    body = b"table,id,name,x,y\nnodes,1," + b"a" * 200_000 + b",0,0\n"
+    response = _bulk(client, body, "csv")
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Linha 2: CSV inválido")
+
+
+@pytest.mark.parametrize("chunk_rows", [5000, 2])
+def test_integrity_error_reports_failing_line(client, monkeypatch, chunk_rows):
+    monkeypatch.setattr(ingest, "CHUNK_ROWS", chunk_rows)
+    duplicate = {**NODES[0], "name": "outro"}
+    # o nó repetido está na linha 4; as seguintes são de outra tabela
+    records = [*NODES, duplicate, *EDGES, _job(), _job(id=2, node_id=3)]
+    response = _bulk(client, _ndjson(records))
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Linha 4: nodes:")
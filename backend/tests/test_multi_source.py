@@ -0,0 +1,53 @@
+import pytest
+
+from app import workers
+from app.algorithms import csr as csr_alg
+from app.algorithms import multi_source
+from app.database import graph_store
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def process_pool(monkeypatch):
+    """
+    Pool de app.workers com 2 processos (os testes rodam em threads).
+    """
+    workers.shutdown()
+    monkeypatch.setattr(workers, "WORKERS", 2)
+    monkeypatch.setattr(multi_source, "WORKERS", 2)
+    yield
+    workers.shutdown()
+    multi_source.shutdown()
+
+
+def test_dijkstra_matrix_runs_on_workers_pool(client, upload, process_pool):
+    upload(nodes=200, jobs=4, seed=21)
+    graph = graph_store.get_graph()
+    csr = graph.csr
+    sources = list(range(0, csr.num_nodes, 25))
+
+    dist, _ = multi_source.dijkstra_matrix(csr, sources, graph.version)
+    for row, source in enumerate(sources):
+        assert list(dist[row]) == list(csr_alg.dijkstra(csr, source)[0])
+
+    # nenhum pool além do de app.workers
+    assert not hasattr(multi_source, "_executor")
+    executor, idle = workers.idle_pool(multi_source.WORKERS)
+    assert executor is workers._executor and idle == 2
+
+
+def test_dijkstra_matrix_needs_idle_workers(client, upload, process_pool):
+    upload(nodes=100, jobs=4, seed=22)
+    graph = graph_store.get_graph()
+    workers.idle_pool(2)
+
+    # um cálculo agendado: sobra um processo, e a divisão não compensa
+    slot = workers._take_slot()
+    try:
+        assert workers.idle_pool(2)[1] == 1
+        with pytest.raises(multi_source.ParallelUnavailable):
+            multi_source.dijkstra_matrix(graph.csr, [0, 1, 2], graph.version)
+    finally:
+        workers._release_slot(workers._flags, slot)
+    assert workers.idle_pool(2)[1] == 2
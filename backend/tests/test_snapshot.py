@@ -0,0 +1,59 @@
+from app.database import snapshot
+
+
+def _export(client):
+    response = client.get("/dataset/snapshot")
+    assert response.status_code == 200
+    return snapshot.Snapshot(response.content).rows()
+
+
+def test_export_after_patch_jobs(client, upload):
+    upload(nodes=100, jobs=12, seed=3, precedences="pairs")
+    assert len(_export(client)[2]) == 12
+
+    # o job 12 é o dropoff do par 11 -> 12
+    response = client.patch("/dataset/jobs", json={"remove": [12]})
+    assert response.status_code == 200
+
+    _, _, jobs, precedences, _ = _export(client)
+    assert [job[0] for job in jobs] == list(range(1, 12))
+    assert (11, 12) not in precedences
+
+
+def test_export_after_patch_precedences(client, upload):
+    upload(nodes=100, jobs=6, seed=3, precedences="none")
+    assert _export(client)[3] == []
+
+    response = client.patch("/dataset/precedences",
+                            json={"add": [{"job_before": 1, "job_after": 2}]})
+    assert response.status_code == 200
+
+    assert _export(client)[3] == [(1, 2)]
+
+
+def test_graph_loads_from_snapshot_of_any_jobs_version(client, upload):
+    upload(nodes=100, jobs=6, seed=3)
+    _export(client)
+    client.patch("/dataset/jobs", json={"remove": [6]})
+
+    version = client.get("/dataset/snapshot").headers["X-Dataset-Version"]
+    assert snapshot.open_file(int(version)) is not None
+
+
+def test_export_after_put_vehicle_round_trips(client, upload):
+    upload(nodes=100, jobs=6, seed=3)
+    assert _export(client)[4] is None
+
+    assert client.put("/dataset/vehicle", json={"capacity": 3}).status_code == 200
+    exported = client.get("/dataset/snapshot").content
+    assert snapshot.Snapshot(exported).rows()[4] == 3
+
+    # outro dataset, sem capacidade, e o snapshot exportado de volta
+    upload(nodes=64, jobs=4, seed=5)
+    assert _export(client)[4] is None
+    response = client.post("/dataset/snapshot", content=exported)
+    assert response.status_code == 200
+
+    _, _, jobs, _, capacity = _export(client)
+    assert capacity == 3
+    assert len(jobs) == 6
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+import app.database.connection as db
+from app.database import ticket_store
+from app.routers import routes, solve
+
+
+def _wait(client, ticket_id: str, *statuses: str, timeout: float = 30.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        ticket = client.get(f"/routes/solve/{ticket_id}").json()
+        if ticket["status"] in statuses:
+            return ticket
+        time.sleep(0.02)
+    raise AssertionError(f"Ticket não chegou a {statuses}: {ticket}")
+
+
+def _key(ticket_id: str) -> str:
+    conn = db.get_read_connection()
+    try:
+        return conn.execute("SELECT key FROM solve_tickets WHERE id = ?", (ticket_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def held_greedy(monkeypatch):
+    """
+    greedy_route só termina depois de release.set().
+    """
+    release = threading.Event()
+    original = routes.greedy_route
+
+    def greedy_route(start_node):
+        assert release.wait(30)
+        return original(start_node)
+
+    monkeypatch.setattr(routes, "greedy_route", greedy_route)
+    yield release
+    release.set()
+
+
+def test_greedy_ticket_lifecycle(client, upload):
+    upload(nodes=100, jobs=6, seed=11)
+    response = client.post("/routes/solve", json={"strategy": "greedy"})
+    assert response.status_code == 202
+
+    ticket = _wait(client, response.json()["id"], "done")
+    expected = client.get("/routes/greedy").json()
+    assert ticket["result"]["job_order"] == expected["job_order"]
+    assert ticket["result"]["total_cost"] == expected["total_cost"]
+    assert not ticket["cached"]
+
+    again = client.post("/routes/solve", json={"strategy": "greedy"}).json()
+    assert again["status"] == "done" and again["cached"]
+    assert again["result"] == ticket["result"]
+
+
+def test_greedy_ticket_reports_running(client, upload, held_greedy):
+    upload(nodes=100, jobs=6, seed=12)
+    ticket_id = client.post("/routes/solve", json={"strategy": "greedy"}).json()["id"]
+
+    _wait(client, ticket_id, "running")
+    # pedido igual acompanha o mesmo ticket
+    assert client.post("/routes/solve", json={"strategy": "greedy"}).json()["id"] == ticket_id
+
+    held_greedy.set()
+    assert _wait(client, ticket_id, "done")["result"]["job_order"]
+
+
+def test_no_cache_write_when_dataset_changes_during_solve(client, upload, held_greedy):
+    upload(nodes=100, jobs=6, seed=13)
+    ticket_id = client.post("/routes/solve", json={"strategy": "greedy"}).json()["id"]
+    _wait(client, ticket_id, "running")
+
+    assert client.put("/dataset/vehicle", json={"capacity": 5}).status_code == 200
+    held_greedy.set()
+    _wait(client, ticket_id, "done")
+
+    assert ticket_store.get_result(_key(ticket_id)) is None
+
+
+def test_ticket_served_and_cancelled_through_database(client, upload, held_greedy):
+    upload(nodes=100, jobs=6, seed=14)
+    ticket_id = client.post("/routes/solve", json={"strategy": "greedy"}).json()["id"]
+    _wait(client, ticket_id, "running")
+
+    # de agora em diante as consultas leem o banco, como num outro processo
+    owner = solve._local.pop(ticket_id)
+    try:
+        assert _wait(client, ticket_id, "running")["start_node"] == 1
+
+        response = client.delete(f"/routes/solve/{ticket_id}")
+        assert response.status_code == 200
+        assert _wait(client, ticket_id, "cancelled", "done")["status"] == "cancelled"
+    finally:
+        solve._local.setdefault(ticket_id, owner)
+        held_greedy.set()
+
+
+def test_ticket_of_dead_process_fails(client, upload, monkeypatch):
+    upload(nodes=100, jobs=6, seed=15)
+    old = time.time() - solve.TICKET_STALE - 1
+    ticket_store.insert("perdido", "[]", solve.RUNNING, 1, "optimal", old)
+    monkeypatch.setattr(solve, "_last_expire", 0.0)
+
+    ticket = client.get("/routes/solve/perdido").json()
+    assert ticket["status"] == "failed"
+    assert ticket["error"]["status_code"] == 503
+
+
+def test_unknown_ticket(client):
+    assert client.get("/routes/solve/nao-existe").status_code == 404
+    assert client.delete("/routes/solve/nao-existe").status_code == 404